@@ -0,0 +1,119 @@
+# bench_skill_matching.py
+"""
+Benchmark of partial skill credit: the original per-job loop (every required skill
+against every CV skill, substring test plus character-set overlap) against the
+trigram index of services/job_matching/fuzzy.py used by the scoring engine.
+
+Both sides compute the required-skills score of every job for one CV. Job skill
+lists and CV skill sets are sampled from the skill vocabulary with realistic sizes.
+
+Usage (from ai-agent/chatbot_backend):
+    python -m benchmarks.bench_skill_matching
+    python -m benchmarks.bench_skill_matching --jobs 20000 --cv-skills 10 25 50
+"""
+import sys
+import time
+import random
+import logging
+import argparse
+import statistics
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from services.job_matching.scoring import CompiledJobs, PARTIAL_CREDIT, REQUIRED_WEIGHT
+from services.job_matching.skill_index import JobIndex
+from services.job_matching.vocabulary import TECH_SKILLS, GENERAL_SKILLS
+
+# Skills per job description
+JOB_SKILLS_RANGE = (4, 14)
+# Variants that exist in real CVs but not in the job vocabulary
+CV_VARIANTS = ["r", "go", "c", "react hooks", "spring framework", "aws ec2", "sql server", "js", "ml", "ui"]
+
+
+def build_jobs(count: int, rng: random.Random) -> List[dict]:
+    vocabulary = sorted(set(TECH_SKILLS) | set(GENERAL_SKILLS))
+    return [
+        {"_id": i, "title": f"Developer {i}", "required_skills": rng.sample(vocabulary, rng.randint(*JOB_SKILLS_RANGE))}
+        for i in range(count)
+    ]
+
+
+def build_cvs(size: int, count: int, rng: random.Random) -> List[List[str]]:
+    vocabulary = list(TECH_SKILLS)
+    return [rng.sample(vocabulary, size - 2) + rng.sample(CV_VARIANTS, 2) for _ in range(count)]
+
+
+def legacy_required_scores(jobs: List[dict], skills: List[str]) -> List[float]:
+    """Required-skills score of every job, as computed by the original matching loop."""
+    skills = [skill.lower() for skill in skills]
+    scores = []
+    for job in jobs:
+        skill_scores = []
+        for skill_lower in job["required_skills"]:
+            if skill_lower in skills:
+                skill_scores.append(1.0)
+                continue
+            best_match_score = 0
+            for user_skill_lower in skills:
+                if skill_lower in user_skill_lower or user_skill_lower in skill_lower:
+                    common = len(set(skill_lower).intersection(set(user_skill_lower)))
+                    score = common / max(len(skill_lower), len(user_skill_lower))
+                    best_match_score = max(best_match_score, score * PARTIAL_CREDIT)
+            skill_scores.append(best_match_score)
+        scores.append(REQUIRED_WEIGHT * sum(skill_scores) / max(1, len(skill_scores)))
+    return scores
+
+
+def trigram_required_scores(compiled: CompiledJobs, skills: List[str]) -> np.ndarray:
+    """Required-skills score of every job with the trigram index."""
+    return REQUIRED_WEIGHT * compiled.required_mean.dot(compiled.skill_credits(skills))
+
+
+def time_calls(func: Callable[[List[str]], object], cvs: List[List[str]], before: Callable[[], None] = None) -> Dict[str, float]:
+    samples = []
+    for skills in cvs:
+        if before:
+            before()
+        t0 = time.perf_counter()
+        func(skills)
+        samples.append(time.perf_counter() - t0)
+    ordered = sorted(samples)
+    return {
+        "p50_ms": statistics.median(samples) * 1000,
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy skill matching against the original loop")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1000, 10000], help="Corpus sizes")
+    parser.add_argument("--cv-skills", type=int, nargs="+", default=[10, 25, 50], help="CV skill set sizes")
+    parser.add_argument("--cvs", type=int, default=20, help="CVs scored per configuration")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    rng = random.Random(args.seed)
+    print(f"{'configuration':30} {'legacy p50':>11} {'legacy p99':>11} {'cold p50':>10} "
+          f"{'warm p50':>10} {'warm p99':>10} {'speedup':>8}")
+    for job_count in args.jobs:
+        jobs = build_jobs(job_count, rng)
+        index = JobIndex()
+        index.add_many(jobs)
+        compiled = CompiledJobs(index)
+        for size in args.cv_skills:
+            cvs = build_cvs(size, args.cvs, rng)
+            legacy = time_calls(lambda skills: legacy_required_scores(jobs, skills), cvs)
+            # Cold: the lookup cache is empty, as after a recompilation of the index
+            cold = time_calls(lambda skills: trigram_required_scores(compiled, skills), cvs,
+                              before=compiled.fuzzy._cache.clear)
+            warm = time_calls(lambda skills: trigram_required_scores(compiled, skills), cvs)
+            print(f"{f'{job_count} jobs / {size} skills':30} {legacy['p50_ms']:>11.2f} {legacy['p99_ms']:>11.2f} "
+                  f"{cold['p50_ms']:>10.2f} {warm['p50_ms']:>10.2f} {warm['p99_ms']:>10.2f} "
+                  f"{legacy['p50_ms'] / warm['p50_ms']:>7.0f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+# bench_text_analytics.py
+"""
+Micro-benchmarks for the text-analytics hot paths.
+
+Runs text_processing, extract_keywords_from_resume, extract_skills_from_text,
+extract_job_titles_from_resume and working_cv_api.analyze_cv_content over the OCR
+corpora stored in the repo plus synthetic large/adversarial documents, reports
+throughput and p50/p99 latency per function and dataset, and fails when a result
+regresses against benchmarks/baselines.json. The gate is on p99 for datasets with
+at least MIN_P99_SAMPLES calls and on the median below that (a p99 of a handful of
+calls is just their slowest one, i.e. noise).
+
+Usage (from ai-agent/chatbot_backend):
+    python -m benchmarks.bench_text_analytics                 # compare with baselines
+    python -m benchmarks.bench_text_analytics --update-baselines
+    python -m benchmarks.bench_text_analytics --only extract_skills_from_text
+"""
+import os
+import sys
+import json
+import glob
+import time
+import logging
+import argparse
+import statistics
+import contextlib
+from typing import Callable, Dict, List, Tuple
+
+from services.ingestion.text_preprocessing import text_processing
+from services.cv_refinement.keyword_extraction import extract_keywords_from_resume
+from services.cv_refinement.jobs_suggestion import extract_skills_from_text, extract_job_titles_from_resume
+import working_cv_api
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+CORPUS_DIRS = ["temp_ocr", "ocr_text", "ocr_output"]
+
+# A result regresses when its gated latency is this much slower than the (calibrated) baseline
+DEFAULT_TOLERANCE = 0.25
+# Calls collected per function and dataset at least, whatever --min-time/--min-rounds
+MIN_SAMPLES = 10
+# Results with fewer calls (here or in the baseline) are gated on p50 instead of p99
+MIN_P99_SAMPLES = 100
+
+
+# ——————————————————————————————————————————————————————
+# Datasets
+# ——————————————————————————————————————————————————————
+def load_corpus() -> List[str]:
+    """Raw OCR texts checked into the repo."""
+    texts = []
+    for directory in CORPUS_DIRS:
+        for path in sorted(glob.glob(os.path.join(BASE_DIR, directory, "*.txt"))):
+            with open(path, encoding="utf-8", errors="ignore") as f:
+                text = f.read()
+            if text.strip():
+                texts.append(text)
+    return texts
+
+
+def build_datasets() -> Dict[str, List[str]]:
+    """Named lists of raw documents (the corpus plus synthetic large/adversarial ones)."""
+    corpus = load_corpus()
+    if not corpus:
+        raise RuntimeError(f"No OCR text found in {', '.join(CORPUS_DIRS)}")
+    joined = "\n".join(corpus)
+
+    return {
+        "corpus": corpus,
+        # A very long CV: the whole corpus repeated
+        "large": [(joined + "\n") * 20],
+        # One huge line without any newline (defeats line-anchored regexes)
+        "single_line": [joined.replace("\n", " ") * 5],
+        # Section headers repeated many times
+        "repeated_headers": ["\n".join(
+            ["EXPERIENCE", "Software Engineer at Company", "2019 - 2023", "SKILLS", "Python, Java, SQL",
+             "EDUCATION", "Bachelor of Computer Science"] * 400
+        )],
+        # Many date ranges and numbers (experience/period regexes)
+        "dates_and_numbers": ["\n".join(
+            f"Developer {i} 01/20{i % 20:02d} - 12/20{(i + 1) % 20:02d} {i} years {i}+ months" for i in range(3000)
+        )],
+        # Long Vietnamese text with diacritics and little structure
+        "vietnamese": [("Kinh nghiệm làm việc: Lập trình viên phần mềm tại công ty công nghệ, "
+                        "phát triển ứng dụng web với Python và JavaScript. Kỹ năng: làm việc nhóm, "
+                        "giao tiếp, giải quyết vấn đề. Học vấn: Đại học Bách Khoa. ") * 500],
+    }
+
+
+# ——————————————————————————————————————————————————————
+# Benchmarked functions (each takes a raw document)
+# ——————————————————————————————————————————————————————
+def _analyze_cv_content(raw_text: str) -> dict:
+    return working_cv_api.analyze_cv_content(raw_text, "cv.txt", len(raw_text.encode("utf-8")), "text/plain")
+
+
+# Functions other than text_processing receive the cleaned text, as in production
+BENCHMARKS: Dict[str, Tuple[Callable[[str], object], bool]] = {
+    "text_processing": (text_processing, False),
+    "extract_keywords_from_resume": (extract_keywords_from_resume, True),
+    "extract_skills_from_text": (extract_skills_from_text, True),
+    "extract_job_titles_from_resume": (extract_job_titles_from_resume, True),
+    "analyze_cv_content": (_analyze_cv_content, False),
+}
+
+
+def calibrate() -> float:
+    """
+    Time a fixed pure-Python workload (seconds). Baselines store it too, so results
+    from a faster or slower machine are scaled before being compared.
+    """
+    best = float("inf")
+    for _ in range(7):
+        start = time.perf_counter()
+        total = 0
+        for i in range(1_000_000):
+            total += len(str(i))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run_benchmark(func: Callable[[str], object], docs: List[str], min_time: float, min_rounds: int,
+                  min_samples: int = MIN_SAMPLES) -> dict:
+    """Call `func` on every document repeatedly and collect per-call latencies."""
+    samples = []
+    total_bytes = 0
+    start = time.perf_counter()
+    rounds = 0
+    while rounds < min_rounds or len(samples) < min_samples or time.perf_counter() - start < min_time:
+        for doc in docs:
+            t0 = time.perf_counter()
+            func(doc)
+            samples.append(time.perf_counter() - t0)
+            total_bytes += len(doc)
+        rounds += 1
+    elapsed = sum(samples)
+    return {
+        "calls": len(samples),
+        "p50_ms": round(statistics.median(samples) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "calls_per_s": round(len(samples) / elapsed, 1),
+        "kb_per_s": round(total_bytes / 1024 / elapsed, 1),
+    }
+
+
+def gated_metric(result: dict, baseline: dict) -> str:
+    """Latency compared for a result: p99 when both runs have MIN_P99_SAMPLES calls, else p50."""
+    return "p99_ms" if min(result["calls"], baseline.get("calls", 0)) >= MIN_P99_SAMPLES else "p50_ms"
+
+
+def compare(results: Dict[str, dict], baselines: dict, scale: float, tolerance: float) -> List[str]:
+    """Return a message for every result whose gated latency regressed beyond the tolerance."""
+    regressions = []
+    for key, result in results.items():
+        baseline = baselines.get("results", {}).get(key)
+        if not baseline:
+            continue
+        metric = gated_metric(result, baseline)
+        label = metric.split("_")[0]
+        allowed = baseline[metric] * scale * (1 + tolerance)
+        if result[metric] > allowed:
+            regressions.append(f"{key}: {label} {result[metric]:.3f}ms > {allowed:.3f}ms "
+                               f"(baseline {baseline[metric]:.3f}ms x {scale:.2f}, {result['calls']} calls)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the text-analytics hot paths")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="Benchmark only these functions")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Minimum seconds per function and dataset")
+    parser.add_argument("--min-rounds", type=int, default=3, help="Minimum passes over each dataset")
+    parser.add_argument("--min-samples", type=int, default=MIN_SAMPLES, help="Minimum calls per function and dataset")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help=f"Allowed p99 (p50 below {MIN_P99_SAMPLES} calls) slowdown (0.25 = 25%%)")
+    parser.add_argument("--update-baselines", action="store_true", help="Store the results as the new baselines")
+    args = parser.parse_args()
+
+    # Keep the production log calls (their formatting cost is part of the hot path)
+    # but send the output nowhere
+    devnull = open(os.devnull, "w")
+    logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(devnull)], force=True)
+
+    datasets = build_datasets()
+    with contextlib.redirect_stdout(devnull):
+        cleaned = {name: [text_processing(doc) for doc in docs] for name, docs in datasets.items()}
+    calibration = calibrate()
+
+    results = {}
+    print(f"{'benchmark':55} {'calls':>7} {'p50 ms':>10} {'p99 ms':>10} {'calls/s':>10} {'KB/s':>10}")
+    for func_name in args.only or BENCHMARKS:
+        func, takes_cleaned = BENCHMARKS[func_name]
+        for dataset_name in datasets:
+            docs = cleaned[dataset_name] if takes_cleaned else datasets[dataset_name]
+            key = f"{func_name}/{dataset_name}"
+            # text_processing prints progress; keep it out of the report
+            with contextlib.redirect_stdout(devnull):
+                results[key] = run_benchmark(func, docs, args.min_time, args.min_rounds, args.min_samples)
+            r = results[key]
+            print(f"{key:55} {r['calls']:>7} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f} "
+                  f"{r['calls_per_s']:>10.1f} {r['kb_per_s']:>10.1f}")
+
+    if args.update_baselines:
+        baselines = {"calibration_s": calibration, "results": {}}
+        if os.path.exists(BASELINES_FILE):
+            with open(BASELINES_FILE) as f:
+                baselines["results"] = json.load(f).get("results", {})
+        baselines["results"].update(results)
+        with open(BASELINES_FILE, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines written to {BASELINES_FILE}")
+        return 0
+
+    if not os.path.exists(BASELINES_FILE):
+        print("No baselines stored yet; run with --update-baselines")
+        return 0
+
+    with open(BASELINES_FILE) as f:
+        baselines = json.load(f)
+    scale = calibration / baselines["calibration_s"] if baselines.get("calibration_s") else 1.0
+    regressions = compare(results, baselines, scale, args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+
+    print(f"\nNo regressions (machine speed factor {scale:.2f}, tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# explain_job_matching.py
+"""
+Explain-plan regression check for the job matching aggregation.
+
+Loads a synthetic job corpus (with stored features and the feature indexes) into a
+scratch database, runs `explain` (executionStats) on the pipeline of
+jobs_suggestion.build_matching_pipeline for a set of resume profiles, and fails
+when a plan scans the collection instead of the `features.required_skills` index,
+or reads more documents than the jobs sharing a required skill with the resume.
+
+Needs a real MongoDB (MONGO_ATLAS_URI); the scratch database is dropped afterwards.
+
+Usage (from ai-agent/chatbot_backend):
+    python -m benchmarks.explain_job_matching
+    python -m benchmarks.explain_job_matching --jobs 50000 --db CVProject_explain --keep
+"""
+import os
+import sys
+import random
+import logging
+import argparse
+from typing import Any, Dict, Iterator, List, Tuple
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+from services.cv_refinement.jobs_suggestion import build_matching_pipeline
+from services.job_matching.job_features import ensure_feature_indexes, with_features
+from services.job_matching.vocabulary import TECH_SKILLS
+
+# Skills per synthetic job
+JOB_SKILLS_RANGE = (3, 10)
+TITLES = ["Python Developer", "Senior Backend Engineer", "Frontend Developer", "Data Engineer",
+          "DevOps Engineer", "Java Developer", "Mobile Developer", "QA Engineer"]
+LEVELS = ["", "junior", "mid-level", "senior"]
+
+# Resume profiles checked: (name, skills, job titles, level)
+PROFILES = [
+    ("common skills", ["python", "sql", "docker", "git", "javascript"], ["Python Developer"], "junior"),
+    ("rare skills", TECH_SKILLS[-6:], ["Data Engineer"], ""),
+    ("no title", TECH_SKILLS[10:18], [], "senior"),
+]
+
+
+def build_jobs(count: int, rng: random.Random) -> List[dict]:
+    # Skewed skill popularity, like real postings
+    weights = [1.0 / (rank + 1) for rank in range(len(TECH_SKILLS))]
+    jobs = []
+    for i in range(count):
+        skills = set(rng.choices(TECH_SKILLS, weights=weights, k=rng.randint(*JOB_SKILLS_RANGE)))
+        jobs.append(with_features({
+            "title": rng.choice(TITLES),
+            "companyName": f"Company {i % 500}",
+            "required_skills": sorted(skills),
+            "preferred_skills": rng.sample(TECH_SKILLS, 2),
+            "experience_level": rng.choice(LEVELS),
+        }))
+    return jobs
+
+
+def walk(node: Any) -> Iterator[Dict[str, Any]]:
+    """Every sub-document of an explain output."""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from walk(value)
+
+
+def plan_summary(explain: Dict[str, Any]) -> Tuple[List[str], int, int]:
+    """Stages, documents examined and keys examined of an aggregation explain (any server version)."""
+    stages = [doc["stage"] for doc in walk(explain) if isinstance(doc.get("stage"), str)]
+    stats = [doc for doc in walk(explain) if "totalDocsExamined" in doc]
+    docs = sum(doc["totalDocsExamined"] for doc in stats)
+    keys = sum(doc.get("totalKeysExamined", 0) for doc in stats)
+    return stages, docs, keys
+
+
+def check_profile(db, collection, name: str, skills: List[str], job_titles: List[str], level: str) -> List[str]:
+    """Failures of one profile (empty when the plan is index-backed and bounded)."""
+    pipeline = build_matching_pipeline(sorted(skills), job_titles, level)
+    explain = db.command("explain", {"aggregate": collection.name, "pipeline": pipeline, "cursor": {}},
+                         verbosity="executionStats")
+    stages, docs_examined, keys_examined = plan_summary(explain)
+    candidates = collection.count_documents({"features.required_skills": {"$in": skills}})
+    returned = len(list(collection.aggregate(pipeline)))
+    print(f"{name:20} {candidates:>10} {keys_examined:>10} {docs_examined:>10} {returned:>9}  {'/'.join(dict.fromkeys(stages))}")
+
+    failures = []
+    if "IXSCAN" not in stages:
+        failures.append(f"{name}: no IXSCAN in the plan")
+    if "COLLSCAN" in stages:
+        failures.append(f"{name}: COLLSCAN in the plan")
+    if docs_examined > candidates:
+        failures.append(f"{name}: {docs_examined} documents examined for {candidates} candidate jobs")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check the explain plan of the job matching aggregation")
+    parser.add_argument("--jobs", type=int, default=20000, help="Synthetic corpus size")
+    parser.add_argument("--db", default="CVProject_explain", help="Scratch database (dropped afterwards)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_ATLAS_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_ATLAS_URI not found in environment variables")
+
+    client = MongoClient(mongo_uri)
+    db = client[args.db]
+    collection = db["jobs"]
+    try:
+        collection.drop()
+        collection.insert_many(build_jobs(args.jobs, random.Random(args.seed)))
+        ensure_feature_indexes(collection)
+
+        print(f"{'profile':20} {'candidates':>10} {'keys':>10} {'docs':>10} {'returned':>9}  stages")
+        failures = []
+        for name, skills, job_titles, level in PROFILES:
+            failures += check_profile(db, collection, name, skills, job_titles, level)
+    finally:
+        if not args.keep:
+            client.drop_database(args.db)
+
+    if failures:
+        print("\nFailures:")
+        for message in failures:
+            print(f"  {message}")
+        return 1
+    print(f"\nAll plans index-backed ({args.jobs} jobs)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
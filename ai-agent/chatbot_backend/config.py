@@ -14,6 +14,7 @@ class UploadResp(BaseModel):
     saved: bool
     inserted_id: Optional[str] = None
     message: Optional[str] = None
+    artifacts: Optional[dict] = None
 
 class UserResp(BaseModel):
     username: str
@@ -26,3 +27,19 @@ class GetUsersResp(BaseModel):
     count: int
     message: Optional[str] = None
     parsed_output: Optional[dict] = None
+
+# ---------- Pydantic requests ----------
+class MatchProfile(BaseModel):
+    id: Optional[str] = None
+    skills: list[str] = []
+    job_titles: list[str] = []
+    # A job level or an alias of one (job_features.matching_levels), case-insensitive
+    level: Optional[str] = None
+    # Raw resume text, used when skills and job titles are not given
+    text: Optional[str] = None
+
+class MatchRequest(BaseModel):
+    profiles: list[MatchProfile]
+    limit: int = 20
+    # Only return jobs at the profile's level (or of unknown level)
+    same_level: bool = False
@@ -3,16 +3,19 @@
 import os
 import time
 import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-import re
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.responses import JSONResponse
 from pymongo import MongoClient
 from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from bson.errors import InvalidId
 import uvicorn
 from dotenv import load_dotenv
 from pydantic import BaseModel
@@ -21,84 +24,40 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 
-from services.ingestion.pipeline import pipeline
-from services.cv_refinement.improvement_suggestion import suggest_resume_improvements
+from services.ingestion.pipeline import extract_text
+from services.ingestion.reextraction import run_reextraction, get_migration_status, migration_id
 from services.linkedin_webscraping.webscraping import retrieve_linkedin_jobs
 import config
-from config import CreateUserResp, UploadResp, UserResp, GetUsersResp
-from services.cv_refinement.jobs_suggestion import suggest_jobs, extract_job_titles_from_resume, extract_skills_from_text
-
-def get_default_kills_for_title(title: str) -> list:
-    """Get default skills based on job title"""
-    title_lower = title.lower()
-    
-    # Map of job title keywords to default skills with more specific and relevant skills
-    skills_map = {
-        'backend': [
-            'python', 'java', 'node.js', 'sql', 'rest api', 'git', 'docker', 'aws',
-            'mongodb', 'postgresql', 'mysql', 'graphql', 'microservices', 'api development'
-        ],
-        'fullstack': [
-            'javascript', 'react', 'node.js', 'python', 'sql', 'html', 'css', 'rest api',
-            'typescript', 'redux', 'next.js', 'express', 'mongodb', 'postgresql', 'git', 'docker'
-        ],
-        'frontend': [
-            'javascript', 'react', 'vue', 'angular', 'html', 'css', 'typescript', 'responsive design',
-            'redux', 'sass', 'next.js', 'webpack', 'babel', 'jest', 'testing'
-        ],
-        'devops': [
-            'docker', 'kubernetes', 'aws', 'ci/cd', 'terraform', 'linux', 'bash', 'python',
-            'jenkins', 'github actions', 'ansible', 'prometheus', 'grafana', 'nginx', 'cloud'
-        ],
-        'data scientist': [
-            'python', 'machine learning', 'pandas', 'numpy', 'sql', 'statistics', 'tensorflow', 'pytorch',
-            'data analysis', 'data visualization', 'scikit-learn', 'deep learning', 'jupyter', 'matplotlib', 'seaborn'
-        ],
-        'mobile': [
-            'swift', 'kotlin', 'react native', 'flutter', 'mobile ui/ux', 'rest api', 'firebase',
-            'ios development', 'android development', 'mobile app development', 'redux', 'typescript', 'graphql'
-        ],
-        'ai': [
-            'python', 'machine learning', 'deep learning', 'tensorflow', 'pytorch', 'nlp', 'computer vision',
-            'neural networks', 'data science', 'natural language processing', 'opencv', 'scikit-learn', 'keras'
-        ],
-        'cloud': [
-            'aws', 'azure', 'google cloud', 'docker', 'kubernetes', 'terraform', 'ci/cd',
-            'serverless', 'lambda', 'cloudformation', 'ansible', 'jenkins', 'github actions', 'devops'
-        ],
-        'lập trình viên': [
-            'javascript', 'python', 'java', 'sql', 'git', 'oop', 'algorithms', 'data structures',
-            'html', 'css', 'react', 'node.js', 'mongodb', 'rest api', 'typescript', 'docker'
-        ],
-        'tester': [
-            'testing', 'automation', 'selenium', 'junit', 'testng', 'api testing', 'manual testing',
-            'jest', 'cypress', 'postman', 'jira', 'test automation', 'qa', 'quality assurance'
-        ],
-        'digital marketing': [
-            'seo', 'sem', 'social media marketing', 'content marketing', 'google analytics',
-            'email marketing', 'ppc', 'digital advertising', 'marketing strategy', 'seo'
-        ],
-        'hr': [
-            'recruitment', 'talent acquisition', 'employee relations', 'hr policies', 'performance management',
-            'training and development', 'compensation and benefits', 'hr management', 'onboarding', 'labor law'
-        ],
-        'sales': [
-            'customer relationship management', 'sales strategy', 'business development', 'account management',
-            'negotiation', 'market research', 'sales presentations', 'b2b sales', 'sales forecasting', 'crm'
-        ]
-    }
-    
-    # Find matching skills based on title
-    default_skills = []
-    for keyword, skill_list in skills_map.items():
-        if keyword in title_lower:
-            default_skills.extend(skill_list)
-    
-    # If no specific match, return some general skills
-    if not default_skills:
-        default_skills = ['problem solving', 'teamwork', 'communication', 'git', 'agile', 'debugging']
-    
-    return list(set(default_skills))  # Remove duplicates
+from config import CreateUserResp, UploadResp, UserResp, GetUsersResp, MatchRequest
+from services.cv_refinement.resume_artifacts import (
+    RESUME_ARTIFACTS, field_loader, resolve_resume_artifacts
+)
+from services.cv_refinement.resume_features import build_match_features
+from services.job_matching.skill_index import JobIndex
+from services.job_matching.job_sync import JobSync, is_open, open_jobs_query
+from services.job_matching.job_lifecycle import JobLifecycleManager, ensure_lifecycle_indexes
+from services.job_matching.canonical_jobs import (
+    USER_JOBS_COLLECTION, ensure_canonical_indexes, get_user_jobs, is_known_job, store_scraped_jobs
+)
+from services.job_matching.near_duplicates import ensure_dedup_indexes
+from services.job_matching.job_search import JobSearchIndex
+from services.job_matching.skill_demand import SkillDemandMaintainer, ensure_demand_indexes, skill_gap, top_skills
+from services.job_matching.scoring import JobScorer
+from services.job_matching.job_features import (
+    RAW_JOB_PROJECTION, ensure_feature_indexes, job_features, matching_levels
+)
+from services.job_matching.candidates import CandidateIndex
+from services.job_matching.autocomplete import KINDS as AUTOCOMPLETE_KINDS, TOP_K as AUTOCOMPLETE_MAX, Autocomplete
+from services.job_matching.snapshot import SnapshotPublisher, SnapshotReader
+from services.job_matching.match_cache import (
+    MatchCache, MATCH_CACHE_SIZE, MATCH_CACHE_TTL, MATCH_CACHE_WARM_USERS
+)
+from services.job_matching.match_feeds import (
+    MatchFeedMaintainer, ensure_feed_indexes, feed_status, read_feed, rebuild_user_feed
+)
+from services.cv_search.search_index import MAX_PAGE_SIZE, SECTIONS, ResumeSearchIndex
+from utils.artifact_graph import ArtifactUnavailableError
+from utils.event_logging import log_event, request_logging_middleware, setup_async_logging
 
 import logging
 
@@ -108,6 +67,8 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
+# Format and write log records on a background thread
+setup_async_logging()
 
 
 # ---------- CONFIG ----------
@@ -145,6 +106,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request id, log sampling and per-request debug switch for structured events
+app.middleware("http")(request_logging_middleware)
 
 # ---------- DB CLIENT ----------
 mongo_client = MongoClient(MONGO_ATLAS_URI)
@@ -158,10 +121,167 @@ try:
     users_collection.create_index("username", unique=True)
     cvs_collection.create_index("username", unique=True)  # ensures one resume per username
     jobs_collection.create_index("unique_id", unique=True)
+    cvs_collection.create_index("uploaded_at")
+    ensure_feature_indexes(jobs_collection)
+    ensure_feed_indexes(db)
+    ensure_lifecycle_indexes(db)
+    ensure_canonical_indexes(db)
+    ensure_dedup_indexes(jobs_collection)
+    ensure_demand_indexes(db)
 except Exception:
     # index creation might error if running multiple times; ignore for simple setup
     pass
 
+# Optional memory-mapped job snapshot shared by the workers of a host: they score
+# against it instead of each building a job index; one of them publishes it
+JOB_SNAPSHOT_PATH = os.getenv("JOB_SNAPSHOT_PATH")
+job_snapshots = SnapshotReader(JOB_SNAPSHOT_PATH) if JOB_SNAPSHOT_PATH else None
+snapshot_publisher = (SnapshotPublisher(jobs_collection, JOB_SNAPSHOT_PATH, sync_mode=os.getenv("JOB_SYNC_MODE", "auto"))
+                      if JOB_SNAPSHOT_PATH and os.getenv("JOB_SNAPSHOT_PUBLISH", "1").lower() in ("1", "true", "yes")
+                      else None)
+
+# In-memory job index and the vectorized scorer (with its skill graph) compiled from it
+job_index = JobIndex()
+job_scorer = JobScorer(job_index, snapshots=job_snapshots)
+MATCH_LIMIT = 20
+# Follows job inserts, updates, closures and expiries into the index (created at startup);
+# JOB_SYNC_MODE: auto (change stream, polling on standalone servers), change_stream or polling
+job_sync: Optional[JobSync] = None
+
+# Per-user match results; MATCH_CACHE_SHARED=1 shares them between workers through Mongo
+match_cache = MatchCache(
+    max_entries=int(os.getenv("MATCH_CACHE_SIZE", MATCH_CACHE_SIZE)),
+    ttl=int(os.getenv("MATCH_CACHE_TTL", MATCH_CACHE_TTL)),
+    shared_collection=db["match_cache"] if os.getenv("MATCH_CACHE_SHARED", "").lower() in ("1", "true", "yes") else None,
+)
+
+# Materialized per-user feeds (user_job_matches), updated as jobs are written
+feed_maintainer = MatchFeedMaintainer(db, job_scorer, workers=int(os.getenv("MATCH_FEED_WORKERS", "2")))
+# Full feed rebuilds (after an upload) run one at a time off the request path
+feed_rebuilds = ThreadPoolExecutor(max_workers=1, thread_name_prefix="feed-rebuild")
+
+# Compiled CV skills/titles for ranking candidates of a job
+candidate_index = CandidateIndex()
+
+# Skill and job title completions, rebuilt in the background when the scored jobs change
+autocomplete = Autocomplete()
+
+# BM25 full-text index of the stored resumes, persisted under CV_SEARCH_DIR (one writer per host)
+resume_search = ResumeSearchIndex(os.getenv("CV_SEARCH_DIR", "cv_search_index"))
+
+# Faceted search over the open jobs (bitmaps per facet value, keyset pagination)
+job_search = JobSearchIndex()
+
+# Skill demand per city and field (skill_demand, skill_pairs), updated as jobs are written or archived
+skill_demand = SkillDemandMaintainer(db)
+
+# Moves closed, expired and stale scraped jobs to jobs_archive (JOB_ARCHIVAL=0 to disable)
+job_lifecycle = (JobLifecycleManager(db, on_archive=lambda job_ids: on_jobs_archived(job_ids))
+                 if os.getenv("JOB_ARCHIVAL", "1").lower() in ("1", "true", "yes") else None)
+
+
+@app.on_event("startup")
+def build_job_index():
+    if snapshot_publisher is not None:
+        snapshot_publisher.start()
+    threading.Thread(target=resume_search.open, args=(cvs_collection,), name="resume-search", daemon=True).start()
+    threading.Thread(target=job_search.build, args=(jobs_collection,), name="job-search", daemon=True).start()
+    try:
+        if job_scorer.serving_snapshot():
+            logger.info(f"Serving jobs from snapshot {JOB_SNAPSHOT_PATH}")
+        else:
+            start_job_sync()
+    except Exception as e:
+        logger.error(f"Failed to build job index: {e}")
+        return
+    feed_maintainer.start()
+    skill_demand.start()
+    autocomplete.refresh(job_scorer)
+    if job_lifecycle is not None:
+        job_lifecycle.start()
+    threading.Thread(target=warm_match_cache, name="match-cache-warmup", daemon=True).start()
+    threading.Thread(target=candidate_index.refresh, args=(cvs_collection,), name="candidate-matrix", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    if job_sync is not None:
+        job_sync.stop()
+    if job_lifecycle is not None:
+        job_lifecycle.stop()
+    if snapshot_publisher is not None:
+        snapshot_publisher.stop()
+    feed_maintainer.stop()
+    skill_demand.stop()
+    feed_rebuilds.shutdown(wait=False)
+    resume_search.close()
+
+
+def start_job_sync():
+    """
+    Build the index from the open jobs and keep it current from then on (no full rebuilds).
+    """
+    global job_sync
+    since = datetime.utcnow()
+    job_index.build(jobs_collection, query=open_jobs_query(since))
+    # Compile the scoring matrices and the skill graph before the first request
+    job_scorer.compiled()
+    job_sync = JobSync(jobs_collection, job_index, since=since, mode=os.getenv("JOB_SYNC_MODE", "auto"),
+                       on_change=on_jobs_changed)
+    job_sync.start()
+
+
+def on_jobs_changed():
+    """
+    Recompile the scorer off the request path (so stateless scoring never waits on a
+    recompilation) and drop match results computed against the previous jobs.
+    """
+    job_scorer.compiled()
+    match_cache.invalidate_all()
+    feed_maintainer.notify()
+    skill_demand.notify()
+
+
+def on_jobs_archived(job_ids: list):
+    """Drop archived jobs right away (other workers' syncs notice the deletes on their own)."""
+    skill_demand.notify()
+    job_search.remove(job_ids)
+    if not job_scorer.serving_snapshot():
+        job_index.apply_changes([], job_ids)
+        on_jobs_changed()
+
+
+def refresh_jobs():
+    """Apply the job changes since the last refresh, unless the index is synced or served from a snapshot."""
+    if not job_scorer.serving_snapshot() and not (job_sync is not None and job_sync.running):
+        job_index.refresh(jobs_collection, open_jobs_query())
+
+
+def schedule_feed_rebuild(username: str):
+    """Rebuild a user's match feed in the background."""
+    def rebuild():
+        try:
+            refresh_jobs()
+            rebuild_user_feed(db, job_scorer, username)
+        except Exception as e:
+            logger.error(f"Match feed rebuild failed for '{username}': {e}")
+    feed_rebuilds.submit(rebuild)
+
+
+def warm_match_cache(limit: int = MATCH_CACHE_WARM_USERS):
+    """Compute the matches of the most recently active users ahead of their next visit."""
+    usernames = match_cache.recent_users(limit)
+    if not usernames:
+        usernames = [doc["username"] for doc in
+                     cvs_collection.find({}, {"username": 1}).sort("uploaded_at", -1).limit(limit)]
+    started = time.perf_counter()
+    for username in usernames:
+        try:
+            user_job_matches(username)
+        except Exception as e:
+            logger.warning(f"Match cache warmup failed for '{username}': {e}")
+    logger.info(f"Match cache warmed for {len(usernames)} users in {time.perf_counter() - started:.2f}s")
+
 # ---------- Endpoints ----------
 
 @app.post("/create_user", response_model=CreateUserResp)
@@ -294,8 +414,16 @@ async def upload_resume(username: str = Form(...), file: UploadFile = File(...),
         raise HTTPException(status_code=500, detail=f"Unable to save uploaded file: {e}")
 
     try:
-        processed_text, parsed_output = pipeline(file_path)
-        logger.info(f"Pipeline processed file for user '{username}' successfully.")
+        raw_text = extract_text(file_path)
+        # Only rebuild the derived artifacts whose inputs changed since the last upload
+        existing = cvs_collection.find_one({"username": username}, {"artifacts": 1})
+        artifacts_run = RESUME_ARTIFACTS.run(
+            ["features"],
+            stored=(existing or {}).get("artifacts"),
+            provided={"raw_text": raw_text},
+            load=field_loader(cvs_collection, existing["_id"] if existing else None),
+        )
+        logger.info(f"Pipeline processed file for user '{username}' successfully: {artifacts_run.report()}")
     except Exception as e:
         logger.error(f"Pipeline error for user '{username}': {e}")
         try:
@@ -307,12 +435,15 @@ async def upload_resume(username: str = Form(...), file: UploadFile = File(...),
     doc = {
         "username": username,
         "uploaded_at": datetime.utcnow(),
-        "processed_text": processed_text,
-        "parsed_output": parsed_output,
+        **artifacts_run.updates(),
     }
 
     try:
         result = cvs_collection.update_one({"username": username}, {"$set": doc}, upsert=True)
+        match_cache.invalidate_user(username)
+        schedule_feed_rebuild(username)
+        candidate_index.mark_stale()
+        resume_search.update(cvs_collection, username)
         inserted_id = str(result.upserted_id) if result.upserted_id else None
         logger.info(f"Resume stored for '{username}', replaced existing: {result.matched_count > 0}")
         # return UploadResp(username=username, saved=True, inserted_id=inserted_id,
@@ -322,7 +453,8 @@ async def upload_resume(username: str = Form(...), file: UploadFile = File(...),
             "username": username,
             "saved": True,
             "inserted_id": inserted_id,
-            "message": "Resume stored (replaced if existed)."
+            "message": "Resume stored (replaced if existed).",
+            "artifacts": artifacts_run.report()
         }
         logger.info(f"Curent Data: {res}")
         return res
@@ -346,31 +478,34 @@ def delete_resume(username: str):
     res = cvs_collection.delete_one({"username": username})
     if res.deleted_count == 0:
         raise HTTPException(status_code=404, detail="No resume found to delete.")
+    resume_search.remove(username)
     return {"deleted": True, "username": username}
 
 @app.post("/resume/{username}/suggest_improvements")
 def resume_improvements(username: str, model_name: str = config.MODEL_NAME):
     """
     Suggest improvements for a user's resume.
-    Runs the LLM pipeline on the resume text already stored in DB.
+    Runs the LLM pipeline on the resume text already stored in DB, unless the
+    stored suggestions were produced from the same text and model.
     """
-    # fetch stored resume
-    doc = cvs_collection.find_one({"username": username})
-    if not doc or "processed_text" not in doc:
-        raise HTTPException(status_code=404, detail="No resume found for that username.")
-
-    resume_text = doc["processed_text"]
-
     try:
-        improvements = suggest_resume_improvements(resume_text, model_name=model_name)
+        artifacts_run = resolve_resume_artifacts(
+            cvs_collection, username, ["improvements"], provided={"improvement_model": model_name}
+        )
+    except ArtifactUnavailableError:
+        artifacts_run = None
     except Exception as e:
         logger.error(f"Error suggesting improvements for {username}: {e}")
         raise HTTPException(status_code=500, detail=f"Improvement suggestion failed: {e}")
 
+    if not artifacts_run:
+        raise HTTPException(status_code=404, detail="No resume found for that username.")
+
     return {
         "username": username,
         "model": model_name,
-        "improvements": improvements
+        "improvements": artifacts_run.value("improvements"),
+        "artifacts": artifacts_run.report()
     }
 
 
@@ -378,7 +513,8 @@ def resume_improvements(username: str, model_name: str = config.MODEL_NAME):
 def retrieve_jobs(username: str, headless: bool = True):
     """
     Retrieve LinkedIn jobs for a specific user based on their stored keywords,
-    store them in 'jobs' collection, and return them.
+    store them once per posting in the 'jobs' collection (linked to the user through
+    'user_jobs'), and return the user's jobs.
     """
     # 1. Get user
     user = users_collection.find_one({"username": username})
@@ -392,30 +528,51 @@ def retrieve_jobs(username: str, headless: bool = True):
 
     params_list = [{"keywords": kw, "location": "Ho Chi Minh City"} for kw in keywords]
 
-    # 3. Scrape jobs
+    # 3. Scrape jobs (postings stored already are not extracted again)
     try:
-        result = retrieve_linkedin_jobs(headless=headless, params_list=params_list)
+        result = retrieve_linkedin_jobs(headless=headless, params_list=params_list,
+                                        is_known=lambda external_id: is_known_job(db, external_id))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error scraping jobs: {str(e)}")
 
-    jobs_to_insert = []
-    for job in result["jobs"]:
-        # Ensure unique_id includes username
-        job["unique_id"] = f"{username}_{job['job_id']}"
-        job["user"] = username
-
-        # Check if already exists
-        if not jobs_collection.find_one({"unique_id": job["unique_id"]}):
-            jobs_to_insert.append(job)
-
-    # 4. Insert new jobs into DB
-    if jobs_to_insert:
-        jobs_collection.insert_many(jobs_to_insert)
+    # 4. Store new postings (enriched and featured once) and link the user to every posting found
+    new_jobs = store_scraped_jobs(db, username, result["jobs"], result.get("known_job_ids", []))
+    if new_jobs:
+        # With a snapshot, the new jobs are scored once its publisher republishes it
+        if not job_scorer.serving_snapshot():
+            job_index.add_many([job for job in new_jobs if is_open(job)])
+        match_cache.invalidate_all()
+        feed_maintainer.notify()
+        skill_demand.notify()
 
     # 5. Return all jobs for this user
-    user_jobs = list(jobs_collection.find({"user": username}, {"_id": 0}))
+    user_jobs = get_user_jobs(db, username)
     return {"count": len(user_jobs), "jobs": user_jobs}
 
+# ---------- Migration Endpoints ----------
+@app.post("/migrations/reextraction")
+def start_reextraction(background_tasks: BackgroundTasks, workers: int = 2, batch_size: int = 100,
+                       max_rate: Optional[float] = None, force: bool = False):
+    """
+    Start re-extracting stale CVs in the background (resumes an interrupted run).
+    Progress is available from GET /migrations/reextraction.
+    """
+    background_tasks.add_task(run_reextraction, db, workers=workers, batch_size=batch_size,
+                              max_rate=max_rate, force=force)
+    return {"migration": migration_id(), "started": True}
+
+
+@app.get("/migrations/reextraction")
+def reextraction_status(migration: Optional[str] = None):
+    """Progress of the re-extraction migration for the current extractor versions."""
+    status = get_migration_status(db, migration)
+    if not status:
+        raise HTTPException(status_code=404, detail="Migration has not been started.")
+    status["migration"] = status.pop("_id")
+    status["last_id"] = str(status["last_id"]) if status.get("last_id") else None
+    return status
+
+
 # ---------- Google Meet Endpoints ----------
 class GoogleMeetRequest(BaseModel):
     summary: str
@@ -558,26 +715,216 @@ async def create_google_meet(meet_request: GoogleMeetRequest):
             }
         raise HTTPException(status_code=500, detail=str(e))
 
-def get_database():
-    """Get database connection"""
-    mongo_uri = os.getenv("MONGO_ATLAS_URI")
-    if not mongo_uri:
-        raise ValueError("MONGO_ATLAS_URI environment variable not set")
-    client = MongoClient(mongo_uri)
-    return client["CVProject"]
+def match_jobs(job_titles: list, skills: set) -> list:
+    """
+    Score every indexed job against a CV's job titles and skills.
+
+    Returns:
+        The best MATCH_LIMIT formatted job matches (at least 30% match), best first.
+    """
+    refresh_jobs()
+    formatted_jobs = job_scorer.top_matches(job_titles, skills, limit=MATCH_LIMIT)
+    log_event(logger, "jobs_matched", level=logging.INFO, scored=lambda: len(job_scorer.latest()),
+              matched=len(formatted_jobs))
+    return formatted_jobs
+
+
+def user_job_matches(username: str) -> tuple:
+    """
+    Job matches of a user's CV: from the match cache while the CV features, the
+    indexed jobs and the scoring configuration are unchanged, else from the user's
+    materialized feed, else scored on the spot (and the feed rebuilt).
+
+    Returns:
+        Tuple of (formatted matches, report with the cache outcome, source and artifact reuse)
+    """
+    refresh_jobs()
+    jobs_version = job_scorer.content_stamp()
+    feature_hash, feed_current = feed_status(cvs_collection, username)
+    if feature_hash:
+        cached = match_cache.get(username, feature_hash, jobs_version)
+        if cached is not None:
+            return cached, {"cache": "hit"}
+    if feed_current:
+        formatted_jobs = read_feed(db, username, MATCH_LIMIT)
+        match_cache.put(username, feature_hash, jobs_version, formatted_jobs)
+        return formatted_jobs, {"cache": "miss", "source": "feed"}
+
+    # Matches are reused while the CV match profile and the jobs corpus are unchanged
+    try:
+        artifacts_run = resolve_resume_artifacts(
+            cvs_collection, username, ["job_matches"],
+            provided={"jobs_version": jobs_version},
+            builders={"job_matches": lambda profile, _: match_jobs(profile["job_titles"], set(profile["skills"]))},
+        )
+    except ArtifactUnavailableError:
+        artifacts_run = None
+
+    if not artifacts_run:
+        # No stored CV text: score against an empty profile
+        return match_jobs([], set()), {"cache": "miss"}
+
+    formatted_jobs = artifacts_run.value("job_matches")
+    feature_hash = artifacts_run.meta.get("features", {}).get("output_hash") or feature_hash
+    if feature_hash:
+        match_cache.put(username, feature_hash, jobs_version, formatted_jobs)
+        schedule_feed_rebuild(username)
+    return formatted_jobs, {"cache": "miss", "source": "scored", "artifacts": artifacts_run.report()}
+
+
+@app.get("/jobs/{job_id}/candidates")
+def job_candidates(job_id: str, limit: int = 20):
+    """Rank every stored CV against one job, best candidates first."""
+    try:
+        oid = ObjectId(job_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail=f"Invalid job id '{job_id}'.")
+    job = jobs_collection.find_one({"_id": oid}, RAW_JOB_PROJECTION)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+
+    started = time.perf_counter()
+    candidate_index.refresh(cvs_collection)
+    features = job_features(job)
+    candidates = candidate_index.matrix.rank(features, job_scorer.compiled().skill_graph, limit=max(1, min(limit, 100)))
+    log_event(logger, "candidates_ranked", level=logging.INFO, job_id=job_id, scored=len(candidate_index),
+              returned=len(candidates), ms=lambda: round((time.perf_counter() - started) * 1000, 1))
+    return {
+        "job_id": job_id,
+        "title": features["title"],
+        "company": features["company"],
+        "total_candidates": len(candidate_index),
+        "candidates": candidates,
+    }
+
+
+@app.get("/autocomplete")
+def autocomplete_suggestions(q: str = "", kind: Optional[str] = None, limit: int = 10):
+    """Normalized skills and job titles starting with (a word starting with) `q`, most used first."""
+    if kind is not None and kind not in AUTOCOMPLETE_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown kind '{kind}'. Kinds: {', '.join(AUTOCOMPLETE_KINDS)}")
+    autocomplete.refresh(job_scorer)
+    return {"query": q, "suggestions": autocomplete.suggest(q, kind=kind, limit=max(1, min(limit, AUTOCOMPLETE_MAX)))}
+
+
+@app.get("/analytics/skills/demand")
+def skill_demand_top(city: Optional[str] = None, field: Optional[str] = None, limit: int = 20):
+    """Skills required by the most open jobs of a city and field (all of them when omitted)."""
+    return top_skills(db, city=city, field=field, limit=max(1, min(limit, 100)))
+
+
+@app.get("/analytics/skills/gap/{username}")
+def skill_demand_gap(username: str, city: Optional[str] = None, field: Optional[str] = None, limit: int = 20):
+    """A user's CV skills against the skills in demand in a city and field."""
+    cv = cvs_collection.find_one({"username": username}, {"features.skills": 1})
+    if not cv:
+        raise HTTPException(status_code=404, detail="CV not found for this user")
+    skills = (cv.get("features") or {}).get("skills") or []
+    return {"username": username, **skill_gap(db, skills, city=city, field=field, limit=max(1, min(limit, 100)))}
+
+
+@app.get("/analytics/skills/status")
+def skill_demand_status():
+    """Watermarks, last round and last recount (with the drift it repaired) of the skill demand."""
+    return skill_demand.status()
+
+
+@app.get("/search/candidates")
+def search_candidates(q: str, page: int = 1, page_size: int = 20, section: Optional[str] = None):
+    """Full-text search of the stored resumes (BM25), best matches first."""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty search query.")
+    if section is not None and section not in SECTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown section '{section}'. Sections: {', '.join(SECTIONS)}")
+    if not resume_search.ready:
+        raise HTTPException(status_code=503, detail="Resume search index not built yet")
+    page = max(1, page)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+    started = time.perf_counter()
+    resume_search.refresh(cvs_collection)
+    total, results = resume_search.search(q, offset=(page - 1) * page_size, limit=page_size, section=section)
+    search_ms = round((time.perf_counter() - started) * 1000, 2)
+    profiles = {cv["username"]: cv.get("features") or {} for cv in cvs_collection.find(
+        {"username": {"$in": [result["username"] for result in results]}},
+        {"username": 1, "features.job_titles": 1, "features.level": 1, "features.experience_years": 1},
+    )}
+    for result in results:
+        features = profiles.get(result["username"], {})
+        result.update(job_titles=features.get("job_titles", []), level=features.get("level"),
+                      experience_years=features.get("experience_years"))
+    log_event(logger, "candidates_searched", level=logging.INFO, total=total, returned=len(results), ms=search_ms)
+    return {
+        "query": q,
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "results": results,
+    }
+
+
+@app.get("/search/candidates/stats")
+def search_candidates_stats():
+    """Size, segments and persistence state of the resume search index."""
+    return resume_search.stats()
+
+
+# Limits of POST /match
+MAX_MATCH_PROFILES = 100
+MAX_MATCH_TEXT_CHARS = 20_000
+MAX_MATCH_RESULTS = 100
+
+
+@app.post("/match")
+def match_profiles(request: MatchRequest):
+    """
+    Score ad-hoc profiles against the in-memory job corpus, in batches.
+
+    A profile gives its skills, job titles and level, or raw resume text (at most
+    MAX_MATCH_TEXT_CHARS) they are extracted from. Nothing is read from Mongo: the
+    job index is kept current by the background refresh, and every profile of a
+    request is scored against the same compiled version of it.
+    """
+    if len(request.profiles) > MAX_MATCH_PROFILES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_MATCH_PROFILES} profiles per request.")
+    for i, profile in enumerate(request.profiles):
+        if profile.text and len(profile.text) > MAX_MATCH_TEXT_CHARS:
+            raise HTTPException(status_code=413,
+                                detail=f"Profile {i}: text longer than {MAX_MATCH_TEXT_CHARS} characters.")
+
+    started = time.perf_counter()
+    jobs = job_scorer.latest()
+    limit = max(1, min(request.limit, MAX_MATCH_RESULTS))
+    results = []
+    for i, profile in enumerate(request.profiles):
+        skills, job_titles, level = profile.skills, profile.job_titles, profile.level
+        if profile.text and not (skills or job_titles):
+            extracted = build_match_features(profile.text, level)
+            skills, job_titles, level = extracted["skills"], extracted["job_titles"], extracted["level"]
+        levels = None
+        if request.same_level and level:
+            try:
+                levels = matching_levels(level)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Profile {i}: {e}")
+        matches = job_scorer.top_matches(job_titles, skills, limit=limit, jobs=jobs, levels=levels)
+        results.append({
+            "id": profile.id,
+            "skills": skills,
+            "job_titles": job_titles,
+            "level": level,
+            "matching_jobs": matches,
+            "total_matches": len(matches),
+        })
+
+    log_event(logger, "profiles_matched", level=logging.INFO, profiles=len(results), scored=len(jobs),
+              ms=lambda: round((time.perf_counter() - started) * 1000, 1))
+    return {"total_jobs": len(jobs), "results": results}
+
 
 @app.get("/api/jobs-suggestion/{username}")
 async def jobs_suggestion(username: str):
     try:
-        # Initialize database connection
-        try:
-            db = get_database()
-            users_collection = db["users"]
-            cvs_collection = db["cvs"]
-        except Exception as e:
-            logger.error(f"Database connection error: {str(e)}")
-            raise HTTPException(status_code=500, detail="Could not connect to the database")
-            
         # Get user (if user verification is required)
         try:
             user = users_collection.find_one({"username": username})
@@ -594,323 +941,10 @@ async def jobs_suggestion(username: str):
             "message": ""
         }
         
-        # Initialize variables
-        job_titles = []
-        skills = set()
-        
-        try:
-            doc = cvs_collection.find_one({"username": username})
-            if doc and "processed_text" in doc:
-                resume_text = doc["processed_text"]
-                if resume_text and len(resume_text.strip()) > 0:
-                    # First extract job titles and skills from resume
-                    job_titles = extract_job_titles_from_resume(resume_text)
-                    logger.info(f"Extracted job titles from CV: {job_titles}")
-                    
-                    # Get job suggestions and extract skills
-                    job_suggestions = suggest_jobs(resume_text)
-                    
-                    # Extract skills from the result
-                    if isinstance(job_suggestions, dict):
-                        if "skills" in job_suggestions:
-                            skills = set(skill["name"].lower() for skill in job_suggestions["skills"] if skill and isinstance(skill, dict) and skill.get("name"))
-                        
-                        # If no skills found, try to extract from the resume text
-                        if not skills and "resume_text" in job_suggestions:
-                            from services.cv_refinement.jobs_suggestion import extract_skills_from_text
-                            skills = set(extract_skills_from_text(job_suggestions["resume_text"]))
-                    
-                    logger.info(f"Extracted skills from CV: {skills}")
-                    
-                    # If we still have no skills, try to extract from the raw resume text
-                    if not skills:
-                        from services.cv_refinement.jobs_suggestion import extract_skills_from_text
-                        raw_skills = extract_skills_from_text(resume_text)
-                        skills = set(skill.lower() for skill in raw_skills if skill)
-                        logger.info(f"Extracted {len(skills)} skills from raw text")
-                    
-                    # Log final skills count
-                    logger.info(f"Total skills extracted: {len(skills)}")
-                    
-                    # Ensure we have a result for the response
-                    result = job_suggestions if isinstance(job_suggestions, dict) else {}
-        except Exception as e:
-            logger.warning(f"Error processing resume: {str(e)}")
-            result["message"] = f"Warning: Could not process resume - {str(e)}"
-        
         # Get all jobs with more fields for better matching
         try:
-            jobs_collection = db["jobs"]
-            
-            # First, try to find jobs with matching titles from CV
-            matched_title_jobs = []
-            if job_titles:
-                title_regex = "|".join([re.escape(title.lower()) for title in job_titles])
-                matched_title_jobs = list(jobs_collection.find(
-                    {"title": {"$regex": title_regex, "$options": "i"}},
-                    {
-                        "_id": 1,
-                        "title": 1,
-                        "companyName": 1,
-                        "company": 1,
-                        "required_skills": 1,
-                        "preferred_skills": 1
-                    }
-                ).limit(20))
-                logger.info(f"Found {len(matched_title_jobs)} jobs with matching titles")
-            
-            # Get other jobs if we don't have enough title matches
-            remaining_slots = 20 - len(matched_title_jobs)
-            other_jobs = []
-            if remaining_slots > 0:
-                other_jobs = list(jobs_collection.find(
-                    {
-                        "_id": {"$nin": [j["_id"] for j in matched_title_jobs] if matched_title_jobs else []}
-                    },
-                    {
-                        "_id": 1,
-                        "title": 1,
-                        "companyName": 1,
-                        "company": 1,
-                        "required_skills": 1,
-                        "preferred_skills": 1
-                    }
-                ).limit(remaining_slots))
-            
-            all_jobs = matched_title_jobs + other_jobs
-            
-            # Format jobs to match the expected output
-            formatted_jobs = []
-            for job in all_jobs:
-                try:
-                    # Get job details
-                    title = job.get("title", "No Title").strip()
-                    company = job.get("companyName", job.get("company", "Company Not Specified")).strip()
-                    
-                    # Calculate match scores (0-100%)
-                    title_score = 0
-                    required_skills = set(skill.lower() for skill in job.get("required_skills", []))
-                    preferred_skills = set(skill.lower() for skill in job.get("preferred_skills", []))
-                    
-                    # 1. Title match (40% weight)
-                    title_lower = title.lower()
-                    title_score = 0
-                    max_title_score = 40
-                    
-                    # Vietnamese to English title mapping for better matching
-                    title_mapping = {
-                        'lập trình viên': ['developer', 'programmer', 'engineer'],
-                        'kỹ sư': ['engineer', 'developer'],
-                        'chuyên viên': ['specialist', 'expert', 'officer'],
-                        'nhân viên': ['staff', 'officer', 'associate']
-                    }
-                    
-                    # Check each job title from CV against the job posting title
-                    for jt in job_titles:
-                        jt_lower = jt.lower()
-                        
-                        # 1. Exact match (100% score)
-                        if jt_lower == title_lower:
-                            title_score = max_title_score
-                            break
-                            
-                        # 2. Check Vietnamese title mapping
-                        matched = False
-                        for vn_term, en_terms in title_mapping.items():
-                            if vn_term in jt_lower and any(term in title_lower for term in en_terms):
-                                title_score = max(title_score, max_title_score * 0.9)
-                                matched = True
-                                break
-                        if matched:
-                            continue
-                            
-                        # 3. Contains match (e.g., 'frontend' in 'senior frontend developer')
-                        if jt_lower in title_lower or title_lower in jt_lower:
-                            title_score = max(title_score, max_title_score * 0.8)
-                            continue
-                            
-                        # 4. Word overlap with stemming
-                        title_words = set(re.findall(r'\w+', title_lower))
-                        jt_words = set(re.findall(r'\w+', jt_lower))
-                        
-                        # Remove common words that don't add meaning
-                        common_words = {'senior', 'junior', 'lead', 'staff', 'i', 'ii', 'iii', 'iv', 'v'}
-                        title_words = title_words - common_words
-                        jt_words = jt_words - common_words
-                        
-                        if title_words and jt_words:
-                            overlap = len(title_words.intersection(jt_words))
-                            if overlap > 0:
-                                score = max_title_score * (0.5 + (overlap / max(len(title_words), len(jt_words)) * 0.5))
-                                title_score = max(title_score, score)
-                    
-                    # If still no match, check for technical role indicators
-                    if title_score == 0:
-                        tech_indicators = ['developer', 'engineer', 'programmer', 'lập trình', 'kỹ thuật', 'technical', 'code', 'software']
-                        if any(indicator in title_lower for indicator in tech_indicators):
-                            title_score = max_title_score * 0.3  # 30% for technical roles
-                        else:
-                            title_score = max_title_score * 0.1  # 10% for non-technical roles
-                    
-                    # 2. Required skills match (50% weight, reduced from 60%)
-                    required_skills_matched = 0
-                    required_skills_total = len(required_skills)
-                    
-                    # If no required skills defined, use default skills based on job title
-                    if required_skills_total == 0:
-                        default_skills = get_default_kills_for_title(title)
-                        required_skills = default_skills
-                        required_skills_total = len(required_skills)
-                        logger.info(f"Using default skills for {title}: {required_skills}")
-                    
-                    if required_skills_total > 0:
-                        # More flexible skill matching with scoring
-                        matched_required = []
-                        skill_scores = []
-                        
-                        for skill in required_skills:
-                            if not skill:
-                                continue
-                                
-                            skill_lower = skill.lower()
-                            skill_score = 0
-                            
-                            # Check for direct match (full points)
-                            if skill_lower in skills:
-                                skill_score = 1.0
-                            else:
-                                # Check for partial matches
-                                best_match_score = 0
-                                for user_skill in skills:
-                                    user_skill_lower = user_skill.lower()
-                                    # Exact match
-                                    if skill_lower == user_skill_lower:
-                                        best_match_score = 1.0
-                                        break
-                                    # One is contained in the other
-                                    elif skill_lower in user_skill_lower or user_skill_lower in skill_lower:
-                                        # Longer the common substring, higher the score
-                                        common = len(set(skill_lower).intersection(set(user_skill_lower)))
-                                        total = max(len(skill_lower), len(user_skill_lower))
-                                        score = common / total
-                                        best_match_score = max(best_match_score, score * 0.8)  # Max 80% for partial matches
-                                
-                                skill_score = best_match_score
-                            
-                            if skill_score > 0.5:  # Only count if match is good enough
-                                matched_required.append({
-                                    'skill': skill,
-                                    'match_score': skill_score,
-                                    'matched_with': next((s for s in skills if skill_lower in s.lower() or s.lower() in skill_lower), None)
-                                })
-                            
-                            skill_scores.append(skill_score)
-                        
-                        # Calculate weighted score (average of skill match scores)
-                        required_score = 50 * (sum(skill_scores) / max(1, len(skill_scores))) if skill_scores else 0
-                        required_skills_matched = len([s for s in skill_scores if s > 0.5])
-                        
-                        # Debug logging
-                        logger.info(f"Job: {title}")
-                        logger.info(f"Required skills: {required_skills}")
-                        logger.info(f"Matched required skills: {matched_required}")
-                        logger.info(f"Available skills: {skills}")
-                    else:
-                        required_score = 0
-                        logger.info(f"Job {title} has no required skills defined")
-                    
-                    # 3. Preferred skills match (10% weight, reduced from 20%)
-                    preferred_skills_matched = 0
-                    preferred_skills_total = len(preferred_skills)
-                    
-                    # If no preferred skills defined, use an empty list
-                    if preferred_skills_total == 0:
-                        preferred_skills = []
-                    
-                    if preferred_skills_total > 0:
-                        # Similar flexible matching as required skills
-                        matched_preferred = []
-                        for skill in preferred_skills:
-                            if not skill:
-                                continue
-                            skill_lower = skill.lower()
-                            if skill_lower in skills:
-                                matched_preferred.append(skill)
-                            else:
-                                for user_skill in skills:
-                                    if skill_lower in user_skill or user_skill in skill_lower:
-                                        matched_preferred.append(skill)
-                                        break
-                        
-                        preferred_skills_matched = len(matched_preferred)
-                        preferred_score = (preferred_skills_matched / max(1, preferred_skills_total)) * 10
-                        
-                        # Debug logging
-                        logger.info(f"Preferred skills: {preferred_skills}")
-                        logger.info(f"Matched preferred skills: {matched_preferred}")
-                    else:
-                        preferred_score = 0
-                        logger.info(f"Job {title} has no preferred skills defined")
-                    
-                    # Calculate total match percentage with weighted components
-                    total_score = title_score + required_score + preferred_score
-                    
-                    # Apply bonus for jobs that match the user's primary role
-                    primary_role = job_titles[0].lower() if job_titles else ''
-                    if primary_role and any(word in title_lower for word in primary_role.split()):
-                        total_score = min(100, total_score * 1.2)  # 20% bonus for primary role match
-                    
-                    match_percentage = min(100, max(0, round(total_score)))
-                    
-                    # Only include jobs with at least 30% match
-                    if match_percentage < 30:
-                        continue
-                    
-                    # Add visual indicator for match level
-                    if match_percentage >= 80:
-                        match_indicator = ""  # High match
-                    elif match_percentage >= 50:
-                        match_indicator = ""  # Medium match
-                    else:
-                        match_indicator = ""  # Low match
-                    
-                    # Format display title with match info and skill details
-                    skill_info = []
-                    if required_skills_total > 0:
-                        skill_info.append(f"{required_skills_matched}/{required_skills_total} required")
-                    if preferred_skills_total > 0:
-                        skill_info.append(f"{preferred_skills_matched}/{preferred_skills_total} preferred")
-                    
-                    # Add visual indicator for match level
-                    if match_percentage >= 80:
-                        match_indicator = "🟢"
-                    elif match_percentage >= 50:
-                        match_indicator = "🟡"
-                    else:
-                        match_indicator = "🔴"
-                        
-                    skill_str = " (" + ", ".join(skill_info) + ")" if skill_info else ""
-                    display_title = f"{match_indicator} {title} ({match_percentage}%{skill_str})"
-                    
-                    # Log final match details
-                    logger.info(f"Final match for {title}: {match_percentage}% (Title: {title_score/40*100:.0f}%, "
-                              f"Required: {required_score/40*100:.0f}%, Preferred: {preferred_score/20*100:.0f}%)")
-                    
-                    formatted_jobs.append({
-                        "id": str(job.get("_id", "")),
-                        "title": display_title,
-                        "company": company,
-                        "match_percentage": match_percentage,
-                        "relevance": "high" if match_percentage >= 70 else "medium" if match_percentage >= 40 else "low",
-                        "matched_skills": {
-                            "required": required_skills_matched,
-                            "preferred": preferred_skills_matched,
-                            "total_required": len(required_skills),
-                            "total_preferred": len(preferred_skills)
-                        }
-                    })
-                except Exception as job_error:
-                    logger.warning(f"Error formatting job {job.get('_id', 'unknown')}: {str(job_error)}")
+            formatted_jobs, report = user_job_matches(username)
+            result.update(report)
             
             if formatted_jobs:
                 result["matching_jobs"] = formatted_jobs
@@ -942,8 +976,6 @@ async def jobs_suggestion(username: str):
         
         # Try to get at least some jobs to show
         try:
-            db = get_database()
-            jobs_collection = db["jobs"]
             all_jobs = list(jobs_collection.find(
                 {},
                 {
@@ -992,6 +1024,60 @@ async def jobs_suggestion(username: str):
         )
 
 
+@app.get("/jobs/search")
+def search_jobs(location: List[str] = Query([]), field: List[str] = Query([]), level: List[str] = Query([]),
+                job_type: List[str] = Query([], alias="type"), salary: List[str] = Query([]),
+                skills: List[str] = Query([]), username: Optional[str] = None, sort: str = "newest",
+                cursor: Optional[str] = None, limit: int = 20, include: List[str] = Query([])):
+    """
+    Open jobs matching the filters (values of a facet are alternatives, skills are all
+    required), one page at a time with the count of every facet value. Pass the
+    returned `next_cursor` as `cursor` for the next page; `include` adds heavy fields
+    such as the description.
+    """
+    if not job_search.ready:
+        raise HTTPException(status_code=503, detail="Job search index not built yet")
+    job_ids = None
+    if username is not None:
+        job_ids = [edge["job_id"] for edge in db[USER_JOBS_COLLECTION].find({"username": username}, {"job_id": 1})]
+
+    started = time.perf_counter()
+    job_search.refresh(jobs_collection)
+    filters = {"location": location, "field": field, "level": level, "type": job_type, "salary": salary}
+    try:
+        result = job_search.search(filters, skills=skills, job_ids=job_ids, sort=sort, cursor=cursor, limit=limit,
+                                   include=include, collection=jobs_collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    log_event(logger, "jobs_searched", level=logging.INFO, total=result["total"], returned=len(result["jobs"]),
+              ms=round((time.perf_counter() - started) * 1000, 2))
+    return result
+
+
+@app.get("/jobs/search/stats")
+def job_search_stats():
+    """Size and facet cardinalities of the job search index."""
+    return job_search.stats()
+
+
+@app.get("/jobs/sync")
+def job_sync_status():
+    """Mode, counters and lag of the job index sync."""
+    if job_scorer.serving_snapshot():
+        return {"mode": "snapshot", "path": JOB_SNAPSHOT_PATH, "stamp": job_scorer.content_stamp()}
+    if job_sync is None:
+        raise HTTPException(status_code=503, detail="Job index not built yet")
+    return job_sync.stats()
+
+
+@app.get("/jobs/lifecycle")
+def job_lifecycle_status():
+    """Last archival round and the size of the active and archived job sets."""
+    if job_lifecycle is None:
+        raise HTTPException(status_code=404, detail="Job archival is disabled")
+    return job_lifecycle.status()
+
+
 # ---------- Health / quick check ----------
 @app.get("/health")
 def health_check():
@@ -20,6 +20,7 @@ from docx import Document
 
 # Local imports
 from services.ingestion import text_preprocessing
+from utils.event_logging import log_event
 
 logger = logging.getLogger(__name__)
 
@@ -79,20 +80,19 @@ def extract_keywords_from_resume(text: str) -> Dict[str, Union[List[str], str]]:
     
     # Look for work experience sections (case insensitive)
     work_exp_pattern = r'(work\s*experience|kinh\s*nghi\u1ec7m\s*làm\s*vi\u1ec7c|kinh\s*nghi\u1ec7m|experience)(.*?)(?=education|h\u1ecdc v\u1ea5n|skills|k\u1ef9 n\u0103ng|$)'
-    logger.info(f"Searching for work experience section with pattern: {work_exp_pattern}")
+    log_event(logger, "work_experience_search", pattern=work_exp_pattern)
     work_exp_section = re.search(work_exp_pattern, text, re.IGNORECASE | re.DOTALL)
     
     if not work_exp_section:
-        logger.warning("No work experience section found in the text")
+        log_event(logger, "work_experience_missing", level=logging.WARNING)
     
     if work_exp_section:
         work_exp_text = work_exp_section.group(2)
-        logger.info(f"Found work experience section. Text length: {len(work_exp_text)} characters")
+        log_event(logger, "work_experience_found", length=len(work_exp_text))
         # Look for date patterns in work experience section (MM/YYYY - MM/YYYY or YYYY - YYYY)
         date_pattern = r'(?P<start>\d{1,2}/\d{4}|\d{4})\s*[-–]\s*(?P<end>\d{1,2}/\d{4}|\d{4}|nay|present|hiện\s*tại)'
-        logger.info(f"Searching for date patterns: {date_pattern}")
         date_matches = list(re.finditer(date_pattern, work_exp_text, re.IGNORECASE))
-        logger.info(f"Found {len(date_matches)} date patterns in work experience section")
+        log_event(logger, "date_patterns_found", pattern=date_pattern, count=len(date_matches))
         
         for match in date_matches:
             start_date = match.group('start')
@@ -126,20 +126,19 @@ def extract_keywords_from_resume(text: str) -> Dict[str, Union[List[str], str]]:
                         'years': round(delta_months / 12, 1)
                     }
                     work_experience.append(period_info)
-                    logger.debug(f"Found work period: {period_info}")
+                    log_event(logger, "work_period", period=period_info)
             except (ValueError, TypeError) as e:
-                logger.debug(f"Error parsing date range {start_date} - {end_date}: {e}")
+                log_event(logger, "work_period_unparsed", start=start_date, end=end_date, error=e)
                 continue
     
     # Calculate total experience considering overlapping periods
-    logger.info(f"Total work periods found: {len(work_periods)}")
+    log_event(logger, "work_periods_found", count=len(work_periods))
+    merged_periods = []
     if work_periods:
         # Sort periods by start date
         work_periods.sort(key=lambda x: x[0])
-        logger.info(f"Work periods after sorting: {work_periods}")
         
         # Merge overlapping periods
-        merged_periods = []
         for period in work_periods:
             if not merged_periods:
                 merged_periods.append(list(period))
@@ -156,11 +155,9 @@ def extract_keywords_from_resume(text: str) -> Dict[str, Union[List[str], str]]:
         
         # Calculate total months from merged periods
         total_months = 0
-        logger.info("Calculating total months from merged periods:")
-        for i, (start, end) in enumerate(merged_periods, 1):
+        for start, end in merged_periods:
             delta_months = (end.year - start.year) * 12 + (end.month - start.month)
             total_months += delta_months
-            logger.info(f"  Period {i}: {start.strftime('%m/%Y')} to {end.strftime('%m/%Y')} = {delta_months} months")
             
     # Calculate years and months
     total_years = total_months // 12
@@ -172,12 +169,11 @@ def extract_keywords_from_resume(text: str) -> Dict[str, Union[List[str], str]]:
     if remaining_months > 0 or total_years == 0:  # Show months if >0 or if no years
         total_experience.append(f"{remaining_months} tháng")
     
-    logger.info(f"Final calculation: {total_months} total months = {total_years} years and {remaining_months} months")
-    
     total_experience_str = ' '.join(total_experience) if total_experience else "Chưa có kinh nghiệm"
     experience_years = round(total_months / 12, 1)  # For backward compatibility
     
-    logger.info(f"Total work experience calculated: {total_months} months ({experience_years} years) - {total_experience_str}")
+    log_event(logger, "work_experience_total", months=total_months, years=experience_years,
+              periods=lambda: [(s.strftime('%m/%Y'), e.strftime('%m/%Y')) for s, e in merged_periods])
     
     def analyze_responsibilities(text: str) -> dict:
         """Analyze job responsibilities to determine experience level."""
@@ -235,7 +231,7 @@ def extract_keywords_from_resume(text: str) -> Dict[str, Union[List[str], str]]:
         level = 'intern/fresher'
     
     # Log the level determination
-    logger.info(f"Determined experience level: {level} based on {experience_years} years of experience and responsibility analysis")
+    log_event(logger, "experience_level", level=logging.INFO, experience_level=level, years=experience_years)
     
     # Prepare the result dictionary with basic fields
     result = {
@@ -253,6 +249,21 @@ def extract_keywords_from_resume(text: str) -> Dict[str, Union[List[str], str]]:
     
     return result
 
+def detect_language(text: str) -> str:
+    """Simple language detection ('vi', 'en' or 'unknown') based on common words."""
+    en_words = ['the', 'and', 'for', 'with', 'experience', 'education', 'skills', 'work']
+    vi_words = ['và', 'của', 'cho', 'với', 'kinh nghiệm', 'giáo dục', 'kỹ năng', 'công việc']
+
+    text_lower = text.lower()
+    en_count = sum(1 for word in en_words if word in text_lower)
+    vi_count = sum(1 for word in vi_words if word in text_lower)
+
+    if vi_count > en_count:
+        return 'vi'
+    elif en_count > 0:
+        return 'en'
+    return 'unknown'
+
 def extract_text_from_pdf(pdf_path: str) -> str:
     """Extract text from PDF using multiple methods for better accuracy."""
     text = ""
@@ -580,19 +591,7 @@ def process_resume(file_path: str) -> Tuple[str, Dict[str, Any]]:
                 'text_preview': cleaned_text[:500] + ('...' if len(cleaned_text) > 500 else '')
             })
             
-            # Simple language detection
-            en_words = ['the', 'and', 'for', 'with', 'experience', 'education', 'skills', 'work']
-            vi_words = ['và', 'của', 'cho', 'với', 'kinh nghiệm', 'giáo dục', 'kỹ năng', 'công việc']
-            
-            en_count = sum(1 for word in en_words if word in cleaned_text.lower())
-            vi_count = sum(1 for word in vi_words if word in cleaned_text.lower())
-            
-            if vi_count > en_count:
-                parsed_output['detected_language'] = 'vi'
-            elif en_count > 0:
-                parsed_output['detected_language'] = 'en'
-            else:
-                parsed_output['detected_language'] = 'unknown'
+            parsed_output['detected_language'] = detect_language(cleaned_text)
             
             logger.info(f"Successfully processed resume in {parsed_output['processing_time_seconds']} seconds")
             return cleaned_text, parsed_output
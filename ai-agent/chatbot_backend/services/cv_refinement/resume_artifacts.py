@@ -0,0 +1,105 @@
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from services.ingestion.text_preprocessing import text_processing
+from services.cv_refinement.keyword_extraction import extract_keywords_from_resume
+from services.cv_refinement.resume_features import (
+    build_resume_features, RESUME_FEATURES_VERSION, VOLATILE_RESUME_FEATURES
+)
+from services.cv_refinement.improvement_suggestion import suggest_resume_improvements
+from utils.artifact_graph import ArtifactGraph, ArtifactSpec, ArtifactRun, ArtifactUnavailableError
+from utils.event_logging import log_event
+
+logger = logging.getLogger(__name__)
+
+# Code versions of the individual builders (bump to invalidate stored outputs)
+CLEANED_TEXT_VERSION = 1
+KEYWORDS_VERSION = 1
+MATCH_PROFILE_VERSION = 1
+JOB_MATCHES_VERSION = 1
+IMPROVEMENTS_VERSION = 1
+
+
+def build_match_profile(features: dict) -> dict:
+    """The part of the resume features that job matching actually depends on."""
+    return {
+        "skills": sorted(features.get("skills", [])),
+        "job_titles": sorted(features.get("job_titles", [])),
+    }
+
+
+# raw_text -> cleaned_text -> keywords -> features -> match_profile -> job_matches
+#                         \-> improvements (LLM)
+RESUME_ARTIFACTS = ArtifactGraph([
+    ArtifactSpec("raw_text", [], 1),
+    ArtifactSpec("cleaned_text", ["raw_text"], CLEANED_TEXT_VERSION, text_processing, field="processed_text"),
+    ArtifactSpec("keywords", ["cleaned_text"], KEYWORDS_VERSION, extract_keywords_from_resume, field="parsed_output"),
+    ArtifactSpec("features", ["cleaned_text", "keywords"], RESUME_FEATURES_VERSION, build_resume_features,
+                 field="features", volatile=VOLATILE_RESUME_FEATURES),
+    ArtifactSpec("match_profile", ["features"], MATCH_PROFILE_VERSION, build_match_profile),
+    # Version stamp of the jobs corpus, provided by the caller
+    ArtifactSpec("jobs_version", [], 1),
+    # Builder supplied by the suggestion endpoint
+    ArtifactSpec("job_matches", ["match_profile", "jobs_version"], JOB_MATCHES_VERSION, field="job_matches"),
+    ArtifactSpec("improvement_model", [], 1),
+    ArtifactSpec(
+        "improvements", ["cleaned_text", "improvement_model"], IMPROVEMENTS_VERSION,
+        lambda text, model_name: suggest_resume_improvements(text, model_name=model_name),
+        field="improvements"
+    ),
+])
+
+
+def field_loader(collection, doc_id) -> Callable[[str], Any]:
+    """Load a single stored field of a `cvs` document on demand."""
+    def load(field: str) -> Any:
+        if doc_id is None:
+            return None
+        doc = collection.find_one({"_id": doc_id}, {field: 1}) or {}
+        for part in field.split("."):
+            doc = doc.get(part) if isinstance(doc, dict) else None
+        return doc
+    return load
+
+
+def resolve_resume_artifacts(collection, username: str, targets: list,
+                             provided: Optional[Dict[str, Any]] = None,
+                             builders: Optional[Dict[str, Callable]] = None) -> Optional[ArtifactRun]:
+    """
+    Bring the given artifacts of a user's CV up to date and persist whatever was rebuilt.
+
+    Returns:
+        The ArtifactRun, or None if the user has no stored CV.
+    """
+    doc = collection.find_one({"username": username}, {"artifacts": 1})
+    if not doc:
+        return None
+
+    run = RESUME_ARTIFACTS.run(
+        targets,
+        stored=doc.get("artifacts"),
+        provided=provided,
+        load=field_loader(collection, doc["_id"]),
+        builders=builders,
+    )
+    updates = run.updates()
+    if updates:
+        collection.update_one({"_id": doc["_id"]}, {"$set": updates})
+    log_event(logger, "resume_artifacts", username=username, report=run.report)
+    return run
+
+
+def get_resume_features(collection, username: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the stored features for a user's CV, recomputing them only when an input
+    or extractor version changed.
+
+    Returns:
+        The features dict, or None if the user has no CV with text.
+    """
+    try:
+        run = resolve_resume_artifacts(collection, username, ["features"])
+    except ArtifactUnavailableError as e:
+        logger.warning(f"Cannot resolve features for '{username}': {e}")
+        return None
+    return run.value("features") if run else None
@@ -0,0 +1,105 @@
+import re
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from services.cv_refinement.keyword_extraction import extract_keywords_from_resume, detect_language
+from services.cv_refinement.jobs_suggestion import extract_skills_from_text, extract_job_titles_from_resume
+from utils.text_normalization import normalize_skills
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever any extractor used below changes its output, so stored
+# features get recomputed lazily on the next read.
+RESUME_FEATURES_VERSION = 1
+# Features left out of the artifact output hash: it keys the match cache and the
+# match feeds, so a rebuild with the same content must keep it
+VOLATILE_RESUME_FEATURES = ("computed_at",)
+
+# Section header patterns (EN + VI). processed_text replaces non-ASCII
+# characters with '-', so the Vietnamese headers are matched loosely.
+SECTION_HEADERS = {
+    'summary': r'summary|profile|objective|career\s+objective|about\s+me|m.c\s+ti.u',
+    'experience': r'(?:work\s+)?experience|employment\s+history|work\s+history|kinh\s+nghi.{1,2}m(?:\s+l.m\s+vi.{1,2}c)?',
+    'education': r'education|h.c\s+v.n',
+    'skills': r'(?:technical\s+|soft\s+)?skills|k.{1,2}\s+n.ng',
+    'projects': r'projects?|d.{1,2}\s+.n',
+    'certificates': r'certifications?|certificates?|ch.{1,2}ng\s+ch.{1,2}',
+    'languages': r'languages|ngo.i\s+ng.{1,2}',
+}
+
+_SECTION_REGEX = re.compile(
+    r'(?im)^[ \t]*(?:' + '|'.join(f'(?P<{name}>{pattern})' for name, pattern in SECTION_HEADERS.items()) + r')[ \t]*:?[ \t]*$'
+)
+
+
+def detect_sections(text: str) -> Dict[str, Dict[str, int]]:
+    """
+    Locate the main CV sections by their header lines.
+
+    Returns:
+        Mapping of section name -> {"start": int, "end": int} character span,
+        where a section ends where the next detected header starts.
+    """
+    headers = []
+    for match in _SECTION_REGEX.finditer(text):
+        name = match.lastgroup
+        if name and all(name != seen for seen, _ in headers):
+            headers.append((name, match.start()))
+
+    sections = {}
+    for i, (name, start) in enumerate(headers):
+        end = headers[i + 1][1] if i + 1 < len(headers) else len(text)
+        sections[name] = {"start": start, "end": end}
+    return sections
+
+
+def build_resume_features(processed_text: str, parsed_output: Optional[dict] = None) -> Dict[str, Any]:
+    """
+    Compute the derived resume features used by the read endpoints.
+
+    Args:
+        processed_text: Cleaned resume text as stored in `cvs.processed_text`
+        parsed_output: Output of extract_keywords_from_resume, recomputed if missing
+
+    Returns:
+        Dictionary with normalized skills, job titles, level, sections, language and
+        the extractor version that produced them.
+    """
+    if parsed_output is None or 'level' not in parsed_output:
+        parsed_output = extract_keywords_from_resume(processed_text)
+
+    skills = normalize_skills(extract_skills_from_text(processed_text))
+    job_titles = sorted(extract_job_titles_from_resume(processed_text))
+
+    return {
+        "version": RESUME_FEATURES_VERSION,
+        "skills": skills,
+        "job_titles": job_titles,
+        "level": parsed_output.get('level', 'intern/fresher'),
+        "experience_years": parsed_output.get('experience_years', 0),
+        "sections": detect_sections(processed_text),
+        "language": parsed_output.get('detected_language') or detect_language(processed_text),
+        "computed_at": datetime.utcnow(),
+    }
+
+
+def build_match_features(text: str, level: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Skills, job titles and level of raw resume text, as build_resume_features
+    computes them, without the sections and language nothing scores on.
+
+    Args:
+        text: Resume text
+        level: Known experience level; extracted from the text if missing
+
+    Returns:
+        Dictionary with normalized skills, job titles and level.
+    """
+    if level is None:
+        level = extract_keywords_from_resume(text).get('level', 'intern/fresher')
+    return {
+        "skills": normalize_skills(extract_skills_from_text(text)),
+        "job_titles": sorted(extract_job_titles_from_resume(text)),
+        "level": level,
+    }
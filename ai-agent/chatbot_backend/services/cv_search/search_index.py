@@ -0,0 +1,668 @@
+# search_index.py
+"""
+Full-text search over stored resumes: a local inverted index of `cvs.processed_text`
+ranked with BM25.
+
+Term frequencies are weighted by the CV section a term occurs in (features.sections
+spans: a skill listed under "Skills" counts more than one mentioned in passing,
+BM25F-style) and every posting keeps a bitmask of those sections, so results say
+where the query matched and a search can be restricted to one section.
+
+The index is a list of immutable segments plus the resumes indexed since the last
+flush. Each segment stores its posting lists as flat arrays (term -> slice of doc
+numbers, weighted frequencies and section masks); a query accumulates BM25 scores
+per segment in one dense NumPy array and keeps the top hits with argpartition.
+Replacing or deleting a resume only marks its old document deleted; every
+FLUSH_SIZE indexed resumes the pending ones become a new segment, and beyond
+MAX_SEGMENTS the MERGE_FACTOR smallest segments are merged (dropping deleted
+documents), in a background thread.
+
+Segments are persisted under CV_SEARCH_DIR as `.npy` files, memory-mapped on load
+so the workers of a host share their pages. One process per host writes them
+(elected with an flock, as for job snapshots); the others load them read-only and
+keep their own updates in memory. On startup, resumes uploaded since the persisted
+watermark are re-indexed and resumes deleted meanwhile are dropped; during operation
+`refresh` catches up with uploads and deletes handled by other workers.
+"""
+import os
+import json
+import math
+import time
+import fcntl
+import bisect
+import shutil
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.cv_refinement.resume_artifacts import CLEANED_TEXT_VERSION
+from services.cv_refinement.resume_features import SECTION_HEADERS, RESUME_FEATURES_VERSION
+from services.cv_search.tokenizer import query_groups, tokenize_document
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever tokenization or the segment layout changes (persisted indexes are rebuilt)
+INDEX_FORMAT_VERSION = 1
+# BM25 term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+# Bit i of a posting's section mask stands for SECTIONS[i]
+SECTIONS = list(SECTION_HEADERS)
+# Term frequency weight of an occurrence in each section (1.0 elsewhere)
+SECTION_WEIGHTS = {"skills": 2.0, "experience": 1.5, "projects": 1.5, "summary": 1.2}
+# Pending resumes turned into a segment at once
+FLUSH_SIZE = 500
+# Segments beyond which the smallest ones get merged
+MAX_SEGMENTS = 8
+# Segments merged at once
+MERGE_FACTOR = 4
+# Minimum seconds between two catch-ups with the `cvs` collection
+REFRESH_INTERVAL = 30
+# Uploads are re-read this far before the watermark (clock skew between workers)
+SYNC_OVERLAP = timedelta(seconds=30)
+# Resumes read per batch when (re)building from the collection
+BUILD_BATCH_SIZE = 1000
+# Maximum results per page
+MAX_PAGE_SIZE = 100
+
+MANIFEST = "manifest.json"
+_ARRAYS = ("lengths", "offsets", "docs", "weights", "factors", "masks")
+_CV_PROJECTION = {"username": 1, "processed_text": 1, "features.sections": 1, "uploaded_at": 1}
+_SECTION_BITS = {name: 1 << i for i, name in enumerate(SECTIONS)}
+
+
+def analyze_resume(text: str, sections: Optional[Dict[str, Dict[str, int]]]) -> Tuple[Dict[str, list], float]:
+    """
+    Weighted term frequencies of a resume.
+
+    Args:
+        text: The resume's processed_text
+        sections: Its detected section spans (features.sections)
+
+    Returns:
+        Tuple of (term -> [weighted frequency, section mask], weighted length).
+    """
+    spans = sorted((span["start"], span["end"], name) for name, span in (sections or {}).items() if name in _SECTION_BITS)
+    starts = [start for start, _, _ in spans]
+    terms: Dict[str, list] = {}
+    length = 0.0
+    for term, offset in tokenize_document(text or ""):
+        weight, bit = 1.0, 0
+        i = bisect.bisect_right(starts, offset) - 1
+        if i >= 0 and offset < spans[i][1]:
+            weight, bit = SECTION_WEIGHTS.get(spans[i][2], 1.0), _SECTION_BITS[spans[i][2]]
+        entry = terms.get(term)
+        if entry is None:
+            terms[term] = [weight, bit]
+        else:
+            entry[0] += weight
+            entry[1] |= bit
+        length += weight
+    return terms, length
+
+
+class Segment:
+    """
+    Posting lists of a fixed set of resumes. Only `deleted` ever changes; the other
+    arrays may be memory-mapped from disk.
+
+    Next to its weighted frequency, every posting stores its BM25 term frequency
+    factor, w * (K1 + 1) / (w + K1 * (1 - B + B * length / avgdl)), computed with the
+    average length when the segment was built; a query only multiplies it by the idf.
+    """
+
+    def __init__(self, usernames: List[str], lengths: np.ndarray, avgdl: float, terms: List[str], offsets: np.ndarray,
+                 docs: np.ndarray, weights: np.ndarray, factors: np.ndarray, masks: np.ndarray,
+                 name: Optional[str] = None):
+        self.usernames = usernames
+        self.lengths = lengths
+        self.avgdl = avgdl
+        self.term_list = terms
+        self.terms = {term: i for i, term in enumerate(terms)}
+        # term i -> docs/weights/factors/masks[offsets[i]:offsets[i + 1]], by increasing doc number
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+        self.factors = factors
+        self.masks = masks
+        self.deleted = np.zeros(len(usernames), dtype=bool)
+        self.name = name
+
+    def __len__(self) -> int:
+        return len(self.usernames)
+
+    def live(self) -> int:
+        return len(self) - int(np.count_nonzero(self.deleted))
+
+    def df(self, term: str) -> int:
+        i = self.terms.get(term)
+        return 0 if i is None else int(self.offsets[i + 1] - self.offsets[i])
+
+    def _slice(self, term: str) -> Optional[slice]:
+        i = self.terms.get(term)
+        return None if i is None else slice(self.offsets[i], self.offsets[i + 1])
+
+    @classmethod
+    def build(cls, usernames: List[str], lengths: np.ndarray, avgdl: float, terms: List[str], term_ids: np.ndarray,
+              docs: np.ndarray, weights: np.ndarray, masks: np.ndarray) -> "Segment":
+        """Segment from unordered (term id, doc, weight, mask) postings; terms without postings are dropped."""
+        counts = np.bincount(term_ids, minlength=len(terms))
+        used = counts > 0
+        if not used.all():
+            term_ids = (np.cumsum(used) - 1)[term_ids]
+            terms = [term for term, keep in zip(terms, used) if keep]
+            counts = counts[used]
+        order = np.lexsort((docs, term_ids))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        lengths = np.asarray(lengths, dtype=np.float32)
+        docs = docs[order].astype(np.int32)
+        weights = weights[order].astype(np.float32)
+        norm = K1 * (1 - B + B * lengths / np.float32(avgdl))
+        factors = weights * np.float32(K1 + 1) / (weights + norm[docs])
+        return cls(usernames, lengths, avgdl, terms, offsets, docs, weights, factors.astype(np.float32),
+                   masks[order].astype(np.uint8))
+
+    @classmethod
+    def merge(cls, segments: List["Segment"], deleted: List[np.ndarray], avgdl: float) -> "Segment":
+        """One segment with the documents of `segments` not flagged in `deleted` (one mask per segment)."""
+        vocab: Dict[str, int] = {}
+        usernames, lengths, parts = [], [], []
+        for segment, dead in zip(segments, deleted):
+            alive = ~dead
+            numbers = np.full(len(segment), -1, dtype=np.int64)
+            numbers[alive] = np.arange(len(usernames), len(usernames) + int(np.count_nonzero(alive)))
+            usernames += [username for username, keep in zip(segment.usernames, alive) if keep]
+            lengths.append(np.asarray(segment.lengths)[alive])
+            term_map = np.fromiter((vocab.setdefault(term, len(vocab)) for term in segment.term_list),
+                                   dtype=np.int64, count=len(segment.term_list))
+            term_ids = np.repeat(term_map, np.diff(segment.offsets))
+            docs = numbers[segment.docs]
+            keep = docs >= 0
+            parts.append((term_ids[keep], docs[keep], np.asarray(segment.weights)[keep], np.asarray(segment.masks)[keep]))
+        columns = [np.concatenate([part[i] for part in parts]) for i in range(4)]
+        return cls.build(usernames, np.concatenate(lengths), avgdl, list(vocab), *columns)
+
+    def save(self, path: str):
+        """Write the segment to directory `path` (atomically; deletions live in the manifest)."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for array in _ARRAYS:
+            np.save(os.path.join(tmp_path, f"{array}.npy"), getattr(self, array))
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump({"avgdl": self.avgdl, "terms": self.term_list, "usernames": self.usernames}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, name: str) -> "Segment":
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {array: np.load(os.path.join(path, f"{array}.npy"), mmap_mode="r") for array in _ARRAYS}
+        return cls(meta["usernames"], arrays["lengths"], meta["avgdl"], meta["terms"], arrays["offsets"],
+                   arrays["docs"], arrays["weights"], arrays["factors"], arrays["masks"], name=name)
+
+    def score(self, groups: List[List[str]], idf: Dict[str, float], section_bit: int = 0) -> np.ndarray:
+        """
+        BM25 score of every document. Each group adds the score of its best matching
+        term (alternative spellings of one query word); with `section_bit`, only
+        occurrences in that section count.
+        """
+        docs, contributions = [], []
+        best = None
+        for group in groups:
+            for term in group:
+                span = self._slice(term)
+                if span is None:
+                    continue
+                term_docs, term_factors = self.docs[span], self.factors[span]
+                if section_bit:
+                    keep = (self.masks[span] & section_bit) != 0
+                    term_docs, term_factors = term_docs[keep], term_factors[keep]
+                contribution = term_factors * np.float32(idf[term])
+                if len(group) == 1:
+                    docs.append(term_docs)
+                    contributions.append(contribution)
+                else:
+                    if best is None:
+                        best = np.zeros(len(self), dtype=np.float32)
+                    best[term_docs] = np.maximum(best[term_docs], contribution)
+            if best is not None:
+                docs.append(np.flatnonzero(best))
+                contributions.append(best[docs[-1]])
+                best = None
+        if not docs:
+            return np.zeros(len(self), dtype=np.float64)
+        # One pass summing the postings of every query word
+        return np.bincount(np.concatenate(docs), weights=np.concatenate(contributions), minlength=len(self))
+
+    def matched_sections(self, number: int, terms: Iterable[str]) -> int:
+        """Section mask of the occurrences of `terms` in one document."""
+        mask = 0
+        for term in terms:
+            span = self._slice(term)
+            if span is None:
+                continue
+            docs = self.docs[span]
+            i = int(np.searchsorted(docs, number))
+            if i < len(docs) and docs[i] == number:
+                mask |= int(self.masks[span][i])
+        return mask
+
+
+class _PendingResumes:
+    """Resumes indexed since the last flush, served as a (rebuilt on change) segment."""
+
+    def __init__(self):
+        # username -> (terms, weights, masks, length, uploaded_at)
+        self.docs: Dict[str, tuple] = {}
+        self._segment: Optional[Segment] = None
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, username: str, terms: Dict[str, list], length: float, uploaded_at: Optional[datetime]):
+        values = list(terms.values())
+        self.docs[username] = (list(terms), np.array([value[0] for value in values], dtype=np.float32),
+                               np.array([value[1] for value in values], dtype=np.uint8), length, uploaded_at)
+        self._segment = None
+
+    def remove(self, username: str) -> Optional[float]:
+        """Drop a pending resume; returns its length, or None if it was not pending."""
+        doc = self.docs.pop(username, None)
+        if doc is None:
+            return None
+        self._segment = None
+        return doc[3]
+
+    def oldest_upload(self) -> Optional[datetime]:
+        return min((doc[4] for doc in self.docs.values() if doc[4] is not None), default=None)
+
+    def segment(self, avgdl: float) -> Segment:
+        if self._segment is None:
+            vocab: Dict[str, int] = {}
+            term_ids, docs = [], []
+            for number, (terms, _, _, _, _) in enumerate(self.docs.values()):
+                term_ids.append(np.fromiter((vocab.setdefault(term, len(vocab)) for term in terms),
+                                            dtype=np.int64, count=len(terms)))
+                docs.append(np.full(len(terms), number, dtype=np.int32))
+            values = list(self.docs.values())
+            self._segment = Segment.build(
+                list(self.docs), np.array([doc[3] for doc in values], dtype=np.float32), avgdl, list(vocab),
+                np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int64),
+                np.concatenate(docs) if docs else np.zeros(0, dtype=np.int32),
+                np.concatenate([doc[1] for doc in values]) if values else np.zeros(0, dtype=np.float32),
+                np.concatenate([doc[2] for doc in values]) if values else np.zeros(0, dtype=np.uint8),
+            )
+        return self._segment
+
+
+class ResumeSearchIndex:
+    """
+    BM25 index of the `cvs` collection.
+
+    Args:
+        path: Directory the segments are persisted to (None to keep them in memory only)
+        refresh_interval: Minimum seconds between two catch-ups with the collection
+    """
+
+    def __init__(self, path: Optional[str] = None, refresh_interval: float = REFRESH_INTERVAL):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.segments: List[Segment] = []
+        self._pending = _PendingResumes()
+        # username -> (segment, doc number) of the live document of every flushed resume
+        self._locations: Dict[str, Tuple[Segment, int]] = {}
+        self._uploaded: Dict[str, Optional[datetime]] = {}
+        self._live = 0
+        self._total_length = 0.0
+        self._watermark: Optional[datetime] = None
+        self._next_segment = 0
+        self._lock = threading.RLock()
+        # Serializes merges and persistence (queries and updates only take _lock briefly)
+        self._flush_lock = threading.Lock()
+        self._maintaining = False
+        self._lock_file = None
+        self._last_refresh = 0.0
+        self.ready = False
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _avgdl(self) -> float:
+        return max(self._total_length / max(1, self._live), 1.0)
+
+    # ---------- Writes ----------
+
+    def upsert_many(self, cvs: Iterable[dict]) -> int:
+        """Index (or re-index) CV documents (username, processed_text, features.sections, uploaded_at)."""
+        analyzed = [(cv["username"], *analyze_resume(cv.get("processed_text"), (cv.get("features") or {}).get("sections")),
+                     cv.get("uploaded_at")) for cv in cvs if cv.get("username")]
+        if not analyzed:
+            return 0
+        with self._lock:
+            for username, terms, length, uploaded_at in analyzed:
+                self._delete(username)
+                self._pending.add(username, terms, length, uploaded_at)
+                self._uploaded[username] = uploaded_at
+                self._live += 1
+                self._total_length += length
+                if uploaded_at is not None and (self._watermark is None or uploaded_at > self._watermark):
+                    self._watermark = uploaded_at
+            # Build the pending segment here, not in the next query
+            self._pending.segment(self._avgdl())
+            if len(self._pending) >= FLUSH_SIZE:
+                self._schedule_maintenance()
+        return len(analyzed)
+
+    def update(self, collection, username: str):
+        """Re-index one user's stored CV (after an upload); errors are logged, `refresh` repairs them."""
+        try:
+            cv = collection.find_one({"username": username}, _CV_PROJECTION)
+            if cv:
+                self.upsert_many([cv])
+            else:
+                self.remove(username)
+        except Exception as e:
+            logger.error(f"Resume search indexing failed for '{username}': {e}")
+
+    def remove(self, username: str) -> bool:
+        with self._lock:
+            removed = self._delete(username)
+            self._uploaded.pop(username, None)
+            self._pending.segment(self._avgdl())
+        return removed
+
+    def _delete(self, username: str) -> bool:
+        length = self._pending.remove(username)
+        if length is None:
+            location = self._locations.pop(username, None)
+            if location is None:
+                return False
+            segment, number = location
+            segment.deleted[number] = True
+            length = float(segment.lengths[number])
+        self._live -= 1
+        self._total_length -= length
+        return True
+
+    def _schedule_maintenance(self):
+        if not self._maintaining:
+            self._maintaining = True
+            threading.Thread(target=self._maintain, name="resume-search-maintenance", daemon=True).start()
+
+    def _maintain(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Resume search index maintenance failed: {e}")
+        finally:
+            self._maintaining = False
+
+    def flush(self):
+        """Turn the pending resumes into a segment, merge small segments and persist."""
+        with self._lock:
+            if len(self._pending):
+                segment = self._pending.segment(self._avgdl())
+                for number, username in enumerate(segment.usernames):
+                    self._locations[username] = (segment, number)
+                self.segments.append(segment)
+                self._pending = _PendingResumes()
+                self._pending.segment(self._avgdl())
+        with self._flush_lock:
+            while self._merge_smallest():
+                pass
+            if self._leads():
+                self._persist()
+
+    def close(self):
+        """Flush and persist the pending resumes (on shutdown)."""
+        if self.ready:
+            self.flush()
+
+    def _merge_smallest(self) -> bool:
+        with self._lock:
+            if len(self.segments) <= MAX_SEGMENTS:
+                return False
+            sources = sorted(self.segments, key=Segment.live)[:MERGE_FACTOR]
+            deleted = [segment.deleted.copy() for segment in sources]
+        started = time.perf_counter()
+        merged = Segment.merge(sources, deleted, self._avgdl())
+        with self._lock:
+            # Resumes replaced or deleted while merging
+            numbers = {username: number for number, username in enumerate(merged.usernames)}
+            for segment, before in zip(sources, deleted):
+                for number in np.flatnonzero(segment.deleted & ~before):
+                    merged.deleted[numbers[segment.usernames[number]]] = True
+            for number, username in enumerate(merged.usernames):
+                if not merged.deleted[number]:
+                    self._locations[username] = (merged, number)
+            self.segments = [segment for segment in self.segments if all(segment is not s for s in sources)] + [merged]
+        logger.info(f"Resume search segments merged: {len(sources)} -> {len(merged)} resumes "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return True
+
+    # ---------- Persistence ----------
+
+    def _leads(self) -> bool:
+        """Whether this process writes the persisted index (one per host, elected with an flock)."""
+        if self.path is None:
+            return False
+        if self._lock_file is None:
+            os.makedirs(self.path, exist_ok=True)
+            lock_file = open(os.path.join(self.path, "write.lock"), "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._lock_file = lock_file
+            logger.info(f"Persisting the resume search index to {self.path} from process {os.getpid()}")
+        return True
+
+    @staticmethod
+    def _versions() -> Dict[str, int]:
+        return {"format": INDEX_FORMAT_VERSION, "cleaned_text": CLEANED_TEXT_VERSION, "features": RESUME_FEATURES_VERSION}
+
+    def _persist(self):
+        with self._lock:
+            segments = list(self.segments)
+            deleted = [np.flatnonzero(segment.deleted).tolist() for segment in segments]
+            # Pending resumes are not persisted: re-read them from the collection on restart
+            oldest_pending = self._pending.oldest_upload()
+            watermark = oldest_pending if oldest_pending is not None else self._watermark
+        for segment in segments:
+            if segment.name is None:
+                name = f"segment-{self._next_segment:06d}"
+                self._next_segment += 1
+                segment.save(os.path.join(self.path, name))
+                segment.name = name
+        manifest = {
+            "versions": self._versions(),
+            "watermark": watermark.isoformat() if watermark else None,
+            "next_segment": self._next_segment,
+            "segments": [{"name": segment.name, "deleted": dead} for segment, dead in zip(segments, deleted)],
+        }
+        tmp_path = os.path.join(self.path, f"{MANIFEST}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST))
+        # Segments merged away (readers that mapped them keep their mapping)
+        names = {segment.name for segment in segments}
+        for entry in os.listdir(self.path):
+            if entry.startswith("segment-") and entry not in names:
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+    def _load(self) -> bool:
+        """Load the persisted segments; False if there are none usable."""
+        manifest_path = os.path.join(self.path, MANIFEST) if self.path else None
+        if manifest_path is None or not os.path.exists(manifest_path):
+            return False
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get("versions") != self._versions():
+                logger.info(f"Resume search index at {self.path} was built by another version, rebuilding")
+                return False
+            segments = []
+            for entry in manifest["segments"]:
+                segment = Segment.load(os.path.join(self.path, entry["name"]), entry["name"])
+                segment.deleted[entry["deleted"]] = True
+                segments.append(segment)
+        except Exception as e:
+            logger.warning(f"Resume search index at {self.path} cannot be loaded, rebuilding: {e}")
+            return False
+
+        with self._lock:
+            for segment in segments:
+                for number in np.flatnonzero(~segment.deleted):
+                    username = segment.usernames[number]
+                    if username in self._locations:
+                        self._delete(username)
+                    self._locations[username] = (segment, int(number))
+                    self._live += 1
+                    self._total_length += float(segment.lengths[number])
+            self.segments = segments
+            self._next_segment = manifest["next_segment"]
+            self._watermark = datetime.fromisoformat(manifest["watermark"]) if manifest["watermark"] else None
+        return True
+
+    # ---------- Sync with the collection ----------
+
+    def open(self, collection):
+        """Load the persisted index (or build it from the collection) and catch up with the collection."""
+        started = time.perf_counter()
+        loaded = self._load()
+        if not loaded:
+            self.build(collection)
+        self._catch_up(collection, full=True)
+        self.ready = True
+        logger.info(f"Resume search index {'loaded' if loaded else 'built'}: {self._live} resumes in "
+                    f"{len(self.segments)} segments in {time.perf_counter() - started:.2f}s")
+        with self._flush_lock:
+            if self._leads():
+                self._persist()
+
+    def build(self, collection):
+        """Index every stored CV (in place of the loaded segments)."""
+        batch = []
+        for cv in collection.find({}, _CV_PROJECTION).sort("_id", 1).batch_size(BUILD_BATCH_SIZE):
+            batch.append(cv)
+            if len(batch) >= BUILD_BATCH_SIZE:
+                self._build_batch(batch)
+                batch = []
+        if batch:
+            self._build_batch(batch)
+
+    def _build_batch(self, batch: List[dict]):
+        with self._lock:
+            # No background maintenance while building: flush inline
+            self._maintaining = True
+        try:
+            self.upsert_many(batch)
+            if len(self._pending) >= FLUSH_SIZE:
+                self.flush()
+        finally:
+            self._maintaining = False
+
+    def refresh(self, collection, force: bool = False) -> int:
+        """
+        At most every refresh_interval seconds (unless `force`), index the CVs uploaded
+        since the watermark and drop deleted ones, handled by other workers.
+
+        Returns:
+            Number of re-indexed resumes.
+        """
+        now = time.monotonic()
+        if not self.ready or (not force and now - self._last_refresh < self.refresh_interval):
+            return 0
+        self._last_refresh = now
+        return self._catch_up(collection)
+
+    def _catch_up(self, collection, full: bool = False) -> int:
+        query = {"uploaded_at": {"$gte": self._watermark - SYNC_OVERLAP}} if self._watermark else {}
+        changed = [cv for cv in collection.find(query, _CV_PROJECTION)
+                   if full or self._uploaded.get(cv["username"], 0) != cv.get("uploaded_at")]
+        indexed = self.upsert_many(changed)
+        if full or collection.estimated_document_count() != self._live:
+            stored = {cv["username"] for cv in collection.find({}, {"username": 1})}
+            with self._lock:
+                known = set(self._locations) | set(self._pending.docs)
+            for username in known - stored:
+                self.remove(username)
+            # CVs older than the watermark that this index never saw
+            missing = list(stored - known - {cv["username"] for cv in changed})
+            if missing:
+                indexed += self.upsert_many(collection.find({"username": {"$in": missing}}, _CV_PROJECTION))
+        if indexed:
+            logger.info(f"Resume search index caught up: {indexed} resumes re-indexed")
+        return indexed
+
+    # ---------- Queries ----------
+
+    def search(self, query: str, offset: int = 0, limit: int = 20,
+               section: Optional[str] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Resumes matching a free-text query, best BM25 score first.
+
+        Args:
+            query: Free text (diacritics optional)
+            offset: Results to skip (paging)
+            limit: Maximum results
+            section: Only count query words occurring in this CV section
+
+        Returns:
+            Tuple of (number of matching resumes, page of {username, score, matched_sections}).
+        """
+        groups = query_groups(query)
+        if not groups or limit <= 0:
+            return 0, []
+        section_bit = _SECTION_BITS[section] if section else 0
+        with self._lock:
+            segments = [*self.segments, self._pending.segment(self._avgdl())]
+            count = max(1, self._live)
+
+        idf = {}
+        for group in groups:
+            for term in group:
+                df = sum(segment.df(term) for segment in segments)
+                idf[term] = math.log(1 + (count - df + 0.5) / (df + 0.5))
+
+        k = offset + limit
+        total, hits = 0, []
+        for segment in segments:
+            if not len(segment):
+                continue
+            scores = segment.score(groups, idf, section_bit)
+            matched = np.flatnonzero((scores > 0) & ~segment.deleted)
+            total += len(matched)
+            if len(matched) > k:
+                matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            hits += [(float(scores[number]), segment.usernames[number], segment, int(number)) for number in matched]
+        hits.sort(key=lambda hit: (-hit[0], hit[1]))
+
+        terms = [term for group in groups for term in group]
+        results = []
+        for score, username, segment, number in hits[offset:k]:
+            mask = segment.matched_sections(number, terms)
+            results.append({
+                "username": username,
+                "score": round(score, 4),
+                "matched_sections": [name for name, bit in _SECTION_BITS.items() if mask & bit],
+            })
+        return total, results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "resumes": self._live,
+                "segments": len(self.segments),
+                "pending": len(self._pending),
+                "terms": sum(len(segment.term_list) for segment in self.segments),
+                "watermark": self._watermark,
+                "persisted": self._lock_file is not None,
+            }
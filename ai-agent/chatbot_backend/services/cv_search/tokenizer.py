@@ -0,0 +1,76 @@
+# tokenizer.py
+"""
+Tokenization of resumes and search queries for the resume search index.
+
+Resumes are folded (lowercase, no diacritics) before tokenizing, so 'Kinh nghiệm'
+and 'kinh nghiem' index the same terms. `processed_text` itself replaces every
+non-ASCII character with '-' (text_preprocessing.text_processing), so a Vietnamese
+word stored there reads 'nghi-m'; a query word with diacritics therefore searches
+both its folded form ('nghiem') and that masked form.
+
+Compound tokens ('node.js', 'front-end', 'nghi-m') are indexed whole and, on the
+resume side only, as their parts too, so a query for 'node' finds 'node.js'.
+"""
+import re
+import unicodedata
+from typing import Iterator, List, Tuple
+
+from utils.text_normalization import fold_diacritics
+
+# Words, keeping '+'/'#' ('c++', 'c#') and inner '.'/'-' ('node.js', 'front-end')
+_WORD = re.compile(r"[^\W_][\w+#]*(?:[.\-]+[^\W_][\w+#]*)*")
+_PART_SEPARATOR = re.compile(r"[.\-]+")
+# Characters text_processing replaces with '-' (the complement of its allowed set)
+_MASKED_CHARS = re.compile(r"[^a-zA-Z0-9.,?!'\":;()\-\[\]{}<>_+\=\/&%$#@*`~\|\\\s]")
+
+# Minimum length of the parts of a compound token that get indexed on their own
+MIN_PART_LENGTH = 2
+
+# Words too common to be worth a posting list (English and folded Vietnamese)
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on",
+    "or", "the", "to", "with", "was", "were", "this", "that", "my", "i",
+    "va", "cua", "cac", "nhung", "cho", "voi", "la", "trong", "tai", "mot", "duoc", "co",
+})
+
+
+def compound_terms(token: str) -> List[str]:
+    """A folded token and, when it is compound, its parts."""
+    terms = [token]
+    if "." in token or "-" in token:
+        terms += [part for part in _PART_SEPARATOR.split(token) if len(part) >= MIN_PART_LENGTH or part.isdigit()]
+    return [term for term in terms if term not in STOPWORDS]
+
+
+def tokenize_document(text: str) -> Iterator[Tuple[str, int]]:
+    """
+    Index terms of a resume text.
+
+    Yields:
+        (term, character offset of its token in `text`), offsets being those of the
+        unfolded text so they line up with the detected section spans.
+    """
+    for match in _WORD.finditer(text):
+        for term in compound_terms(fold_diacritics(match.group().lower())):
+            yield term, match.start()
+
+
+def query_groups(query: str) -> List[List[str]]:
+    """
+    Terms of a search query, one group per query word: the folded word and, for words
+    with diacritics, the word as processed_text stores it. A resume is credited with
+    the best matching term of each group.
+    """
+    groups = []
+    for word in _WORD.findall(unicodedata.normalize("NFC", query).lower()):
+        folded = fold_diacritics(word)
+        if folded in STOPWORDS:
+            continue
+        group = [folded]
+        if not word.isascii():
+            masked = _WORD.findall(_MASKED_CHARS.sub("-", word))
+            group += [term for term in masked
+                      if len(term) >= MIN_PART_LENGTH and term not in group and term not in STOPWORDS]
+        if group not in groups:
+            groups.append(group)
+    return groups
@@ -23,6 +23,42 @@ def extract_text_from_pdf(pdf_path: str) -> str:
         logger.error(f"Error extracting text from PDF {pdf_path}: {str(e)}")
         raise
 
+def extract_text(file_path: str) -> str:
+    """
+    Extract the raw (not yet preprocessed) text of a resume file.
+
+    Args:
+        file_path: Path to the resume file (PDF or image)
+
+    Returns:
+        Raw OCR text of the file
+    """
+    if file_path.lower().endswith('.pdf'):
+        text = extract_text_from_pdf(file_path)
+    else:
+        # Assume it's an image and use OCR
+        # Create a temporary directory for the image
+        temp_img_dir = "temp_img"
+        temp_ocr_dir = "temp_ocr"
+        os.makedirs(temp_img_dir, exist_ok=True)
+        os.makedirs(temp_ocr_dir, exist_ok=True)
+
+        # Copy the image to the temp directory
+        import shutil
+        import uuid
+        temp_img_path = os.path.join(temp_img_dir, f"{str(uuid.uuid4())}.png")
+        shutil.copy2(file_path, temp_img_path)
+
+        # Apply OCR and clean up
+        text = ocr.applyOCR(temp_img_dir, temp_ocr_dir)
+        shutil.rmtree(temp_img_dir, ignore_errors=True)
+        shutil.rmtree(temp_ocr_dir, ignore_errors=True)
+
+    if not text.strip():
+        raise ValueError("No text could be extracted from the file")
+
+    return text
+
 def process_resume(file_path: str) -> tuple[str, dict]:
     """
     Main pipeline function to process a resume file.
@@ -37,29 +73,7 @@ def process_resume(file_path: str) -> tuple[str, dict]:
     """
     try:
         # Step 1: Extract text from the file
-        if file_path.lower().endswith('.pdf'):
-            text = extract_text_from_pdf(file_path)
-        else:
-            # Assume it's an image and use OCR
-            # Create a temporary directory for the image
-            temp_img_dir = "temp_img"
-            temp_ocr_dir = "temp_ocr"
-            os.makedirs(temp_img_dir, exist_ok=True)
-            os.makedirs(temp_ocr_dir, exist_ok=True)
-            
-            # Copy the image to the temp directory
-            import shutil
-            import uuid
-            temp_img_path = os.path.join(temp_img_dir, f"{str(uuid.uuid4())}.png")
-            shutil.copy2(file_path, temp_img_path)
-            
-            # Apply OCR and clean up
-            text = ocr.applyOCR(temp_img_dir, temp_ocr_dir)
-            shutil.rmtree(temp_img_dir, ignore_errors=True)
-            shutil.rmtree(temp_ocr_dir, ignore_errors=True)
-        
-        if not text.strip():
-            raise ValueError("No text could be extracted from the file")
+        text = extract_text(file_path)
         
         # Step 2: Preprocess the extracted text
         cleaned_text = text_preprocessing.text_processing(text)
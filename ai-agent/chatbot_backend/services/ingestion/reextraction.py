@@ -0,0 +1,219 @@
+# reextraction.py
+"""
+Background re-extraction of stored CVs.
+
+`parsed_output` and `features` are written once at upload time, so extractor
+improvements only reach new uploads. This migrator streams the `cvs` collection,
+recomputes the artifacts whose extractor version changed from the stored
+`processed_text` in worker processes and writes them back in batches. Progress is
+checkpointed in the `migrations` collection so an interrupted run resumes where it
+stopped.
+
+Usage:
+    python -m services.ingestion.reextraction --workers 4 --batch-size 100 --max-rate 50
+"""
+import os
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import MongoClient, UpdateOne, ReturnDocument
+from dotenv import load_dotenv
+
+from services.cv_refinement.resume_artifacts import RESUME_ARTIFACTS, KEYWORDS_VERSION
+from services.cv_refinement.resume_features import RESUME_FEATURES_VERSION
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "CVProject"
+CVS_COLLECTION = "cvs"
+MIGRATIONS_COLLECTION = "migrations"
+
+# Artifacts recomputed by the migrator
+TARGETS = ["features"]
+
+# A run whose heartbeat is older than this is considered crashed and can be taken over
+STALE_RUN_AFTER = timedelta(minutes=10)
+
+_PROJECTION = {"processed_text": 1, "parsed_output": 1, "features": 1, "artifacts": 1, "uploaded_at": 1}
+
+
+def migration_id() -> str:
+    """Id of the migration for the current extractor versions."""
+    return f"reextract-k{KEYWORDS_VERSION}-f{RESUME_FEATURES_VERSION}"
+
+
+def stale_query() -> Dict[str, Any]:
+    """CVs whose stored keywords or features were produced by an older extractor."""
+    return {
+        "processed_text": {"$exists": True, "$ne": ""},
+        "$or": [
+            {"artifacts.keywords.version": {"$ne": KEYWORDS_VERSION}},
+            {"artifacts.features.version": {"$ne": RESUME_FEATURES_VERSION}},
+        ],
+    }
+
+
+def reextract_document(doc: dict) -> Tuple[Any, Optional[dict], Optional[str]]:
+    """
+    Recompute the outdated artifacts of one CV document (runs in a worker process).
+
+    Returns:
+        Tuple of (_id, `$set` updates or None, error message or None)
+    """
+    try:
+        run = RESUME_ARTIFACTS.run(
+            TARGETS,
+            stored=doc.get("artifacts"),
+            load=lambda field: doc.get(field),
+        )
+        return doc["_id"], run.updates(), None
+    except Exception as e:
+        return doc["_id"], None, str(e)
+
+
+def _claim(migrations, run_id: str, force: bool) -> Optional[dict]:
+    """Mark the migration as running unless another live run holds it; returns the checkpoint."""
+    now = datetime.utcnow()
+    checkpoint = migrations.find_one({"_id": run_id})
+    if checkpoint:
+        if checkpoint.get("status") == "completed" and not force:
+            logger.info(f"Migration '{run_id}' already completed")
+            return None
+        if checkpoint.get("status") == "running" and checkpoint.get("heartbeat_at", now) > now - STALE_RUN_AFTER:
+            logger.warning(f"Migration '{run_id}' is already running (heartbeat {checkpoint['heartbeat_at']})")
+            return None
+
+    reset = {"last_id": None, "processed": 0, "updated": 0, "failed": 0} if force or not checkpoint else {}
+    return migrations.find_one_and_update(
+        {"_id": run_id},
+        {
+            "$set": {"status": "running", "heartbeat_at": now, "error": None, **reset},
+            "$setOnInsert": {"started_at": now},
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def run_reextraction(db, workers: int = 4, batch_size: int = 100,
+                     max_rate: Optional[float] = None, force: bool = False) -> Optional[dict]:
+    """
+    Re-extract every stale CV, resuming from the last checkpoint.
+
+    Args:
+        db: pymongo database handle
+        workers: Number of worker processes
+        batch_size: Documents per worker round and per bulk_write
+        max_rate: Optional throttle in documents per second, to spare the primary
+        force: Restart from the beginning even if the migration completed before
+
+    Returns:
+        The final checkpoint document, or None if the migration was not started.
+    """
+    cvs = db[CVS_COLLECTION]
+    migrations = db[MIGRATIONS_COLLECTION]
+    run_id = migration_id()
+
+    checkpoint = _claim(migrations, run_id, force)
+    if checkpoint is None:
+        return None
+
+    query = stale_query()
+    if checkpoint.get("last_id") is not None:
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+        logger.info(f"Resuming migration '{run_id}' after {checkpoint['last_id']}")
+    total = checkpoint.get("processed", 0) + cvs.count_documents(query)
+    migrations.update_one({"_id": run_id}, {"$set": {"total": total}})
+
+    cursor = cvs.find(query, _PROJECTION, no_cursor_timeout=True).sort("_id", 1).batch_size(batch_size)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            batch = []
+            for doc in cursor:
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    _process_batch(cvs, migrations, run_id, executor, workers, batch, max_rate)
+                    batch = []
+            if batch:
+                _process_batch(cvs, migrations, run_id, executor, workers, batch, max_rate)
+    except Exception as e:
+        logger.error(f"Migration '{run_id}' failed: {e}")
+        migrations.update_one({"_id": run_id}, {"$set": {"status": "failed", "error": str(e)}})
+        raise
+    finally:
+        cursor.close()
+
+    return migrations.find_one_and_update(
+        {"_id": run_id},
+        {"$set": {"status": "completed", "finished_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _process_batch(cvs, migrations, run_id: str, executor, workers: int, batch: list, max_rate: Optional[float]):
+    started = time.monotonic()
+
+    requests = []
+    failed = 0
+    chunksize = max(1, len(batch) // (workers * 4))
+    for doc, (doc_id, updates, error) in zip(batch, executor.map(reextract_document, batch, chunksize=chunksize)):
+        if error:
+            failed += 1
+            logger.warning(f"Re-extraction failed for CV {doc_id}: {error}")
+        elif updates:
+            # Skip the write if the CV was re-uploaded while we were working on it
+            requests.append(UpdateOne({"_id": doc_id, "uploaded_at": doc.get("uploaded_at")}, {"$set": updates}))
+
+    updated = cvs.bulk_write(requests, ordered=False).modified_count if requests else 0
+
+    checkpoint = migrations.find_one_and_update(
+        {"_id": run_id},
+        {
+            "$set": {"last_id": batch[-1]["_id"], "heartbeat_at": datetime.utcnow()},
+            "$inc": {"processed": len(batch), "updated": updated, "failed": failed},
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    logger.info(f"Migration '{run_id}': {checkpoint['processed']}/{checkpoint['total']} processed, "
+                f"{checkpoint['updated']} updated, {checkpoint['failed']} failed")
+
+    if max_rate:
+        # Throttle so the batch takes at least len(batch) / max_rate seconds
+        remaining = len(batch) / max_rate - (time.monotonic() - started)
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+def get_migration_status(db, run_id: Optional[str] = None) -> Optional[dict]:
+    """Return the checkpoint of a migration (the current extractor versions by default)."""
+    return db[MIGRATIONS_COLLECTION].find_one({"_id": run_id or migration_id()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-extract keywords and features of stored CVs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--max-rate", type=float, default=None, help="Maximum documents per second")
+    parser.add_argument("--force", action="store_true", help="Restart even if already completed")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_ATLAS_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_ATLAS_URI not found in environment variables. Please set it in your .env file.")
+
+    client = MongoClient(mongo_uri)
+    result = run_reextraction(client[DB_NAME], workers=args.workers, batch_size=args.batch_size,
+                              max_rate=args.max_rate, force=args.force)
+    if result:
+        logger.info(f"Migration finished: {result['processed']} processed, "
+                    f"{result['updated']} updated, {result['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
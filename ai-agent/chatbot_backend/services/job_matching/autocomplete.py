@@ -0,0 +1,246 @@
+# autocomplete.py
+"""
+Prefix autocomplete of normalized skills and job titles.
+
+Suggestions come from the skill dictionaries of vocabulary.py (TECH_SKILLS and the
+title defaults) and from the skills and titles of the compiled job corpus. They are
+ranked by how many jobs use them, so the frontend can offer the spelling that
+matching will recognize instead of free text.
+
+Every vocabulary gets a compressed (radix) trie over its folded keys (lowercase, no
+diacritics). Each entry is inserted at the start of every word, so 'native' also
+suggests 'react native'. Every node stores its best TOP_K completions, so a lookup
+walks the prefix and returns a precomputed list without visiting the subtree.
+Entries whose first word matches rank before those matched on a later word.
+
+Tries are rebuilt in a background thread when the compiled jobs change, and swapped
+in with a single assignment. Lookups never wait for a rebuild.
+"""
+import re
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.job_matching.vocabulary import DEFAULT_SKILLS_BY_TITLE, GENERAL_SKILLS, TECH_SKILLS
+from utils.text_normalization import fold_diacritics, normalize_skill
+
+logger = logging.getLogger(__name__)
+
+# Completions precomputed per trie node (the maximum limit of a lookup)
+TOP_K = 20
+# Minimum seconds between two checks of the compiled jobs for changes
+REFRESH_INTERVAL = 30
+# Kinds of suggestions
+KINDS = ("skill", "title")
+
+_SPACES = re.compile(r"\s+")
+
+
+def completion_key(text: str) -> str:
+    """Key an entry is indexed (and a query looked up) under: folded, lowercase, single spaces."""
+    return _SPACES.sub(" ", fold_diacritics(text.lower())).strip()
+
+
+class _Node:
+    __slots__ = ("edges", "top")
+
+    def __init__(self):
+        # first character of the edge label -> (label, child)
+        self.edges: Dict[str, Tuple[str, "_Node"]] = {}
+        # Best completions below this node: (inner match, -frequency, text) tuples, best first
+        self.top: List[tuple] = []
+
+
+class CompletionTrie:
+    """
+    Radix trie of one vocabulary, with the TOP_K best completions at every node.
+
+    Args:
+        entries: (display text, frequency) pairs
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, int]]):
+        self.root = _Node()
+        self.size = 0
+        for text, frequency in entries:
+            key = completion_key(text)
+            if not key:
+                continue
+            self.size += 1
+            words = key.split(" ")
+            start = 0
+            for i, word in enumerate(words):
+                self._insert(key[start:], (i > 0, -frequency, text))
+                start += len(word) + 1
+        self._finish(self.root)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _insert(self, key: str, item: tuple):
+        node = self.root
+        node.top.append(item)
+        while key:
+            edge = node.edges.get(key[0])
+            if edge is None:
+                child = _Node()
+                node.edges[key[0]] = (key, child)
+                child.top.append(item)
+                return
+            label, child = edge
+            common = 0
+            limit = min(len(label), len(key))
+            while common < limit and label[common] == key[common]:
+                common += 1
+            if common < len(label):
+                # Split the edge at the end of the shared part
+                middle = _Node()
+                middle.edges[label[common]] = (label[common:], child)
+                middle.top = list(child.top)
+                node.edges[key[0]] = (label[:common], middle)
+                child = middle
+            child.top.append(item)
+            node, key = child, key[common:]
+
+    def _finish(self, root: _Node):
+        """Keep the TOP_K best distinct completions of every node."""
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            best, seen = [], set()
+            for item in sorted(node.top):
+                if item[2] not in seen:
+                    seen.add(item[2])
+                    best.append(item)
+                    if len(best) == TOP_K:
+                        break
+            node.top = best
+            stack.extend(child for _, child in node.edges.values())
+
+    def lookup(self, prefix: str) -> List[tuple]:
+        """Best completions of a prefix: (inner match, -frequency, text) tuples, best first."""
+        node, key = self.root, completion_key(prefix)
+        while key:
+            edge = node.edges.get(key[0])
+            if edge is None:
+                return []
+            label, child = edge
+            if key.startswith(label):
+                node, key = child, key[len(label):]
+            elif label.startswith(key):
+                # The prefix ends inside the edge: every completion below it matches
+                node, key = child, ""
+            else:
+                return []
+        return node.top
+
+
+def dictionary_skills() -> List[str]:
+    """Normalized skills of the static dictionaries."""
+    skills = set(TECH_SKILLS) | set(GENERAL_SKILLS)
+    for skill_list in DEFAULT_SKILLS_BY_TITLE.values():
+        skills.update(skill_list)
+    return sorted({normalize_skill(skill) for skill in skills} - {""})
+
+
+def vocabulary_entries(jobs) -> Dict[str, List[Tuple[str, int]]]:
+    """
+    Skills and titles with the number of jobs using them.
+
+    Args:
+        jobs: scoring.CompiledJobs (from the job index or a snapshot), or None
+
+    Returns:
+        Kind -> (text, frequency) pairs.
+    """
+    skills: Dict[str, int] = {skill: 0 for skill in dictionary_skills()}
+    titles: Dict[str, Tuple[str, int]] = {keyword: (keyword, 0) for keyword in DEFAULT_SKILLS_BY_TITLE}
+    if jobs is not None and len(jobs):
+        size = len(jobs.vocab_list)
+        counts = (np.bincount(jobs.required.indices, minlength=size)[:size]
+                  + np.bincount(jobs.preferred.indices, minlength=size)[:size])
+        for skill, count in zip(jobs.vocab_list, counts.tolist()):
+            skill = normalize_skill(skill)
+            if skill:
+                skills[skill] = skills.get(skill, 0) + count
+        codes = np.asarray(jobs.title_codes)
+        title_counts = np.bincount(codes, minlength=len(jobs.unique_titles))
+        _, first_jobs = np.unique(codes, return_index=True)
+        for code, job in enumerate(first_jobs.tolist()):
+            title_lower = jobs.unique_titles[code]
+            if not title_lower:
+                continue
+            known = titles.get(title_lower)
+            # Shown as the first job wrote it
+            titles[title_lower] = (jobs.titles[job] or title_lower, int(title_counts[code]) + (known[1] if known else 0))
+    return {"skill": list(skills.items()), "title": list(titles.values())}
+
+
+class Autocomplete:
+    """Completion tries of every kind, rebuilt in the background when the compiled jobs change."""
+
+    def __init__(self, refresh_interval: float = REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.tries: Dict[str, CompletionTrie] = {}
+        self.built_at: Optional[float] = None
+        self._source = None
+        self._last_check = 0.0
+        self._building = False
+        self._lock = threading.Lock()
+
+    def build(self, jobs=None):
+        """Build the tries from the dictionaries and `jobs` (scoring.CompiledJobs) and swap them in."""
+        started = time.perf_counter()
+        tries = {kind: CompletionTrie(entries) for kind, entries in vocabulary_entries(jobs).items()}
+        self.tries, self._source, self.built_at = tries, jobs, time.time()
+        logger.info(f"Autocomplete tries built: {len(tries['skill'])} skills, {len(tries['title'])} titles "
+                    f"in {time.perf_counter() - started:.2f}s")
+
+    def refresh(self, scorer):
+        """
+        At most every refresh_interval seconds, rebuild the tries in a background thread
+        if the scorer compiled other jobs since the last build (lookups keep using the
+        current tries meanwhile).
+        """
+        now = time.monotonic()
+        if self.tries and now - self._last_check < self.refresh_interval:
+            return
+        self._last_check = now
+        jobs = scorer.latest()
+        with self._lock:
+            if self._building or jobs is self._source:
+                return
+            self._building = True
+
+        def rebuild():
+            try:
+                self.build(jobs)
+            except Exception as e:
+                logger.error(f"Autocomplete rebuild failed: {e}")
+            finally:
+                self._building = False
+        threading.Thread(target=rebuild, name="autocomplete", daemon=True).start()
+
+    def suggest(self, prefix: str, kind: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Completions of a prefix, best first.
+
+        Args:
+            prefix: What the user typed so far (diacritics optional)
+            kind: "skill" or "title" (None for both)
+            limit: Maximum number of suggestions (at most TOP_K)
+
+        Returns:
+            Suggestions with their kind and the number of jobs using them.
+        """
+        tries = self.tries
+        items = []
+        for name in ([kind] if kind else KINDS):
+            trie = tries.get(name)
+            if trie is not None:
+                items += [(item, name) for item in trie.lookup(prefix)[:limit]]
+        items.sort(key=lambda pair: pair[0])
+        return [{"text": item[2], "kind": name, "frequency": -item[1]} for item, name in items[:limit]]
@@ -0,0 +1,278 @@
+# candidates.py
+"""
+Reverse matching: rank every stored CV for one job.
+
+The CV side is compiled once into a candidate x skill matrix (plus candidate x
+title and primary-title codes). Ranking a job then mirrors the user -> jobs scoring
+of scoring.py with the roles swapped: each required/preferred skill of the job is
+turned into a credit per CV skill (exact 1.0, fuzzy up to PARTIAL_CREDIT, related up
+to RELATED_CREDIT), and a candidate's credit for it is the best credit among its
+skills, read from the CSC columns of the credited skills only. Explanations are
+built for the returned rows only.
+"""
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from services.cv_refinement.resume_artifacts import build_match_profile
+from services.job_matching.fuzzy import TrigramIndex
+from services.job_matching.scoring import (
+    TITLE_WEIGHT, REQUIRED_WEIGHT, PREFERRED_WEIGHT, PRIMARY_ROLE_BONUS, MIN_MATCH_PERCENTAGE,
+    MATCHED_CREDIT, PARTIAL_CREDIT, RELATED_CREDIT, title_match_score
+)
+from services.job_matching.vocabulary import title_tokens
+from utils.text_normalization import normalize_skill
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between two staleness checks of the `cvs` collection
+REFRESH_INTERVAL = 60
+
+_CV_PROJECTION = {"username": 1, "features.skills": 1, "features.job_titles": 1}
+
+
+class CandidateMatrix:
+    """Compiled skills and titles of a set of CVs."""
+
+    def __init__(self, cvs: List[dict]):
+        self.usernames: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        title_vocab: Dict[str, int] = {}
+        skill_rows, skill_cols, title_rows, title_cols, primary = [], [], [], [], []
+
+        for cv in cvs:
+            profile = build_match_profile(cv.get("features") or {})
+            row = len(self.usernames)
+            self.usernames.append(cv["username"])
+            for skill in {normalize_skill(s) for s in profile["skills"] if s}:
+                skill_rows.append(row)
+                skill_cols.append(self.vocab.setdefault(skill, len(self.vocab)))
+            codes = []
+            for jt in profile["job_titles"]:
+                code = title_vocab.setdefault(jt.lower(), len(title_vocab))
+                if code not in codes:
+                    codes.append(code)
+            title_rows.extend([row] * len(codes))
+            title_cols.extend(codes)
+            # The first job title is the CV's primary role
+            primary.append(title_vocab[profile["job_titles"][0].lower()] if profile["job_titles"] else -1)
+
+        n = len(self.usernames)
+        self.skills = sparse.csr_matrix(
+            (np.ones(len(skill_rows), dtype=np.float64), (skill_rows, skill_cols)), shape=(n, max(1, len(self.vocab))))
+        self.skills_csc = self.skills.tocsc()
+        self.titles = sparse.csr_matrix(
+            (np.ones(len(title_rows), dtype=np.float64), (title_rows, title_cols)), shape=(n, max(1, len(title_vocab))))
+        self.primary_codes = np.array(primary, dtype=np.int64)
+
+        self.vocab_list = sorted(self.vocab, key=self.vocab.get)
+        self.fuzzy = TrigramIndex(self.vocab_list)
+        self.title_list = sorted(title_vocab, key=title_vocab.get)
+        self.title_words = [title_tokens(title) for title in self.title_list]
+        self._related_inverse: Optional[Dict[str, List[Tuple[int, float]]]] = None
+        self._related_key = None
+
+    def __len__(self) -> int:
+        return len(self.usernames)
+
+    def _inverse_related(self, skill_graph) -> Dict[str, List[Tuple[int, float]]]:
+        """job skill -> [(CV vocabulary position, relatedness)] for CV skills relating to it."""
+        key = (id(skill_graph), getattr(skill_graph, "index_version", None))
+        if self._related_inverse is None or self._related_key != key:
+            inverse: Dict[str, List[Tuple[int, float]]] = {}
+            for pos, skill in enumerate(self.vocab_list):
+                for related, weight in skill_graph.related(skill):
+                    inverse.setdefault(related, []).append((pos, weight))
+            self._related_inverse, self._related_key = inverse, key
+        return self._related_inverse
+
+    def skill_credit_map(self, skill: str, skill_graph=None) -> Dict[int, float]:
+        """CV vocabulary position -> credit a CV with that skill gets for the job skill `skill`."""
+        credits: Dict[int, float] = {}
+        for pos, score in self.fuzzy.lookup(skill):
+            credits[pos] = score * PARTIAL_CREDIT
+        if skill_graph is not None:
+            for pos, weight in self._inverse_related(skill_graph).get(skill, ()):
+                if weight * RELATED_CREDIT > credits.get(pos, 0.0):
+                    credits[pos] = weight * RELATED_CREDIT
+        exact = self.vocab.get(skill)
+        if exact is not None:
+            credits[exact] = 1.0
+        return credits
+
+    def candidate_credits(self, credit_map: Dict[int, float]) -> np.ndarray:
+        """Best credit of every candidate for one job skill."""
+        best = np.zeros(len(self), dtype=np.float64)
+        csc = self.skills_csc
+        # Lowest credits first, so higher ones overwrite them
+        for pos, credit in sorted(credit_map.items(), key=lambda item: item[1]):
+            rows = csc.indices[csc.indptr[pos]:csc.indptr[pos + 1]]
+            best[rows] = np.maximum(best[rows], credit)
+        return best
+
+    def title_scores(self, title_lower: str, title_words: Set[str], is_tech: bool) -> np.ndarray:
+        """Title score of every candidate: the best of its job titles, with the no-match fallback."""
+        per_title = np.array([
+            title_match_score(cv_title, self.title_words[code], title_lower, title_words)
+            for code, cv_title in enumerate(self.title_list)
+        ], dtype=np.float64)
+        scores = np.zeros(len(self), dtype=np.float64)
+        if len(per_title):
+            values = per_title[self.titles.indices]
+            lengths = np.diff(self.titles.indptr)
+            nonempty = lengths > 0
+            scores[nonempty] = np.maximum.reduceat(values, self.titles.indptr[:-1][nonempty])
+        fallback = TITLE_WEIGHT * 0.3 if is_tech else TITLE_WEIGHT * 0.1
+        return np.where(scores == 0, fallback, scores)
+
+    def primary_role_mask(self, title_lower: str) -> np.ndarray:
+        """Candidates whose primary job title has a word contained in the job title."""
+        per_title = np.array([any(word in title_lower for word in title.split()) for title in self.title_list] + [False])
+        # Code -1 (no job title) reads the trailing False
+        return per_title[self.primary_codes]
+
+    def rank(self, features: Dict[str, Any], skill_graph=None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Best candidates for a job (at least MIN_MATCH_PERCENTAGE), best first.
+
+        Args:
+            features: Job features (job_features.build_job_features)
+            skill_graph: SkillGraph or SkillTable for related-skill credit
+            limit: Maximum number of candidates
+
+        Returns:
+            Candidates with their match percentage and an explanation of the score.
+        """
+        if not len(self):
+            return []
+        required = features["required_skills"]
+        preferred = features["preferred_skills"]
+        credit_maps = {skill: self.skill_credit_map(skill, skill_graph) for skill in set(required) | set(preferred)}
+        credits = {skill: self.candidate_credits(credit_map) for skill, credit_map in credit_maps.items()}
+
+        title = self.title_scores(features["title_lower"], set(features["title_tokens"]), features["is_tech"])
+        required_sum = np.zeros(len(self), dtype=np.float64)
+        required_matched = np.zeros(len(self), dtype=np.int64)
+        for skill in required:
+            required_sum += credits[skill]
+            required_matched += credits[skill] > MATCHED_CREDIT
+        required_score = REQUIRED_WEIGHT * required_sum / max(1, len(required))
+        preferred_matched = np.zeros(len(self), dtype=np.int64)
+        for skill in preferred:
+            preferred_matched += credits[skill] > 0
+        preferred_score = PREFERRED_WEIGHT * preferred_matched / max(1, len(preferred))
+
+        total = title + required_score + preferred_score
+        total = np.where(self.primary_role_mask(features["title_lower"]),
+                         np.minimum(100, total * PRIMARY_ROLE_BONUS), total)
+        # Rounded to 6 decimals first so summation order cannot flip a .5 boundary
+        percentages = np.clip(np.round(np.round(total, 6)), 0, 100).astype(np.int64)
+
+        eligible = np.flatnonzero(percentages >= MIN_MATCH_PERCENTAGE)
+        if len(eligible) > limit:
+            eligible = eligible[np.argpartition(-percentages[eligible], limit - 1)[:limit]]
+        top = eligible[np.lexsort((eligible, -percentages[eligible]))]
+
+        return [{
+            "username": self.usernames[row],
+            "match_percentage": int(percentages[row]),
+            "relevance": "high" if percentages[row] >= 70 else "medium" if percentages[row] >= 40 else "low",
+            "matched_skills": {
+                "required": int(required_matched[row]),
+                "preferred": int(preferred_matched[row]),
+                "total_required": len(required),
+                "total_preferred": len(preferred),
+            },
+            "explanation": self.explain(row, features, credit_maps, {
+                "title": round(float(title[row]), 1),
+                "required": round(float(required_score[row]), 1),
+                "preferred": round(float(preferred_score[row]), 1),
+            }),
+        } for row in top]
+
+    def explain(self, row: int, features: Dict[str, Any], credit_maps: Dict[str, Dict[int, float]],
+                scores: Dict[str, float]) -> Dict[str, Any]:
+        """Which CV skill earned the credit of every job skill, for one candidate."""
+        skill_positions = self.skills.indices[self.skills.indptr[row]:self.skills.indptr[row + 1]]
+
+        def best_match(skill: str) -> Optional[Dict[str, Any]]:
+            credit_map = credit_maps[skill]
+            best_pos = max(skill_positions, key=lambda pos: credit_map.get(pos, 0.0), default=None)
+            if best_pos is None or credit_map.get(best_pos, 0.0) <= 0:
+                return None
+            credit = credit_map[best_pos]
+            return {"skill": skill, "via": self.vocab_list[best_pos], "credit": round(credit, 2),
+                    "kind": "exact" if credit == 1.0 else "partial"}
+
+        explanation = {"scores": scores, "required": [], "preferred": [], "missing_required": [], "missing_preferred": []}
+        for kind, skills in (("required", features["required_skills"]), ("preferred", features["preferred_skills"])):
+            for skill in skills:
+                match = best_match(skill)
+                if match:
+                    explanation[kind].append(match)
+                else:
+                    explanation[f"missing_{kind}"].append(skill)
+        return explanation
+
+
+class CandidateIndex:
+    """CandidateMatrix of the `cvs` collection, rebuilt in the background when CVs change."""
+
+    def __init__(self):
+        self.matrix: Optional[CandidateMatrix] = None
+        self._stamp = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._building = False
+
+    def __len__(self) -> int:
+        return len(self.matrix) if self.matrix is not None else 0
+
+    @staticmethod
+    def stamp(collection) -> str:
+        latest = collection.find_one({}, {"uploaded_at": 1}, sort=[("uploaded_at", -1)])
+        return f"{collection.estimated_document_count()}:{(latest or {}).get('uploaded_at', '')}"
+
+    def build(self, collection):
+        started = time.perf_counter()
+        stamp = self.stamp(collection)
+        matrix = CandidateMatrix(list(collection.find({"features": {"$exists": True}}, _CV_PROJECTION)))
+        with self._lock:
+            self.matrix, self._stamp = matrix, stamp
+        logger.info(f"Candidate matrix built: {len(matrix)} CVs, {len(matrix.vocab)} skills "
+                    f"in {time.perf_counter() - started:.2f}s")
+
+    def mark_stale(self):
+        """Force a staleness check on the next refresh (e.g. after an upload)."""
+        self._last_check = 0.0
+
+    def refresh(self, collection):
+        """
+        Build the matrix if missing; otherwise, at most every REFRESH_INTERVAL seconds,
+        rebuild it in a background thread if the collection changed (the current matrix
+        keeps serving meanwhile).
+        """
+        if self.matrix is None:
+            self.build(collection)
+            return
+        now = time.monotonic()
+        if now - self._last_check < REFRESH_INTERVAL:
+            return
+        self._last_check = now
+        with self._lock:
+            if self._building or self.stamp(collection) == self._stamp:
+                return
+            self._building = True
+
+        def rebuild():
+            try:
+                self.build(collection)
+            except Exception as e:
+                logger.error(f"Candidate matrix rebuild failed: {e}")
+            finally:
+                self._building = False
+        threading.Thread(target=rebuild, name="candidate-matrix", daemon=True).start()
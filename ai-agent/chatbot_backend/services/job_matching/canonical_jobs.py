@@ -0,0 +1,242 @@
+# canonical_jobs.py
+"""
+Canonical store of scraped jobs.
+
+A scraped posting is stored once in `jobs`, keyed by its source and external id
+(`unique_id = "linkedin:<job id>"`), however many users found it; which user found
+which job lives in the lightweight `user_jobs` edge collection
+({username, job_id, unique_id, found_at, last_seen_at}). Enrichment, feature
+computation, indexing and scoring therefore run once per posting, and every user
+shares the same match results for it.
+
+Jobs scraped before this store existed are per-user copies (`unique_id =
+"<username>_<job id>"`, `user` field). Deduplicate them with:
+    python -m services.job_matching.canonical_jobs [--dry-run]
+
+For every external id, the oldest copy becomes the canonical job (the existing
+canonical job, if any), each copy becomes an edge of its user, and the other
+copies are deleted along with their `user_job_matches` rows. Edges are written
+before anything is deleted, so an interrupted run is simply run again.
+"""
+import os
+import logging
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, MongoClient, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from dotenv import load_dotenv
+
+from services.job_matching.enrichment import enrich_jobs
+from services.job_matching.job_features import with_features
+from services.job_matching.match_feeds import FEEDS_COLLECTION
+from services.job_matching.near_duplicates import assign_clusters
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "CVProject"
+JOBS_COLLECTION = "jobs"
+USER_JOBS_COLLECTION = "user_jobs"
+SOURCE = "linkedin"
+
+# External ids deduplicated per migration batch
+MIGRATION_BATCH_SIZE = 200
+# Fields of a scraped job that describe the user's search, not the posting
+_SEARCH_FIELDS = ("user", "unique_id", "_id")
+
+
+def canonical_unique_id(external_id: Any, source: str = SOURCE) -> str:
+    return f"{source}:{external_id}"
+
+
+def ensure_canonical_indexes(db):
+    edges = db[USER_JOBS_COLLECTION]
+    edges.create_index([("username", ASCENDING), ("job_id", ASCENDING)], unique=True)
+    edges.create_index("job_id")
+    # Canonical jobs no search has seen for a while are archived (job_lifecycle.py)
+    db[JOBS_COLLECTION].create_index("last_seen_at", sparse=True)
+
+
+def is_known_job(db, external_id: Any, source: str = SOURCE) -> bool:
+    """Whether a posting is already stored (the scraper then skips its detail page)."""
+    return db[JOBS_COLLECTION].count_documents({"unique_id": canonical_unique_id(external_id, source)}, limit=1) > 0
+
+
+def store_scraped_jobs(db, username: str, scraped: List[Dict[str, Any]], known_ids: List[Any] = (),
+                       source: str = SOURCE) -> List[Dict[str, Any]]:
+    """
+    Store the postings a user's search found: new postings are enriched, featured and
+    inserted once, already stored ones only get their `last_seen_at` bumped, and the
+    user gets an edge to each.
+
+    Args:
+        db: The CVProject database
+        username: User whose search found the postings
+        scraped: Scraped postings (with their external `job_id`)
+        known_ids: External ids the scraper found but did not fetch, as they are stored already
+        source: Job board the postings come from
+
+    Returns:
+        The newly inserted job documents (to index).
+    """
+    jobs = db[JOBS_COLLECTION]
+    now = datetime.utcnow()
+
+    postings: Dict[str, Dict[str, Any]] = {}
+    for job in scraped:
+        if job.get("job_id"):
+            postings.setdefault(canonical_unique_id(job["job_id"], source), job)
+    unique_ids = list(dict.fromkeys([*postings, *(canonical_unique_id(external_id, source) for external_id in known_ids)]))
+    if not unique_ids:
+        return []
+
+    stored = {job["unique_id"] for job in jobs.find({"unique_id": {"$in": unique_ids}}, {"unique_id": 1})}
+    new_jobs = []
+    for unique_id, job in postings.items():
+        if unique_id in stored:
+            continue
+        doc = {key: value for key, value in job.items() if key not in _SEARCH_FIELDS}
+        doc.update(unique_id=unique_id, source=source, external_id=job["job_id"], first_seen_at=now, last_seen_at=now)
+        new_jobs.append(doc)
+
+    # Extract skills from the descriptions, precompute features and spot reposts, once per posting
+    enrich_jobs(new_jobs)
+    for doc in new_jobs:
+        with_features(doc)
+    assign_clusters(jobs, new_jobs)
+    if new_jobs:
+        try:
+            jobs.bulk_write([InsertOne(doc) for doc in new_jobs], ordered=False)
+        except BulkWriteError as e:
+            # Another search inserted some of them first (unique_id is unique)
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+            duplicates = {new_jobs[error["index"]]["unique_id"] for error in e.details["writeErrors"]}
+            new_jobs = [doc for doc in new_jobs if doc["unique_id"] not in duplicates]
+    if stored:
+        jobs.update_many({"unique_id": {"$in": list(stored)}}, {"$set": {"last_seen_at": now}})
+
+    ids = {job["unique_id"]: job["_id"] for job in jobs.find({"unique_id": {"$in": unique_ids}}, {"unique_id": 1})}
+    db[USER_JOBS_COLLECTION].bulk_write([
+        UpdateOne({"username": username, "job_id": job_id},
+                  {"$setOnInsert": {"unique_id": unique_id, "found_at": now}, "$set": {"last_seen_at": now}},
+                  upsert=True)
+        for unique_id, job_id in ids.items()
+    ], ordered=False)
+    return new_jobs
+
+
+def get_user_jobs(db, username: str) -> List[Dict[str, Any]]:
+    """
+    Jobs found by a user's searches, most recently found first, one per near-duplicate
+    cluster (without `_id` and the `dedup` field).
+    """
+    edges = list(db[USER_JOBS_COLLECTION].find({"username": username}, {"job_id": 1}).sort("found_at", -1))
+    order = {edge["job_id"]: rank for rank, edge in enumerate(edges)}
+    jobs = list(db[JOBS_COLLECTION].find({"_id": {"$in": list(order)}}, {"dedup.signature": 0, "dedup.bands": 0}))
+    jobs.sort(key=lambda job: order[job["_id"]])
+
+    listing, clusters = [], set()
+    for job in jobs:
+        cluster = (job.pop("dedup", None) or {}).get("duplicate_of", job["_id"])
+        if cluster not in clusters:
+            clusters.add(cluster)
+            del job["_id"]
+            listing.append(job)
+    return listing
+
+
+def migrate_user_job_copies(db, batch_size: int = MIGRATION_BATCH_SIZE, dry_run: bool = False,
+                            source: str = SOURCE) -> Dict[str, int]:
+    """
+    Deduplicate the per-user job copies into canonical jobs and user_jobs edges.
+
+    Returns:
+        Counts of postings, canonical jobs created, edges written and copies deleted
+        (for a dry run: postings and copies that would be deleted).
+    """
+    jobs = db[JOBS_COLLECTION]
+    groups = jobs.aggregate([
+        {"$match": {"user": {"$exists": True}, "job_id": {"$ne": None}}},
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$job_id", "copies": {"$push": {"_id": "$_id", "user": "$user"}}}},
+    ], allowDiskUse=True)
+
+    counts = {"postings": 0, "canonical": 0, "edges": 0, "deleted": 0}
+    batch: List[dict] = []
+    for group in groups:
+        counts["postings"] += 1
+        if dry_run:
+            counts["deleted"] += len(group["copies"]) - 1
+            continue
+        batch.append(group)
+        if len(batch) >= batch_size:
+            _merge_copies(db, batch, counts, source)
+            batch = []
+            logger.info(f"Job copies deduplicated: {counts}")
+    if batch:
+        _merge_copies(db, batch, counts, source)
+    logger.info(f"Job copy deduplication {'(dry run) ' if dry_run else ''}done: {counts}")
+    return counts
+
+
+def _merge_copies(db, groups: List[dict], counts: Dict[str, int], source: str):
+    jobs = db[JOBS_COLLECTION]
+    unique_ids = [canonical_unique_id(group["_id"], source) for group in groups]
+    canonical = {job["unique_id"]: job["_id"] for job in jobs.find({"unique_id": {"$in": unique_ids}}, {"unique_id": 1})}
+
+    edges, promotions, duplicates = [], [], []
+    for group, unique_id in zip(groups, unique_ids):
+        copies = group["copies"]
+        seen = [copy["_id"].generation_time.replace(tzinfo=None) for copy in copies]
+        if unique_id in canonical:
+            keeper = canonical[unique_id]
+            duplicates += [copy["_id"] for copy in copies if copy["_id"] != keeper]
+        else:
+            # Copies are sorted by _id: the oldest becomes the canonical job
+            keeper = copies[0]["_id"]
+            duplicates += [copy["_id"] for copy in copies[1:]]
+            promotions.append(UpdateOne({"_id": keeper}, {
+                "$set": {"unique_id": unique_id, "source": source, "external_id": group["_id"],
+                         "first_seen_at": min(seen), "last_seen_at": max(seen)},
+                "$unset": {"user": ""},
+            }))
+        for copy, found_at in zip(copies, seen):
+            if copy.get("user"):
+                edges.append(UpdateOne({"username": copy["user"], "job_id": keeper}, {
+                    "$setOnInsert": {"unique_id": unique_id, "found_at": found_at},
+                    "$max": {"last_seen_at": found_at},
+                }, upsert=True))
+
+    # Edges first: until the copies are deleted, rerunning rebuilds everything below
+    if edges:
+        db[USER_JOBS_COLLECTION].bulk_write(edges, ordered=False)
+    if promotions:
+        jobs.bulk_write(promotions, ordered=False)
+    if duplicates:
+        counts["deleted"] += jobs.delete_many({"_id": {"$in": duplicates}}).deleted_count
+        db[FEEDS_COLLECTION].delete_many({"job_id": {"$in": duplicates}})
+    counts["edges"] += len(edges)
+    counts["canonical"] += len(promotions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate per-user job copies into canonical jobs")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE, help="Postings per batch")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the postings and copies")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_ATLAS_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_ATLAS_URI not found in environment variables. Please set it in your .env file.")
+
+    db = MongoClient(mongo_uri)[DB_NAME]
+    ensure_canonical_indexes(db)
+    migrate_user_job_copies(db, batch_size=args.batch_size, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
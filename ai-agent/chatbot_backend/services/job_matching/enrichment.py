@@ -0,0 +1,227 @@
+# enrichment.py
+"""
+Ingest-time enrichment of scraped jobs.
+
+LinkedIn jobs only carry a raw `description`, so their `required_skills` are empty
+and matching falls back to generic per-title defaults. The extractor below finds
+the requirement / nice-to-have sections of a description, matches a skill
+dictionary inside them and fills `required_skills`, `preferred_skills`,
+`experience_years` and `experience_level` before the job is written.
+
+Enrich stored jobs with:
+    python -m services.job_matching.enrichment --workers 4 --batch-size 200
+"""
+import os
+import re
+import atexit
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+from services.job_matching.vocabulary import TECH_SKILLS
+from services.job_matching.job_features import RAW_JOB_PROJECTION, build_job_features, job_level
+from utils.text_normalization import SKILL_ALIASES, normalize_skill
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "CVProject"
+JOBS_COLLECTION = "jobs"
+
+# Batches smaller than this are enriched in-process
+PARALLEL_THRESHOLD = 16
+
+# Section headers of job descriptions (EN + VI). LinkedIn descriptions are scraped
+# with text(strip=True), so headers are usually glued to the surrounding text.
+SECTION_HEADERS = {
+    'required': r"requirements?|qualifications?|what you(?:'ll| will) need|what we(?:'re| are) looking for"
+                r"|must[ -]have|skills (?:and|&) experience|yêu cầu(?: công việc| ứng viên)?",
+    # Only unambiguous headers: "X is a plus" / "ưu tiên ..." are handled per sentence
+    'preferred': r"nice[ -]to[ -]have|preferred (?:qualifications|skills|requirements)|preferred\s*:"
+                 r"|bonus points|good to have|ưu tiên\s*:|điểm cộng",
+    'other': r"responsibilit(?:y|ies)|what you(?:'ll| will) do|job description|mô tả công việc"
+             r"|benefits?|perks|why (?:join|you'll love)|quyền lợi|phúc lợi|about (?:us|the company)",
+}
+
+_SECTION_REGEX = re.compile(
+    '|'.join(f'(?P<{name}>{pattern})' for name, pattern in SECTION_HEADERS.items()), re.IGNORECASE
+)
+
+# Skill names and their aliases, longest first so 'spring boot' wins over 'spring'
+_SKILL_TERMS = sorted(set(TECH_SKILLS) | set(SKILL_ALIASES), key=len, reverse=True)
+_SKILL_REGEX = re.compile(
+    r'(?<![\w+#.])(' + '|'.join(re.escape(term) for term in _SKILL_TERMS) + r')(?![\w+#])', re.IGNORECASE
+)
+
+# Sentences marking the skills they mention as optional, outside a preferred section
+_OPTIONAL_SENTENCE = re.compile(r'\b(?:a plus|is a plus|nice to have|preferred|bonus|advantage|ưu tiên)\b', re.IGNORECASE)
+
+_EXPERIENCE_REGEX = re.compile(
+    r'(\d{1,2})\s*\+?\s*(?:-|–|to)?\s*(?:\d{1,2})?\s*\+?\s*(?:years?|yrs?|năm)', re.IGNORECASE
+)
+
+
+def split_sections(text: str) -> List[tuple]:
+    """
+    Split a description into (kind, text) spans, kind being 'required', 'preferred',
+    'other' or 'intro' for the text before the first header.
+    """
+    spans = []
+    last_kind, last_start = 'intro', 0
+    for match in _SECTION_REGEX.finditer(text):
+        spans.append((last_kind, text[last_start:match.start()]))
+        last_kind, last_start = match.lastgroup, match.end()
+    spans.append((last_kind, text[last_start:]))
+    return [(kind, span) for kind, span in spans if span.strip()]
+
+
+def find_skills(text: str) -> List[str]:
+    """Dictionary skills mentioned in a text, normalized, in order of appearance."""
+    seen = {}
+    for match in _SKILL_REGEX.finditer(text):
+        seen.setdefault(normalize_skill(match.group(1)), None)
+    return list(seen)
+
+
+def extract_job_requirements(description: str, title: str = "") -> Dict[str, Any]:
+    """
+    Extract skills and experience from a job description.
+
+    Skills in requirement sections are required and skills in nice-to-have sections
+    (or in sentences flagged as optional) are preferred. Without any section headers,
+    every dictionary skill of the description counts as required.
+
+    Returns:
+        Dictionary with required_skills, preferred_skills, experience_years and
+        experience_level.
+    """
+    description = description or ""
+    sections = split_sections(description)
+    has_headers = any(kind in ('required', 'preferred') for kind, _ in sections)
+
+    required, preferred = {}, {}
+    for kind, text in sections:
+        if has_headers and kind in ('other', 'intro'):
+            continue
+        for sentence in re.split(r'(?<=[.;!?•\n])\s*', text):
+            target = preferred if kind == 'preferred' or _OPTIONAL_SENTENCE.search(sentence) else required
+            for skill in find_skills(sentence):
+                target.setdefault(skill, None)
+
+    # The title names skills too (e.g. "Java Developer")
+    for skill in find_skills(title or ""):
+        required.setdefault(skill, None)
+    preferred = [skill for skill in preferred if skill not in required]
+
+    years = [int(match.group(1)) for match in _EXPERIENCE_REGEX.finditer(description)]
+    experience_years = min(years) if years else None
+
+    return {
+        "required_skills": list(required),
+        "preferred_skills": preferred,
+        "experience_years": experience_years,
+        "experience_level": job_level((title or "").lower(), experience_years),
+    }
+
+
+def _extract(args: tuple) -> Dict[str, Any]:
+    return extract_job_requirements(*args)
+
+
+def needs_enrichment(job: Dict[str, Any]) -> bool:
+    return bool(job.get("description")) and not job.get("required_skills")
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        atexit.register(_executor.shutdown)
+    return _executor
+
+
+def enrich_jobs(jobs: List[Dict[str, Any]], workers: Optional[int] = None) -> int:
+    """
+    Fill the extracted fields of jobs that have a description but no required
+    skills (in place). Large batches are spread across worker processes.
+
+    Returns:
+        Number of enriched jobs.
+    """
+    pending = [job for job in jobs if needs_enrichment(job)]
+    if not pending:
+        return 0
+
+    args = [(job["description"], job.get("title") or job.get("job_title") or "") for job in pending]
+    if len(pending) < PARALLEL_THRESHOLD:
+        results = map(_extract, args)
+    else:
+        chunksize = max(1, len(args) // ((workers or os.cpu_count() or 1) * 4))
+        results = _get_executor(workers).map(_extract, args, chunksize=chunksize)
+
+    for job, extracted in zip(pending, results):
+        job.update(extracted)
+        job["skills_source"] = "description"
+    logger.info(f"Enriched {len(pending)} jobs from their descriptions")
+    return len(pending)
+
+
+def backfill_enrichment(collection, workers: Optional[int] = None, batch_size: int = 200) -> int:
+    """
+    Enrich stored jobs that have a description but no required skills, and refresh
+    their features.
+
+    Returns:
+        Number of updated documents.
+    """
+    query = {"description": {"$nin": [None, ""]}, "required_skills.0": {"$exists": False}}
+    projection = {**RAW_JOB_PROJECTION, "description": 1}
+    updated = 0
+    batch = []
+
+    def flush():
+        nonlocal updated
+        enrich_jobs(batch, workers)
+        requests = []
+        for job in batch:
+            fields = {key: job[key] for key in
+                      ("required_skills", "preferred_skills", "experience_years", "experience_level", "skills_source")}
+            fields["features"] = build_job_features(job)
+            requests.append(UpdateOne({"_id": job["_id"]}, {"$set": fields}))
+        updated += collection.bulk_write(requests, ordered=False).modified_count
+        logger.info(f"Enrichment backfill: {updated} jobs updated")
+
+    for job in collection.find(query, projection).batch_size(batch_size):
+        batch.append(job)
+        if len(batch) >= batch_size:
+            flush()
+            batch = []
+    if batch:
+        flush()
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract skills from the descriptions of stored jobs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_ATLAS_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_ATLAS_URI not found in environment variables. Please set it in your .env file.")
+
+    client = MongoClient(mongo_uri)
+    backfill_enrichment(client[DB_NAME][JOBS_COLLECTION], workers=args.workers, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
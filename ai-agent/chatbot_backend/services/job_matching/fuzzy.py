@@ -0,0 +1,89 @@
+# fuzzy.py
+"""
+Fuzzy skill matching with a trigram index.
+
+Skills are compared by the Jaccard similarity of their padded character trigrams
+(as in PostgreSQL's pg_trgm): 'react' and 'react native' are similar, 'r' and
+'docker' are not. A TrigramIndex over the skill vocabulary answers "which skills
+look like this one" from its posting lists, and caches the answer per query skill.
+"""
+import re
+import logging
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Pairs below this trigram similarity get no partial credit
+SIMILARITY_THRESHOLD = 0.4
+
+# Query results kept per index before the cache is cleared
+MAX_CACHED_QUERIES = 50_000
+
+_WORD_REGEX = re.compile(r'[\w+#.]+')
+
+
+@lru_cache(maxsize=100_000)
+def trigrams(skill: str) -> FrozenSet[str]:
+    """Trigrams of every word of a skill, each word padded with two leading blanks and one trailing."""
+    grams = set()
+    for word in _WORD_REGEX.findall(skill.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def similarity(a: str, b: str) -> float:
+    """Trigram (Jaccard) similarity of two skills, between 0 and 1."""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    common = len(grams_a & grams_b)
+    return common / (len(grams_a) + len(grams_b) - common)
+
+
+class TrigramIndex:
+    """Trigram posting lists over a fixed vocabulary, with cached lookups."""
+
+    def __init__(self, terms: Sequence[str], threshold: float = SIMILARITY_THRESHOLD):
+        self.terms = list(terms)
+        self.threshold = threshold
+        self._sizes = [len(trigrams(term)) for term in self.terms]
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for pos, term in enumerate(self.terms):
+            for gram in trigrams(term):
+                self._postings[gram].append(pos)
+        self._cache: Dict[str, Tuple[Tuple[int, float], ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def lookup(self, query: str) -> Tuple[Tuple[int, float], ...]:
+        """
+        Vocabulary positions similar to `query` (threshold or above, the query itself
+        included if present) with their similarity, most similar first.
+        """
+        cached = self._cache.get(query)
+        if cached is not None:
+            return cached
+
+        grams = trigrams(query)
+        counts: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for pos in self._postings.get(gram, ()):
+                counts[pos] += 1
+
+        size = len(grams)
+        matches = []
+        for pos, common in counts.items():
+            score = common / (size + self._sizes[pos] - common)
+            if score >= self.threshold:
+                matches.append((pos, score))
+        matches.sort(key=lambda match: -match[1])
+        result = tuple(matches)
+
+        if len(self._cache) >= MAX_CACHED_QUERIES:
+            self._cache.clear()
+        self._cache[query] = result
+        return result
@@ -0,0 +1,224 @@
+# job_features.py
+"""
+Normalized job features, computed once when a job is written.
+
+Jobs reach the `jobs` collection from the LinkedIn scraper (`job_title`,
+`company_name`) and from the web backend (`title`, `companyName`), with raw skill
+lists. `build_job_features` normalizes them into a `features` sub-document that job
+matching reads instead of re-deriving titles, default skills and role flags on every
+request.
+
+Backfill existing documents with:
+    python -m services.job_matching.job_features --batch-size 500
+"""
+import os
+import re
+import json
+import hashlib
+import logging
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+from services.job_matching.vocabulary import (
+    DEFAULT_SKILLS_BY_TITLE, LEVEL_ALIASES, TITLE_MAPPING, TECH_INDICATORS, TITLE_LEVELS,
+    default_skills_for_title, has_title_keyword, title_tokens, title_words
+)
+from utils.text_normalization import normalize_skills
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever build_job_features changes its output
+JOB_FEATURES_VERSION = 3
+
+DB_NAME = "CVProject"
+JOBS_COLLECTION = "jobs"
+
+# Raw fields build_job_features reads
+RAW_JOB_PROJECTION = {
+    "_id": 1, "title": 1, "job_title": 1, "companyName": 1, "company": 1, "company_name": 1,
+    "required_skills": 1, "preferred_skills": 1, "experience": 1, "experience_years": 1, "features": 1,
+}
+
+# Feature fields that do not describe the job (left out of content digests)
+VOLATILE_FEATURES = ("computed_at",)
+
+_TITLE_LEVELS = [(level, re.compile(pattern, re.IGNORECASE)) for level, pattern in TITLE_LEVELS]
+
+
+def canonical_role(title_lower: str) -> Optional[str]:
+    """
+    Role keyword of a title (e.g. 'backend', 'devops'), Vietnamese titles mapped to
+    English. Keywords match whole words only ('retail store manager' is not 'ai').
+    """
+    words = title_words(title_lower)
+    for keyword in DEFAULT_SKILLS_BY_TITLE:
+        if has_title_keyword(words, keyword):
+            return keyword
+    for vn_term, en_terms in TITLE_MAPPING.items():
+        if has_title_keyword(words, vn_term):
+            return en_terms[0]
+    for indicator in TECH_INDICATORS:
+        if has_title_keyword(words, indicator):
+            return indicator
+    return None
+
+
+def job_level(title_lower: str, experience: Any = None) -> Optional[str]:
+    """
+    Seniority from the title keywords, else from the years in the `experience` field.
+
+    Examples:
+        >>> job_level('software engineering intern')
+        'intern/fresher'
+        >>> job_level('international sales manager')
+        'manager'
+        >>> job_level('internal auditor') is None
+        True
+    """
+    for level, pattern in _TITLE_LEVELS:
+        if pattern.search(title_lower):
+            return level
+    # 0 years is a level (intern/fresher), only a missing value is not
+    years = re.search(r'\d+', '' if experience is None else str(experience))
+    if not years:
+        return None
+    years = int(years.group())
+    if years == 0:
+        return 'intern/fresher'
+    if years < 2:
+        return 'junior'
+    if years < 5:
+        return 'mid-level'
+    return 'senior'
+
+
+def matching_levels(level: str) -> List[str]:
+    """
+    Job levels a resume or client level stands for ('Senior' -> ['senior'],
+    'entry-level' -> ['intern/fresher', 'junior']).
+
+    Raises:
+        ValueError: For a level that is neither a job level nor an alias of one
+    """
+    key = " ".join(level.lower().split())
+    if key in LEVEL_ALIASES:
+        return LEVEL_ALIASES[key]
+    if key in {name for name, _ in TITLE_LEVELS}:
+        return [key]
+    known = sorted({name for name, _ in TITLE_LEVELS} | set(LEVEL_ALIASES))
+    raise ValueError(f"Unknown level '{level}' (expected one of: {', '.join(known)})")
+
+
+def build_job_features(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compute the normalized features of a job document.
+
+    Returns:
+        Dictionary with canonical title/company, title tokens, role, tech flag,
+        normalized skills (with title defaults when none are listed) and level.
+    """
+    title = (job.get("title") or job.get("job_title") or "").strip() or "No Title"
+    company = (job.get("companyName") or job.get("company") or job.get("company_name") or "").strip()
+    title_lower = title.lower()
+    words = title_words(title_lower)
+    experience = job.get("experience")
+    if experience is None or experience == "":
+        experience = job.get("experience_years")
+
+    required = normalize_skills(job.get("required_skills") or [])
+    default_skills = not required
+    if default_skills:
+        required = normalize_skills(default_skills_for_title(title))
+
+    return {
+        "version": JOB_FEATURES_VERSION,
+        "title": title,
+        "title_lower": title_lower,
+        "title_tokens": sorted(title_tokens(title)),
+        "company": company or "Company Not Specified",
+        "role": canonical_role(title_lower),
+        "is_tech": any(has_title_keyword(words, indicator) for indicator in TECH_INDICATORS),
+        "required_skills": required,
+        "default_skills": default_skills,
+        "preferred_skills": normalize_skills(job.get("preferred_skills") or []),
+        "level": job_level(title_lower, experience),
+        "computed_at": datetime.utcnow(),
+    }
+
+
+def job_features(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Stored features of a job, computed on the fly if missing or outdated."""
+    features = job.get("features")
+    if features and features.get("version") == JOB_FEATURES_VERSION:
+        return features
+    return build_job_features(job)
+
+
+def feature_digest(job_id: Any, features: Dict[str, Any]) -> int:
+    """
+    64-bit digest of a job's id and features (without VOLATILE_FEATURES), equal in
+    every process for the same content.
+    """
+    content = {key: value for key, value in features.items() if key not in VOLATILE_FEATURES}
+    payload = json.dumps([str(job_id), content], sort_keys=True, default=str).encode()
+    return int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), "little")
+
+
+def with_features(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Attach the features to a job document about to be written (in place)."""
+    job["features"] = build_job_features(job)
+    return job
+
+
+def ensure_feature_indexes(collection):
+    """Multikey index on the normalized required skills, which the matching aggregation selects jobs by."""
+    collection.create_index("features.required_skills")
+
+
+def backfill_job_features(collection, batch_size: int = 500) -> int:
+    """
+    Write current features to every job that lacks them or has an older version.
+
+    Returns:
+        Number of updated documents.
+    """
+    query = {"features.version": {"$ne": JOB_FEATURES_VERSION}}
+    total = collection.count_documents(query)
+    logger.info(f"Backfilling features of {total} jobs")
+
+    updated = 0
+    requests = []
+    for job in collection.find(query, RAW_JOB_PROJECTION).batch_size(batch_size):
+        requests.append(UpdateOne({"_id": job["_id"]}, {"$set": {"features": build_job_features(job)}}))
+        if len(requests) >= batch_size:
+            updated += collection.bulk_write(requests, ordered=False).modified_count
+            requests = []
+            logger.info(f"Backfilled {updated}/{total} jobs")
+    if requests:
+        updated += collection.bulk_write(requests, ordered=False).modified_count
+
+    logger.info(f"Backfill finished: {updated} jobs updated")
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill normalized job features")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_ATLAS_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_ATLAS_URI not found in environment variables. Please set it in your .env file.")
+
+    client = MongoClient(mongo_uri)
+    backfill_job_features(client[DB_NAME][JOBS_COLLECTION], batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
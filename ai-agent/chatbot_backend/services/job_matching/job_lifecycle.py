@@ -0,0 +1,241 @@
+# job_lifecycle.py
+"""
+Job lifecycle: moves jobs that can no longer be suggested out of the hot `jobs`
+collection into `jobs_archive`, so matching queries, collection scans and the
+`jobs` indexes only cover the active working set.
+
+A job is archived when it has been:
+
+- closed (`status: "closed"`) for ARCHIVE_GRACE (by `updatedAt`),
+- expired (`expiryTime`) for ARCHIVE_GRACE, or
+- scraped (jobs stored by /users/{username}/jobs, which never close or expire)
+  and not found by any search for SCRAPED_JOB_MAX_AGE (`last_seen_at`, or the
+  insertion time of per-user copies left from before canonical_jobs.py).
+
+The grace period keeps recently closed jobs readable by the recruit backend
+(applications, job pages) for a while; archived jobs stay readable in
+`jobs_archive` until its TTL index drops them ARCHIVE_RETENTION after archival.
+
+Jobs move in batches of `batch_size` with a pause in between: each batch is
+upserted into the archive, then deleted from `jobs` with the archival condition
+repeated (a job reopened in between is kept, and its archive copy dropped), and
+the `user_job_matches` rows and `user_jobs` edges of the archived jobs are deleted
+(near-duplicates of archived jobs get a new cluster representative). Each round
+also hands the clusters of closed or expired representatives over to an open job
+of the cluster, so a duplicate is never hidden behind a closed posting during the
+grace period. Several API workers may run a `JobLifecycleManager`; a lease in the
+`migrations` collection makes sure only one of them runs a given round.
+
+Run a round by hand with:
+    python -m services.job_matching.job_lifecycle [--dry-run]
+"""
+import os
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, MongoClient, ReplaceOne
+from dotenv import load_dotenv
+
+from services.job_matching.canonical_jobs import USER_JOBS_COLLECTION
+from services.job_matching.leases import STATE_COLLECTION, claim_lease, release_lease
+from services.job_matching.match_feeds import FEEDS_COLLECTION
+from services.job_matching.near_duplicates import promote_closed_representatives, promote_duplicates
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "CVProject"
+JOBS_COLLECTION = "jobs"
+ARCHIVE_COLLECTION = "jobs_archive"
+STATE_ID = "job_lifecycle"
+
+# Closed or expired jobs stay in `jobs` this long before being archived
+ARCHIVE_GRACE = timedelta(days=7)
+# Scraped jobs are archived when no search found them for this long
+SCRAPED_JOB_MAX_AGE = timedelta(days=30)
+# Archived jobs are deleted (TTL index) this long after archival
+ARCHIVE_RETENTION = timedelta(days=365)
+# Jobs moved per batch
+BATCH_SIZE = 500
+# Seconds between two batches, so archival never saturates the server
+BATCH_PAUSE = 0.5
+# Maximum batches per round (the rest waits for the next round)
+MAX_BATCHES = 200
+# Seconds between two rounds
+RUN_INTERVAL = 3600
+# A manager whose lease is older than this is considered dead
+LEASE_DURATION = timedelta(minutes=30)
+
+
+def ensure_lifecycle_indexes(db):
+    """Indexes of the archival queries, and the TTL index of the archive."""
+    jobs = db[JOBS_COLLECTION]
+    jobs.create_index("expiryTime")
+    jobs.create_index([("status", ASCENDING), ("updatedAt", ASCENDING)])
+    jobs.create_index([("user", ASCENDING), ("_id", ASCENDING)], partialFilterExpression={"user": {"$exists": True}})
+    archive = db[ARCHIVE_COLLECTION]
+    archive.create_index("archived_at", expireAfterSeconds=int(ARCHIVE_RETENTION.total_seconds()))
+    archive.create_index("unique_id")
+
+
+def archival_rules(now: datetime, grace: timedelta = ARCHIVE_GRACE,
+                   scraped_max_age: timedelta = SCRAPED_JOB_MAX_AGE) -> Dict[str, dict]:
+    """Archive reason -> query of the jobs archived for it."""
+    return {
+        "closed": {"status": "closed", "$or": [{"updatedAt": {"$lte": now - grace}}, {"updatedAt": None}]},
+        "expired": {"expiryTime": {"$lte": now - grace}},
+        "scraped": {"$or": [
+            {"last_seen_at": {"$lt": now - scraped_max_age}},
+            {"user": {"$exists": True}, "_id": {"$lt": ObjectId.from_datetime(now - scraped_max_age)}},
+        ]},
+    }
+
+
+class JobLifecycleManager:
+    """
+    Background thread archiving closed, expired and stale scraped jobs.
+
+    Args:
+        db: The CVProject database
+        batch_size: Jobs moved per batch
+        batch_pause: Seconds between two batches
+        interval: Seconds between two rounds
+        on_archive: Called with the ids of every archived batch
+    """
+
+    def __init__(self, db, batch_size: int = BATCH_SIZE, batch_pause: float = BATCH_PAUSE,
+                 interval: float = RUN_INTERVAL, grace: timedelta = ARCHIVE_GRACE,
+                 on_archive=None):
+        self.db = db
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.interval = interval
+        self.grace = grace
+        self.on_archive = on_archive
+        self.owner = f"{id(self):x}-{time.time():.0f}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="job-lifecycle", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Job archival failed: {e}")
+            self._stop.wait(self.interval)
+
+    def run_once(self, dry_run: bool = False) -> Optional[Dict[str, int]]:
+        """
+        Archive every job due for archival (at most MAX_BATCHES batches).
+
+        Args:
+            dry_run: Only count the jobs due for archival
+
+        Returns:
+            Jobs archived (or due, for a dry run) per reason, or None when another worker holds the lease.
+        """
+        now = datetime.utcnow()
+        rules = archival_rules(now, self.grace)
+        if dry_run:
+            return {reason: self.db[JOBS_COLLECTION].count_documents(query) for reason, query in rules.items()}
+        if claim_lease(self.db, STATE_ID, self.owner, LEASE_DURATION) is None:
+            return None
+
+        started = time.perf_counter()
+        promoted = promote_closed_representatives(self.db[JOBS_COLLECTION], self.batch_size)
+        counts = {reason: 0 for reason in rules}
+        batches = 0
+        for reason, query in rules.items():
+            while batches < MAX_BATCHES and not self._stop.is_set():
+                archived = self.archive_batch(reason, query, now)
+                if archived is None:
+                    break
+                counts[reason] += archived
+                batches += 1
+                self._stop.wait(self.batch_pause)
+
+        release_lease(self.db, STATE_ID, {"last_run_at": now, "last_counts": counts, "last_promoted": promoted})
+        if promoted:
+            logger.info(f"New representatives for {promoted} clusters of closed or expired jobs")
+        if any(counts.values()):
+            logger.info(f"Jobs archived in {time.perf_counter() - started:.1f}s: {counts}")
+        return counts
+
+    def archive_batch(self, reason: str, query: dict, now: datetime) -> Optional[int]:
+        """
+        Move one batch of jobs matching `query` to the archive.
+
+        Returns:
+            Number of jobs archived, or None when no job matches any more.
+        """
+        jobs = self.db[JOBS_COLLECTION]
+        archive = self.db[ARCHIVE_COLLECTION]
+        docs = list(jobs.find(query).sort("_id", ASCENDING).limit(self.batch_size))
+        if not docs:
+            return None
+
+        ids = [doc["_id"] for doc in docs]
+        archive.bulk_write([
+            ReplaceOne({"_id": doc["_id"]}, {**doc, "archived_at": now, "archive_reason": reason}, upsert=True)
+            for doc in docs
+        ], ordered=False)
+        # Same condition again: a job reopened since it was read stays active
+        jobs.delete_many({"_id": {"$in": ids}, **query})
+        kept = {doc["_id"] for doc in jobs.find({"_id": {"$in": ids}}, {"_id": 1})}
+        if kept:
+            archive.delete_many({"_id": {"$in": list(kept)}})
+        archived = [job_id for job_id in ids if job_id not in kept]
+        if archived:
+            self.db[FEEDS_COLLECTION].delete_many({"job_id": {"$in": archived}})
+            self.db[USER_JOBS_COLLECTION].delete_many({"job_id": {"$in": archived}})
+            promote_duplicates(jobs, archived)
+            if self.on_archive is not None:
+                self.on_archive(archived)
+        return len(archived)
+
+    def status(self) -> Dict[str, Any]:
+        state = self.db[STATE_COLLECTION].find_one({"_id": STATE_ID}, {"_id": 0, "owner": 0}) or {}
+        return {
+            **state,
+            "active_jobs": self.db[JOBS_COLLECTION].estimated_document_count(),
+            "archived_jobs": self.db[ARCHIVE_COLLECTION].estimated_document_count(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive closed, expired and stale scraped jobs")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the jobs due for archival")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Jobs moved per batch")
+    parser.add_argument("--pause", type=float, default=BATCH_PAUSE, help="Seconds between two batches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_ATLAS_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_ATLAS_URI not found in environment variables. Please set it in your .env file.")
+
+    db = MongoClient(mongo_uri)[DB_NAME]
+    ensure_lifecycle_indexes(db)
+    manager = JobLifecycleManager(db, batch_size=args.batch_size, batch_pause=args.pause)
+    counts = manager.run_once(dry_run=args.dry_run)
+    if counts is None:
+        logger.warning("Another process is archiving jobs")
+    else:
+        logger.info(f"{'Due for archival' if args.dry_run else 'Archived'}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,526 @@
+# job_search.py
+"""
+Faceted search over the open jobs (one per near-duplicate cluster) with keyset
+pagination.
+
+Every worker keeps a light record of each open job (listing fields, facet values,
+sort keys; no description or embedding) and compiles them into `SearchFacets`:
+
+- one packed bitmap (np.packbits) per value of the single-valued facets (location,
+  field, level, type, salary band), ORed within a facet and ANDed across facets;
+- the rows of every skill, a job matching a skill filter only when it has all the
+  selected skills;
+- the facet code of every row and the skills of every row (CSR), so the count of
+  every value under the other filters is one np.bincount instead of a `$group` over
+  the jobs (skills are counted over the matching or, when fewer, the other rows);
+- each sort's row order, so a page is the next `limit` rows of the filter bitmap
+  after the cursor's position.
+
+Cursors carry the sort key and id of the last job returned, so pages stay stable while
+jobs are added or removed between requests. Expired jobs are masked at query time.
+
+The records follow the jobs collection through the same watermarks as job_sync
+(`updatedAt`, `features.computed_at`, `dedup.computed_at` and new `_id`s), polled
+at most every REFRESH_INTERVAL seconds in a background thread, plus a periodic check
+for deleted (archived) jobs. Searches keep using the last compiled facets meanwhile.
+"""
+import re
+import json
+import time
+import base64
+import bisect
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from services.job_matching.job_features import job_features
+from services.job_matching.job_sync import (
+    BATCH_SIZE, SINCE_OVERLAP, SYNC_PROJECTION, ensure_sync_indexes, is_open, open_jobs_query
+)
+from services.job_matching.skill_demand import normalize_field
+from utils.text_normalization import fold_diacritics, normalize_city, normalize_skill
+
+logger = logging.getLogger(__name__)
+
+# Fields read for every job: the sync fields plus the facet and listing fields
+SEARCH_PROJECTION = {**SYNC_PROJECTION, "city": 1, "job_location": 1, "field": 1, "type": 1, "salary": 1,
+                     "unique_id": 1, "slug": 1, "job_url": 1, "createdAt": 1, "first_seen_at": 1}
+# Heavy fields a search returns only when asked for (read for the returned page only)
+EXTRA_FIELDS = ("description", "technique", "workTime", "degree")
+# Single-valued facets
+FACETS = ("location", "field", "level", "type", "salary")
+# Sort orders: "newest" (posting time) and "salary" (highest upper bound first)
+SORTS = ("newest", "salary")
+# Maximum jobs per page
+MAX_PAGE_SIZE = 100
+# Values returned per facet (selected values are always returned)
+FACET_LIMIT = 20
+# Minimum seconds between two polls of the jobs collection
+REFRESH_INTERVAL = 10
+# Seconds between two checks for deleted (archived) jobs
+RECONCILE_INTERVAL = 300
+# Job write timestamps followed between polls
+WATERMARK_FIELDS = ("updatedAt", "features.computed_at", "dedup.computed_at")
+
+# Monthly salary bands, by upper bound in millions of VND
+SALARY_BANDS = ((10, "under 10m"), (20, "10-20m"), (30, "20-30m"), (50, "30-50m"), (float("inf"), "50m+"))
+# Millions of VND per USD
+USD_RATE = 0.025
+
+_NUMBER = re.compile(r"(\d+(?:[.,]\d+)*)\s*(k|tr|m)?\b")
+_THOUSANDS = re.compile(r"\d{1,3}(?:[.,]\d{3})+")
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _fold(value: Any) -> str:
+    return re.sub(r"\s+", " ", fold_diacritics(str(value)).lower()).strip()
+
+
+def _epoch(value: Any) -> Optional[float]:
+    return (value - _EPOCH).total_seconds() if isinstance(value, datetime) else None
+
+
+def parse_salary(text: Any) -> Optional[float]:
+    """
+    Upper bound of a salary text in millions of VND a month ('15 - 20 triệu' -> 20,
+    '$1,500 - $2,000' -> 50, '25.000.000 VND' -> 25), None when it has no amount.
+    """
+    if not text:
+        return None
+    folded = _fold(text)
+    usd = "$" in folded or "usd" in folded
+    amounts = []
+    for number, suffix in _NUMBER.findall(folded):
+        if _THOUSANDS.fullmatch(number):
+            value = float(number.replace(",", "").replace(".", ""))
+        else:
+            value = float(number.replace(",", "."))
+        if suffix == "k":
+            value *= 1000
+        amounts.append(value)
+    if not amounts:
+        return None
+    top = max(amounts)
+    if usd:
+        return top * USD_RATE
+    # Amounts in VND, else already in millions ('20 triệu', '20tr', '20m')
+    return top / 1_000_000 if top >= 100_000 else top
+
+
+def salary_band(text: Any) -> str:
+    if not text:
+        return "unspecified"
+    amount = parse_salary(text)
+    if amount is None:
+        return "negotiable"
+    return next(band for limit, band in SALARY_BANDS if amount <= limit)
+
+
+def search_record(job: dict) -> Dict[str, Any]:
+    """Facet values, skills, sort keys and listing of one job."""
+    features = job_features(job)
+    skills = set(features["preferred_skills"])
+    if not features.get("default_skills"):
+        skills.update(features["required_skills"])
+    posted = job.get("createdAt") or job.get("first_seen_at")
+    if posted is None and isinstance(job["_id"], ObjectId):
+        posted = job["_id"].generation_time.replace(tzinfo=None)
+    location = job.get("city") or job.get("job_location")
+    return {
+        "_id": job["_id"],
+        "facets": {
+            "location": normalize_city(location),
+            "field": normalize_field(job.get("field") or features.get("role")),
+            "level": features.get("level") or "unspecified",
+            "type": _fold(job["type"]) if job.get("type") else "unspecified",
+            "salary": salary_band(job.get("salary")),
+        },
+        "skills": sorted(skills),
+        "expires_at": job.get("expiryTime"),
+        "keys": {"newest": _epoch(posted), "salary": parse_salary(job.get("salary"))},
+        "listing": {
+            "id": str(job["_id"]),
+            "unique_id": job.get("unique_id"),
+            "title": features["title"],
+            "company": features["company"],
+            "location": location,
+            "field": job.get("field") or features.get("role"),
+            "type": job.get("type"),
+            "level": features.get("level"),
+            "salary": job.get("salary"),
+            "skills": features["required_skills"] if not features.get("default_skills") else [],
+            "posted_at": posted,
+            "expires_at": job.get("expiryTime"),
+            "url": job.get("job_url"),
+            "slug": job.get("slug"),
+        },
+    }
+
+
+def _grouped_rows(codes: np.ndarray, rows: np.ndarray, size: int) -> List[np.ndarray]:
+    """Rows of every code (codes[i] belongs to rows[i])."""
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(size + 1))
+    return [rows[order[bounds[code]:bounds[code + 1]]] for code in range(size)]
+
+
+class SearchFacets:
+    """Bitmaps, facet codes and sort orders of one version of the search records."""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        n = self.size = len(records)
+        self.ids = [record["_id"] for record in records]
+        self.positions = {job_id: row for row, job_id in enumerate(self.ids)}
+        self.listings = [record["listing"] for record in records]
+        self.expiry = np.array([_epoch(record["expires_at"]) or np.inf for record in records], dtype=np.float64)
+        rows = np.arange(n)
+
+        self.values: Dict[str, List[str]] = {}
+        self.lookups: Dict[str, Dict[str, int]] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        for facet in FACETS:
+            values = sorted({record["facets"][facet] for record in records})
+            lookup = {value: code for code, value in enumerate(values)}
+            codes = np.array([lookup[record["facets"][facet]] for record in records], dtype=np.intp)
+            self.values[facet], self.lookups[facet], self.codes[facet] = values, lookup, codes
+            self.bitmaps[facet] = {value: self._pack(value_rows)
+                                   for value, value_rows in zip(values, _grouped_rows(codes, rows, len(values)))}
+
+        # Skills of row r: entry_codes[row_starts[r]:row_starts[r + 1]]
+        self.skills = sorted({skill for record in records for skill in record["skills"]})
+        self.skill_codes = {skill: code for code, skill in enumerate(self.skills)}
+        self.row_starts = np.zeros(n + 1, dtype=np.intp)
+        np.cumsum([len(record["skills"]) for record in records], out=self.row_starts[1:])
+        self.entry_codes = np.array([self.skill_codes[skill] for record in records for skill in record["skills"]],
+                                    dtype=np.intp)
+        entry_rows = np.repeat(rows, np.diff(self.row_starts))
+        self.skill_rows = _grouped_rows(self.entry_codes, entry_rows, len(self.skills))
+        self.skill_totals = np.bincount(self.entry_codes, minlength=len(self.skills))
+
+        # Per sort: row order (key descending, then id), its negated keys and its ids
+        id_strings = [str(job_id) for job_id in self.ids]
+        id_ranks = np.argsort(np.argsort(np.array(id_strings, dtype=object), kind="stable"), kind="stable")
+        self.orders: Dict[str, Tuple[np.ndarray, np.ndarray, List[str]]] = {}
+        for sort in SORTS:
+            keys = np.array([record["keys"][sort] if record["keys"][sort] is not None else -np.inf
+                             for record in records], dtype=np.float64)
+            order = np.lexsort((id_ranks, -keys)) if n else rows
+            self.orders[sort] = (order, -keys[order], [id_strings[row] for row in order])
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _pack(self, rows: np.ndarray) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def _unpack(self, bits: np.ndarray) -> np.ndarray:
+        return np.unpackbits(bits, count=self.size).view(bool)
+
+    def _skill_counts(self, mask: np.ndarray) -> np.ndarray:
+        """Number of rows of `mask` having each skill, gathered from the smaller of the matching and other rows."""
+        matching = mask.sum() * 2 <= self.size
+        rows = np.flatnonzero(mask if matching else ~mask)
+        starts = self.row_starts[rows]
+        lengths = self.row_starts[rows + 1] - starts
+        entries = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        counts = np.bincount(self.entry_codes[entries], minlength=len(self.skills))
+        return counts if matching else self.skill_totals - counts
+
+    def _cursor_position(self, sort: str, cursor: Optional[dict]) -> int:
+        if cursor is None:
+            return 0
+        _, negated_keys, id_strings = self.orders[sort]
+        negated = -cursor["key"] if cursor["key"] is not None else np.inf
+        low = int(np.searchsorted(negated_keys, negated, side="left"))
+        high = int(np.searchsorted(negated_keys, negated, side="right"))
+        return bisect.bisect_right(id_strings, cursor["id"], low, high)
+
+    def search(self, filters: Dict[str, List[str]], skills: List[str], job_ids: Optional[Iterable[Any]] = None,
+               sort: str = "newest", cursor: Optional[dict] = None, limit: int = 20,
+               now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        One page of the jobs matching the filters, with the facet counts.
+
+        Args:
+            filters: Facet -> accepted (normalized) values
+            skills: Normalized skills a job must all have
+            job_ids: Only these jobs (e.g. those a user's searches found), None for all
+            sort: One of SORTS
+            cursor: Decoded cursor of the previous page
+            limit: Page size
+            now: Jobs expiring before this are left out
+
+        Returns:
+            Total matches, the page's rows and next cursor, and the facet counts.
+        """
+        now_epoch = _epoch(now or datetime.utcnow())
+        base = np.packbits(self.expiry > now_epoch)
+        if job_ids is not None:
+            base &= self._pack(np.array([self.positions[job_id] for job_id in job_ids if job_id in self.positions],
+                                        dtype=np.int64))
+        for skill in skills:
+            code = self.skill_codes.get(skill)
+            base &= self._pack(self.skill_rows[code] if code is not None else np.array([], dtype=np.int64))
+
+        selected: Dict[str, np.ndarray] = {}
+        for facet, values in filters.items():
+            bits = np.zeros_like(base)
+            for value in values:
+                bitmap = self.bitmaps[facet].get(value)
+                if bitmap is not None:
+                    bits |= bitmap
+            selected[facet] = bits
+        matches = base.copy()
+        for bits in selected.values():
+            matches &= bits
+        mask = self._unpack(matches)
+
+        # Counts of a facet ignore its own filter (values are alternatives), skill counts do not
+        facet_counts = {}
+        for facet in FACETS:
+            others = base.copy()
+            for name, bits in selected.items():
+                if name != facet:
+                    others &= bits
+            counts = np.bincount(self.codes[facet], weights=self._unpack(others),
+                                 minlength=len(self.values[facet])).astype(np.int64)
+            facet_counts[facet] = self._top_values(self.values[facet], self.lookups[facet], counts,
+                                                   filters.get(facet, []))
+        facet_counts["skills"] = self._top_values(self.skills, self.skill_codes, self._skill_counts(mask), skills)
+
+        order, negated_keys, id_strings = self.orders[sort]
+        start = self._cursor_position(sort, cursor)
+        hits = np.flatnonzero(mask[order[start:]])[:limit + 1]
+        page = order[start + hits[:limit]]
+        next_cursor = None
+        if len(hits) > limit:
+            last = start + int(hits[limit - 1])
+            key = -float(negated_keys[last])
+            next_cursor = {"sort": sort, "key": key if np.isfinite(key) else None, "id": id_strings[last]}
+        return {
+            "total": int(mask.sum()),
+            "rows": page.tolist(),
+            "next_cursor": next_cursor,
+            "facets": facet_counts,
+        }
+
+    @staticmethod
+    def _top_values(values: List[str], lookup: Dict[str, int], counts: np.ndarray,
+                    chosen: List[str]) -> List[Dict[str, Any]]:
+        """The FACET_LIMIT values with the most rows, then the chosen values not among them."""
+        best = np.argpartition(-counts, FACET_LIMIT)[:FACET_LIMIT] if len(counts) > FACET_LIMIT else np.arange(len(counts))
+        best = best[np.lexsort((best, -counts[best]))]
+        top = [int(code) for code in best if counts[code] > 0]
+        top += [lookup[value] for value in chosen if value in lookup and lookup[value] not in top]
+        result = [{"value": values[code], "count": int(counts[code])} for code in top]
+        result += [{"value": value, "count": 0} for value in chosen if value not in lookup]
+        return result
+
+
+def encode_cursor(cursor: Optional[dict]) -> Optional[str]:
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(cursor, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: Optional[str], sort: str) -> Optional[dict]:
+    """Cursor of a `next_cursor` token. Raises ValueError for a malformed token or another sort's."""
+    if not token:
+        return None
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        key, job_id = cursor["key"], str(cursor["id"])
+    except Exception:
+        raise ValueError("Malformed cursor")
+    if cursor.get("sort") != sort or not (key is None or isinstance(key, (int, float))):
+        raise ValueError("Cursor of another search")
+    return {"key": key, "id": job_id}
+
+
+class JobSearchIndex:
+    """
+    Search records of the open jobs, compiled into SearchFacets and kept current from
+    the jobs collection in the background.
+
+    Args:
+        refresh_interval: Minimum seconds between two polls of the jobs collection
+    """
+
+    def __init__(self, refresh_interval: float = REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.records: Dict[Any, Dict[str, Any]] = {}
+        self.facets: Optional[SearchFacets] = None
+        self._watermarks: Dict[str, datetime] = {}
+        self._last_id: Optional[ObjectId] = None
+        self._last_poll = 0.0
+        self._last_reconcile = 0.0
+        self._updating = False
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.facets is not None
+
+    def build(self, collection):
+        """Load the open jobs and compile them."""
+        started = time.perf_counter()
+        since = datetime.utcnow()
+        ensure_sync_indexes(collection)
+        records = {job["_id"]: search_record(job)
+                   for job in collection.find(open_jobs_query(since), SEARCH_PROJECTION)}
+        with self._lock:
+            self.records = records
+            self._watermarks = {field: since for field in WATERMARK_FIELDS}
+            self._last_id = ObjectId.from_datetime((since - SINCE_OVERLAP).replace(tzinfo=timezone.utc))
+            self._last_poll = self._last_reconcile = time.monotonic()
+        self._compile()
+        logger.info(f"Job search index built: {len(records)} jobs in {time.perf_counter() - started:.2f}s")
+
+    def refresh(self, collection):
+        """At most every refresh_interval seconds, apply the job changes in a background thread."""
+        if not self.ready or time.monotonic() - self._last_poll < self.refresh_interval:
+            return
+        with self._lock:
+            if self._updating:
+                return
+            self._updating = True
+            self._last_poll = time.monotonic()
+
+        def update():
+            try:
+                self.update(collection)
+            except Exception as e:
+                logger.error(f"Job search refresh failed: {e}")
+            finally:
+                self._updating = False
+        threading.Thread(target=update, name="job-search", daemon=True).start()
+
+    def update(self, collection) -> int:
+        """
+        Apply the jobs written since the last poll (and, when due, drop deleted jobs).
+
+        Returns:
+            Number of jobs added, updated or removed.
+        """
+        now = datetime.utcnow()
+        changes: Dict[Any, Optional[dict]] = {}
+        watermarks = dict(self._watermarks)
+        for field in WATERMARK_FIELDS:
+            for job in collection.find({field: {"$gt": self._watermarks[field] - SINCE_OVERLAP}}, SEARCH_PROJECTION):
+                changes[job["_id"]] = job
+                value = job
+                for part in field.split("."):
+                    value = value.get(part) if isinstance(value, dict) else None
+                if isinstance(value, datetime) and value > watermarks[field]:
+                    watermarks[field] = value
+        last_id = self._last_id
+        for job in collection.find({"_id": {"$gt": self._last_id}}, SEARCH_PROJECTION):
+            changes[job["_id"]] = job
+            if isinstance(job["_id"], ObjectId) and job["_id"] > last_id:
+                last_id = job["_id"]
+
+        if time.monotonic() - self._last_reconcile >= RECONCILE_INTERVAL:
+            self._last_reconcile = time.monotonic()
+            indexed = list(self.records)
+            existing = set()
+            for start in range(0, len(indexed), BATCH_SIZE * 10):
+                chunk = indexed[start:start + BATCH_SIZE * 10]
+                existing.update(job["_id"] for job in collection.find({"_id": {"$in": chunk}}, {"_id": 1}))
+            changes.update((job_id, None) for job_id in indexed if job_id not in existing)
+
+        changed = 0
+        with self._lock:
+            for job_id, job in changes.items():
+                record = search_record(job) if job is not None and is_open(job, now) else None
+                if record is None:
+                    changed += self.records.pop(job_id, None) is not None
+                elif self.records.get(job_id) != record:
+                    self.records[job_id] = record
+                    changed += 1
+            self._watermarks, self._last_id = watermarks, last_id
+        if changed:
+            self._compile()
+        return changed
+
+    def remove(self, job_ids: Iterable[Any]):
+        """Drop jobs right away (e.g. just archived) instead of at the next reconciliation."""
+        with self._lock:
+            removed = [job_id for job_id in job_ids if self.records.pop(job_id, None) is not None]
+        if removed:
+            self._compile()
+
+    def _compile(self):
+        with self._lock:
+            records = list(self.records.values())
+        self.facets = SearchFacets(records)
+
+    def search(self, filters: Dict[str, List[str]], skills: Iterable[str] = (), job_ids: Optional[Iterable[Any]] = None,
+               sort: str = "newest", cursor: Optional[str] = None, limit: int = 20,
+               include: Iterable[str] = (), collection=None) -> Dict[str, Any]:
+        """
+        One page of the open jobs matching the filters, with the facet counts.
+
+        Args:
+            filters: Facet -> accepted values, as users write them ('Hồ Chí Minh', 'Full-time')
+            skills: Skills a job must all have
+            job_ids: Only these jobs, None for all
+            sort: One of SORTS
+            cursor: `next_cursor` of the previous page
+            limit: Page size (at most MAX_PAGE_SIZE)
+            include: EXTRA_FIELDS to return, read from `collection` for the page's jobs only
+            collection: The `jobs` collection (needed with `include`)
+
+        Returns:
+            Total matches, the page's jobs, the next page's cursor (None on the last page)
+            and the count of each facet value.
+
+        Raises:
+            ValueError: Unknown facet, sort or extra field, or malformed cursor
+        """
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort '{sort}'. Sorts: {', '.join(SORTS)}")
+        unknown = set(filters) - set(FACETS)
+        if unknown:
+            raise ValueError(f"Unknown facet '{sorted(unknown)[0]}'. Facets: {', '.join(FACETS)}")
+        include = list(dict.fromkeys(include))
+        unknown = set(include) - set(EXTRA_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown field '{sorted(unknown)[0]}'. Fields: {', '.join(EXTRA_FIELDS)}")
+        normalizers = {"location": normalize_city, "field": normalize_field, "level": _fold, "type": _fold,
+                       "salary": str.strip}
+        filters = {facet: list(dict.fromkeys(normalizers[facet](value) for value in values))
+                   for facet, values in filters.items() if values}
+        skills = list(dict.fromkeys(normalize_skill(skill) for skill in skills if skill))
+
+        facets = self.facets
+        result = facets.search(filters, skills, job_ids=job_ids, sort=sort, cursor=decode_cursor(cursor, sort),
+                               limit=max(1, min(limit, MAX_PAGE_SIZE)))
+        jobs = [dict(facets.listings[row]) for row in result["rows"]]
+        if include and jobs:
+            page_ids = [facets.ids[row] for row in result["rows"]]
+            extras = {job.pop("_id"): job for job in collection.find(
+                {"_id": {"$in": page_ids}}, {field: 1 for field in include})}
+            for job_id, job in zip(page_ids, jobs):
+                job.update({field: extras.get(job_id, {}).get(field) for field in include})
+        return {
+            "total": result["total"],
+            "jobs": jobs,
+            "next_cursor": encode_cursor(result["next_cursor"]),
+            "facets": result["facets"],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        facets = self.facets
+        return {
+            "jobs": len(facets) if facets is not None else 0,
+            "skills": len(facets.skills) if facets is not None else 0,
+            "values": {facet: len(facets.values[facet]) for facet in FACETS} if facets is not None else {},
+            "watermarks": dict(self._watermarks),
+        }
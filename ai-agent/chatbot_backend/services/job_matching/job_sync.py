@@ -0,0 +1,352 @@
+# job_sync.py
+"""
+Keeps a JobIndex in sync with the `jobs` collection without full rebuilds.
+
+Jobs are written by the scraper endpoint of this service and by the recruit
+backend, which also closes them (`status: "closed"`) and lets them expire
+(`expiryTime`). `JobSync` follows those writes in a background thread:
+
+- on a replica set it tails a change stream (with the post-image of updates);
+- on a standalone server it polls `updatedAt`, `features.computed_at` and
+  `dedup.computed_at` (each paged on (field, _id)) and `_id` for documents written
+  without either; deletes (e.g. archival, see job_lifecycle.py) leave nothing to
+  poll, so every RECONCILE_INTERVAL the indexed ids are checked against the
+  collection.
+
+Changes are applied in batches of at most BATCH_SIZE: open jobs are (re)indexed,
+closed, expired, deleted and near-duplicate (near_duplicates.py) ones removed.
+Expiries need no write, so the expiry time of every indexed job is kept in a heap
+and due jobs are dropped as time passes. `stats()` reports the mode, counts and
+the lag between a write and its application.
+"""
+import heapq
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId, Timestamp
+from pymongo.errors import OperationFailure
+
+from services.job_matching.job_features import RAW_JOB_PROJECTION
+from services.job_matching.skill_index import JobIndex
+
+logger = logging.getLogger(__name__)
+
+# Fields read for every synced job: the index fields plus the lifecycle fields
+SYNC_PROJECTION = {**RAW_JOB_PROJECTION, "status": 1, "expiryTime": 1, "updatedAt": 1,
+                   "dedup.duplicate_of": 1, "dedup.computed_at": 1}
+# Maximum number of changes applied at once
+BATCH_SIZE = 200
+# Maximum seconds a change waits for its batch to fill up
+BATCH_WAIT = 0.5
+# Seconds between two polls (standalone servers)
+POLL_INTERVAL = 5
+# Seconds between two checks for deleted jobs (polling only)
+RECONCILE_INTERVAL = 300
+# Seconds before retrying after an error
+RETRY_DELAY = 5
+# Change stream error code on servers that are not replica set members
+CHANGE_STREAM_UNSUPPORTED = 40573
+# Changes taken into account from this long before the `since` time, so none is lost to clock skew
+SINCE_OVERLAP = timedelta(seconds=30)
+
+_WATCHED_OPERATIONS = ["insert", "update", "replace", "delete"]
+
+
+def ensure_sync_indexes(collection):
+    """Indexes the polling queries page on."""
+    collection.create_index([("updatedAt", 1), ("_id", 1)])
+    collection.create_index([("features.computed_at", 1), ("_id", 1)])
+    collection.create_index([("dedup.computed_at", 1), ("_id", 1)])
+
+
+def open_jobs_query(now: Optional[datetime] = None) -> dict:
+    """
+    Jobs that can be suggested: not closed, not expired (jobs without an expiry never
+    expire) and not a near-duplicate of another posting.
+    """
+    now = now or datetime.utcnow()
+    return {
+        "status": {"$ne": "closed"},
+        "$or": [{"expiryTime": None}, {"expiryTime": {"$gt": now}}],
+        "dedup.duplicate_of": {"$exists": False},
+    }
+
+
+def is_open(job: dict, now: Optional[datetime] = None) -> bool:
+    """Python version of open_jobs_query for one document."""
+    expiry = job.get("expiryTime")
+    return (job.get("status") != "closed"
+            and (not isinstance(expiry, datetime) or expiry > (now or datetime.utcnow()))
+            and not (job.get("dedup") or {}).get("duplicate_of"))
+
+
+class JobSync:
+    """
+    Background sync of the jobs collection into a JobIndex.
+
+    Args:
+        collection: The `jobs` collection
+        index: Index built from open_jobs_query() shortly after `since`
+        since: When the index was built; changes from then on are applied
+        mode: "auto" (change stream, polling on standalone servers), "change_stream" or "polling"
+        on_change: Called after every batch that changed the index (e.g. to recompile the scorer)
+    """
+
+    def __init__(self, collection, index: JobIndex, since: Optional[datetime] = None, mode: str = "auto",
+                 on_change: Optional[Callable[[], Any]] = None, poll_interval: float = POLL_INTERVAL):
+        self.collection = collection
+        self.index = index
+        self.mode = mode
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        since = (since or datetime.utcnow()) - SINCE_OVERLAP
+        self._since = since
+        self._resume_token = None
+        self._polling_ready = False
+        self._last_reconcile = time.monotonic()
+        # Polling watermarks: (value, _id) per timestamp field, and the last _id
+        self._watermarks: Dict[str, Tuple[Any, Any]] = {
+            field: (since, None) for field in ("updatedAt", "features.computed_at", "dedup.computed_at")}
+        self._last_id = ObjectId.from_datetime(since.replace(tzinfo=timezone.utc))
+        # (expiry, job id) of indexed jobs, and the current expiry of each job
+        self._expiry_heap: List[Tuple[datetime, Any]] = []
+        self._expiries: Dict[Any, datetime] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "batches": 0, "changes": 0, "indexed": 0, "removed": 0, "expired": 0, "errors": 0,
+            "last_batch_at": None, "last_lag_s": None, "max_lag_s": 0.0, "total_lag_s": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self._thread is None:
+            self._seed_expiries()
+            self._thread = threading.Thread(target=self._loop, name="job-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.mode in ("auto", "change_stream"):
+                    self._tail_change_stream()
+                else:
+                    self._poll_once()
+                    self._expire()
+                    if time.monotonic() - self._last_reconcile >= RECONCILE_INTERVAL:
+                        self._reconcile()
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:
+                with self._stats_lock:
+                    self._stats["errors"] += 1
+                logger.warning(f"Job sync ({self.mode}) failed, retrying in {RETRY_DELAY}s: {e}")
+                self._stop.wait(RETRY_DELAY)
+
+    # ---------- Change stream ----------
+
+    def _tail_change_stream(self):
+        pipeline = [{"$match": {"operationType": {"$in": _WATCHED_OPERATIONS}}}]
+        options = {"resume_after": self._resume_token} if self._resume_token else {
+            "start_at_operation_time": Timestamp(int(self._since.replace(tzinfo=timezone.utc).timestamp()), 0)}
+        try:
+            stream = self.collection.watch(pipeline, full_document="updateLookup",
+                                           max_await_time_ms=int(BATCH_WAIT * 1000), **options)
+        except OperationFailure as e:
+            if self.mode == "auto" and e.code == CHANGE_STREAM_UNSUPPORTED:
+                logger.info("Change streams unavailable (standalone server): polling the jobs collection")
+                self.mode = "polling"
+                return
+            raise
+        if self.mode == "auto":
+            self.mode = "change_stream"
+            logger.info("Following the jobs collection through a change stream")
+
+        with stream:
+            batch: List[dict] = []
+            deadline = 0.0
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    if not batch:
+                        deadline = time.monotonic() + BATCH_WAIT
+                    batch.append(change)
+                if batch and (len(batch) >= BATCH_SIZE or change is None or time.monotonic() >= deadline):
+                    if self._apply_changes(batch) and self.on_change is not None:
+                        self.on_change()
+                    batch = []
+                # Only advance past changes that were applied
+                if not batch:
+                    self._resume_token = stream.resume_token
+                self._expire()
+
+    def _apply_changes(self, changes: List[dict]) -> bool:
+        now = datetime.utcnow()
+        upserts: Dict[Any, dict] = {}
+        removals = set()
+        oldest = None
+        for change in changes:
+            job_id = change["documentKey"]["_id"]
+            job = change.get("fullDocument")
+            # Later changes of the same job win
+            upserts.pop(job_id, None)
+            removals.discard(job_id)
+            if change["operationType"] != "delete" and job is not None and is_open(job, now):
+                upserts[job_id] = job
+            else:
+                removals.add(job_id)
+            written = change.get("wallTime") or change["clusterTime"].as_datetime().replace(tzinfo=None)
+            oldest = written if oldest is None or written < oldest else oldest
+        return self._apply(list(upserts.values()), removals, len(changes), oldest)
+
+    # ---------- Polling ----------
+
+    def _poll_once(self) -> int:
+        """
+        Apply the documents written since the watermarks (on_change is called once per
+        round, not per batch, so catching up does not recompile the scorer every batch).
+
+        Returns:
+            Number of changes applied.
+        """
+        if not self._polling_ready:
+            ensure_sync_indexes(self.collection)
+            self._polling_ready = True
+        applied = 0
+        changed = False
+        for field in self._watermarks:
+            while True:
+                value, last_id = self._watermarks[field]
+                query = {field: {"$gt": value}} if last_id is None else {
+                    "$or": [{field: {"$gt": value}}, {field: value, "_id": {"$gt": last_id}}]}
+                jobs = list(self.collection.find(query, SYNC_PROJECTION).sort([(field, 1), ("_id", 1)]).limit(BATCH_SIZE))
+                if not jobs:
+                    break
+                last = jobs[-1]
+                self._watermarks[field] = (_field_value(last, field), last["_id"])
+                changed |= self._apply_documents(jobs, min(_field_value(job, field) for job in jobs))
+                applied += len(jobs)
+                if len(jobs) < BATCH_SIZE:
+                    break
+
+        # Inserts without either timestamp (e.g. the scraper endpoint before features existed)
+        while True:
+            jobs = list(self.collection.find({"_id": {"$gt": self._last_id}}, SYNC_PROJECTION)
+                        .sort("_id", 1).limit(BATCH_SIZE))
+            if not jobs:
+                break
+            self._last_id = jobs[-1]["_id"]
+            written = [job["_id"].generation_time.replace(tzinfo=None) for job in jobs if isinstance(job["_id"], ObjectId)]
+            changed |= self._apply_documents(jobs, min(written) if written else None)
+            applied += len(jobs)
+            if len(jobs) < BATCH_SIZE:
+                break
+        if changed and self.on_change is not None:
+            self.on_change()
+        return applied
+
+    def _reconcile(self) -> int:
+        """Drop indexed jobs deleted from the collection. Returns the number dropped."""
+        self._last_reconcile = time.monotonic()
+        with self.index._lock:
+            indexed = list(self.index.positions)
+        existing = set()
+        for start in range(0, len(indexed), BATCH_SIZE * 10):
+            chunk = indexed[start:start + BATCH_SIZE * 10]
+            existing.update(job["_id"] for job in self.collection.find({"_id": {"$in": chunk}}, {"_id": 1}))
+        deleted = [job_id for job_id in indexed if job_id not in existing]
+        if deleted and self._apply([], deleted, len(deleted), None) and self.on_change is not None:
+            self.on_change()
+        return len(deleted)
+
+    def _apply_documents(self, jobs: List[dict], oldest: Optional[datetime]) -> bool:
+        now = datetime.utcnow()
+        upserts = [job for job in jobs if is_open(job, now)]
+        removals = {job["_id"] for job in jobs if not is_open(job, now)}
+        return self._apply(upserts, removals, len(jobs), oldest)
+
+    # ---------- Applying ----------
+
+    def _apply(self, upserts: List[dict], removals, changes: int, oldest: Optional[datetime]) -> bool:
+        """Apply one batch to the index. Returns whether the index changed."""
+        for job in upserts:
+            self._track_expiry(job["_id"], job.get("expiryTime"))
+        # Jobs indexed with the same features (e.g. re-read in the overlap after the build) are skipped
+        upserts = [job for job in upserts if not self.index.indexed_as(job)]
+        removals = [job_id for job_id in removals if job_id in self.index.positions]
+        if upserts or removals:
+            self.index.apply_changes(upserts, removals)
+        for job_id in removals:
+            self._expiries.pop(job_id, None)
+
+        lag = max(0.0, (datetime.utcnow() - oldest).total_seconds()) if isinstance(oldest, datetime) else None
+        with self._stats_lock:
+            stats = self._stats
+            stats["batches"] += 1
+            stats["changes"] += changes
+            stats["indexed"] += len(upserts)
+            stats["removed"] += len(removals)
+            stats["last_batch_at"] = datetime.utcnow()
+            if lag is not None:
+                stats["last_lag_s"] = round(lag, 3)
+                stats["max_lag_s"] = max(stats["max_lag_s"], round(lag, 3))
+                stats["total_lag_s"] += lag
+        logger.debug(f"Job sync batch: {changes} changes, {len(upserts)} indexed, {len(removals)} removed, lag {lag}")
+        return bool(upserts or removals)
+
+    # ---------- Expiries ----------
+
+    def _seed_expiries(self):
+        """Expiry times of the jobs indexed by the initial build."""
+        cursor = self.collection.find({"expiryTime": {"$gt": datetime.utcnow()}}, {"expiryTime": 1})
+        for job in cursor:
+            if job["_id"] in self.index.positions:
+                self._track_expiry(job["_id"], job["expiryTime"])
+
+    def _track_expiry(self, job_id: Any, expiry: Any):
+        if isinstance(expiry, datetime):
+            self._expiries[job_id] = expiry
+            heapq.heappush(self._expiry_heap, (expiry, job_id))
+        else:
+            self._expiries.pop(job_id, None)
+
+    def _expire(self):
+        now = datetime.utcnow()
+        expired = []
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expiry, job_id = heapq.heappop(self._expiry_heap)
+            # Entries of jobs re-indexed with another expiry are stale
+            if self._expiries.get(job_id) == expiry:
+                del self._expiries[job_id]
+                expired.append(job_id)
+        if expired:
+            self.index.apply_changes([], expired)
+            with self._stats_lock:
+                self._stats["expired"] += len(expired)
+            logger.info(f"Job sync: {len(expired)} expired jobs removed from the index")
+            if self.on_change is not None:
+                self.on_change()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total_lag = stats.pop("total_lag_s")
+        stats["avg_lag_s"] = round(total_lag / stats["batches"], 3) if stats["batches"] else None
+        stats.update(mode=self.mode, running=self.running, tracked_expiries=len(self._expiries), jobs=len(self.index))
+        return stats
+
+
+def _field_value(job: dict, field: str) -> Any:
+    value = job
+    for part in field.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
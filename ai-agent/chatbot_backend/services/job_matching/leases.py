@@ -0,0 +1,60 @@
+# leases.py
+"""
+Leases of the background rounds several API workers may run (match feeds, skill
+demand, job archival), so only one worker runs a given round at a time.
+
+A lease lives in the round's state document in the `migrations` collection (its
+`_id` is the round's state id): `owner` and `lease_until`, next to the fields the
+round keeps there. A worker takes the lease when it is free, expired or already
+its own, and releases it when the round is over. A worker that dies holding a
+lease blocks the others until `lease_until`.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+STATE_COLLECTION = "migrations"
+
+
+def claim_lease(db, state_id: str, owner: str, duration: timedelta) -> Optional[dict]:
+    """
+    Take the lease of a round for `duration`.
+
+    Args:
+        db: The CVProject database
+        state_id: `_id` of the round's state document
+        owner: Id of the claiming worker
+        duration: Time after which a lease not renewed or released is considered dead
+
+    Returns:
+        The state document with the lease taken, or None when another worker holds it
+        (or took it first).
+
+    Raises:
+        pymongo.errors.PyMongoError: When the database cannot be reached
+    """
+    now = datetime.utcnow()
+    states = db[STATE_COLLECTION]
+    state = states.find_one({"_id": state_id})
+    if state and state.get("owner") not in (None, owner) and state.get("lease_until", now) > now:
+        return None
+    try:
+        # On an existing document the lease_until condition fails when another worker renewed it since
+        return states.find_one_and_update(
+            {"_id": state_id, "lease_until": state.get("lease_until")} if state else {"_id": state_id},
+            {"$set": {"owner": owner, "lease_until": now + duration, "status": "running"}},
+            upsert=state is None,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Another worker created the state document first
+        return None
+
+
+def release_lease(db, state_id: str, updates: Optional[Dict[str, Any]] = None):
+    """Free the lease of a round, saving `updates` in its state document."""
+    db[STATE_COLLECTION].update_one({"_id": state_id}, {"$set": {
+        "status": "idle", "lease_until": datetime.utcnow(), **(updates or {}),
+    }})
@@ -0,0 +1,159 @@
+# match_cache.py
+"""
+Per-user cache of job match results.
+
+An entry is valid for one (CV feature hash, jobs index stamp, scoring config
+version) key: a re-upload changes the feature hash, any change to the indexed jobs
+(added, removed, or features updated in place) changes the index stamp (a digest of
+their features, see JobIndex.content_stamp) and a scoring change changes the config
+version, so stale entries are never served even when an explicit invalidation was
+missed (e.g. an upload handled by another worker). Entries live in an in-process
+LRU with a TTL; an optional Mongo collection shares them between workers and
+remembers which users to warm up on startup.
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.job_matching.scoring import SCORING_CONFIG_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Users kept in the in-process cache
+MATCH_CACHE_SIZE = 10_000
+# Seconds an entry is served without recomputation
+MATCH_CACHE_TTL = 900
+# Users whose matches are computed on startup
+MATCH_CACHE_WARM_USERS = 100
+
+
+class MatchCache:
+    """
+    LRU + TTL cache username -> job matches.
+
+    Args:
+        max_entries: Maximum number of users kept in process
+        ttl: Seconds an entry stays valid
+        shared_collection: Optional Mongo collection shared by all workers
+        config_version: Scoring configuration version included in every key
+    """
+
+    def __init__(self, max_entries: int = MATCH_CACHE_SIZE, ttl: int = MATCH_CACHE_TTL,
+                 shared_collection=None, config_version: str = SCORING_CONFIG_VERSION):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared_collection
+        self.config_version = config_version
+        # username -> (key, matches, expires_at as time.monotonic())
+        self._entries: "OrderedDict[str, Tuple[tuple, Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+        if self.shared is not None:
+            try:
+                self.shared.create_index("expires_at", expireAfterSeconds=0)
+                self.shared.create_index("last_access")
+            except Exception as e:
+                logger.warning(f"Could not create match cache indexes: {e}")
+
+    def key(self, feature_hash: str, jobs_version: str) -> tuple:
+        return (feature_hash, jobs_version, self.config_version)
+
+    def get(self, username: str, feature_hash: str, jobs_version: str) -> Optional[Any]:
+        """Cached matches of a user for this key, or None."""
+        key = self.key(feature_hash, jobs_version)
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None:
+                if entry[0] == key and entry[2] > time.monotonic():
+                    self._entries.move_to_end(username)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[username]
+
+        if self.shared is not None:
+            try:
+                doc = self.shared.find_one(
+                    {"_id": username, "key": list(key), "expires_at": {"$gt": datetime.utcnow()}},
+                    {"matches": 1},
+                )
+            except Exception as e:
+                logger.warning(f"Shared match cache read failed for '{username}': {e}")
+                doc = None
+            if doc is not None:
+                self._store(username, key, doc["matches"])
+                with self._lock:
+                    self.shared_hits += 1
+                return doc["matches"]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, username: str, feature_hash: str, jobs_version: str, matches: Any):
+        """Cache the matches of a user for this key (in process and, if enabled, shared)."""
+        key = self.key(feature_hash, jobs_version)
+        self._store(username, key, matches)
+        if self.shared is not None:
+            now = datetime.utcnow()
+            try:
+                self.shared.update_one(
+                    {"_id": username},
+                    {"$set": {"key": list(key), "matches": matches, "last_access": now,
+                              "expires_at": now + timedelta(seconds=self.ttl)}},
+                    upsert=True,
+                )
+            except Exception as e:
+                logger.warning(f"Shared match cache write failed for '{username}': {e}")
+
+    def _store(self, username: str, key: tuple, matches: Any):
+        with self._lock:
+            self._entries[username] = (key, matches, time.monotonic() + self.ttl)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, username: str):
+        """Drop the cached matches of one user (e.g. after a CV upload)."""
+        with self._lock:
+            self._entries.pop(username, None)
+        if self.shared is not None:
+            try:
+                self.shared.delete_one({"_id": username})
+            except Exception as e:
+                logger.warning(f"Shared match cache delete failed for '{username}': {e}")
+
+    def invalidate_all(self):
+        """
+        Drop every in-process entry (e.g. after jobs were inserted). Shared entries
+        carry the jobs stamp in their key and simply stop matching.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def recent_users(self, limit: int = MATCH_CACHE_WARM_USERS) -> List[str]:
+        """Users whose matches were computed most recently (shared collection only)."""
+        if self.shared is None:
+            return []
+        try:
+            docs = self.shared.find({}, {"_id": 1}).sort("last_access", -1).limit(limit)
+            return [doc["_id"] for doc in docs]
+        except Exception as e:
+            logger.warning(f"Could not list recent match cache users: {e}")
+            return []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "shared": self.shared is not None,
+                "config_version": self.config_version,
+            }
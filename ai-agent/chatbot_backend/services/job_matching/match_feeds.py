@@ -0,0 +1,389 @@
+# match_feeds.py
+"""
+Materialized per-user match feeds.
+
+Instead of scoring the whole corpus when a user asks for suggestions, job matches
+are pushed into the `user_job_matches` collection as jobs arrive:
+
+- `MatchFeedMaintainer` picks up jobs written since its watermarks (re-featured
+  by `features.computed_at`, edited or closed by `updatedAt`, flagged as
+  near-duplicates by `dedup.computed_at`, inserted without features by `_id`),
+  drops their rows, scores the open ones against every CV whose feed is current,
+  in worker processes, and upserts their rows in bulk. Rows of expired jobs are
+  deleted every round (rows carry their job's `expires_at`).
+- `rebuild_user_feed` scores the whole corpus once for one CV, after an upload or
+  when its feed is missing.
+
+Reading a current feed is a range read on the (username, match_percentage) index,
+checked against the open jobs so rows the maintainer has not dropped yet are never
+served. A CV's feed is current when `cvs.match_feed.feature_hash` equals the hash
+of its stored features.
+"""
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
+
+from services.cv_refinement.resume_artifacts import build_match_profile
+from services.job_matching.job_features import build_job_features
+from services.job_matching.job_sync import (
+    SYNC_PROJECTION, _field_value, ensure_sync_indexes, is_open, open_jobs_query
+)
+from services.job_matching.leases import STATE_COLLECTION, claim_lease, release_lease
+from services.job_matching.scoring import CompiledJobs, JobScorer, MIN_MATCH_PERCENTAGE, format_match
+from services.job_matching.skill_index import JobIndex
+
+logger = logging.getLogger(__name__)
+
+FEEDS_COLLECTION = "user_job_matches"
+STATE_ID = "user_job_matches"
+
+# Rows kept per user when a feed is rebuilt
+FEED_SIZE = 500
+# New jobs scored per maintainer round
+JOB_BATCH_SIZE = 500
+# CV profiles per worker task
+PROFILE_CHUNK_SIZE = 200
+# Rows per bulk write
+WRITE_BATCH_SIZE = 1000
+# Seconds between two maintainer rounds when not notified
+POLL_INTERVAL = 30
+# A maintainer whose lease is older than this is considered dead
+LEASE_DURATION = timedelta(minutes=2)
+# Job write timestamps followed by the maintainer -> their watermark in the state document
+WATERMARKS = {"features.computed_at": "last_computed_at", "updatedAt": "last_updated_at",
+              "dedup.computed_at": "last_dedup_at"}
+# Sort order of a feed, best first
+FEED_ORDER = [("match_percentage", DESCENDING), ("job_id", DESCENDING)]
+
+_FEED_STATE_PROJECTION = {"username": 1, "artifacts.features.output_hash": 1, "match_feed.feature_hash": 1}
+
+
+def ensure_feed_indexes(db):
+    feeds = db[FEEDS_COLLECTION]
+    feeds.create_index([("username", ASCENDING), ("match_percentage", DESCENDING)])
+    feeds.create_index([("username", ASCENDING), ("job_id", ASCENDING)], unique=True)
+    feeds.create_index("job_id")
+    feeds.create_index("expires_at", sparse=True)
+    db["jobs"].create_index("features.computed_at")
+    ensure_sync_indexes(db["jobs"])
+
+
+def _feature_hash(cv: dict) -> Optional[str]:
+    return (((cv.get("artifacts") or {}).get("features") or {}).get("output_hash"))
+
+
+def feed_status(cvs, username: str) -> Tuple[Optional[str], bool]:
+    """
+    Returns:
+        Tuple of (hash of the stored CV features, whether the user's feed is built for them)
+    """
+    cv = cvs.find_one({"username": username}, _FEED_STATE_PROJECTION) or {}
+    feature_hash = _feature_hash(cv)
+    return feature_hash, bool(feature_hash) and (cv.get("match_feed") or {}).get("feature_hash") == feature_hash
+
+
+def read_feed(db, username: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Best `limit` materialized matches of a user whose jobs are still open, best first."""
+    now = datetime.utcnow()
+    matches: List[Dict[str, Any]] = []
+    batch: List[dict] = []
+    rows = (db[FEEDS_COLLECTION].find({"username": username}, {"_id": 0, "job_id": 1, "match": 1})
+            .sort(FEED_ORDER).batch_size(limit * 2))
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= limit * 2:
+            matches += _open_matches(db, batch, now)
+            batch = []
+            if len(matches) >= limit:
+                break
+    if batch and len(matches) < limit:
+        matches += _open_matches(db, batch, now)
+    return matches[:limit]
+
+
+def _open_matches(db, rows: List[dict], now: datetime) -> List[Dict[str, Any]]:
+    """Matches of the rows whose job is open (closed, expired, duplicate and deleted jobs are skipped)."""
+    open_ids = {job["_id"] for job in db["jobs"].find(
+        {"_id": {"$in": [row["job_id"] for row in rows]}, **open_jobs_query(now)}, {"_id": 1})}
+    return [row["match"] for row in rows if row["job_id"] in open_ids]
+
+
+def _rows(username: str, feature_hash: str, matches: List[Dict[str, Any]], job_ids: Dict[str, Any],
+          expiries: Dict[Any, Any]) -> List[dict]:
+    now = datetime.utcnow()
+    return [{
+        "username": username,
+        "job_id": job_ids[match["id"]],
+        "feature_hash": feature_hash,
+        "match_percentage": match["match_percentage"],
+        "match": match,
+        "scored_at": now,
+        "expires_at": expiries.get(job_ids[match["id"]]),
+    } for match in matches]
+
+
+def _upsert_rows(feeds, rows: List[dict]) -> int:
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        feeds.bulk_write([
+            ReplaceOne({"username": row["username"], "job_id": row["job_id"]}, row, upsert=True)
+            for row in rows[start:start + WRITE_BATCH_SIZE]
+        ], ordered=False)
+    return len(rows)
+
+
+def _trim_feed(feeds, username: str):
+    """Delete the rows of a feed beyond its best FEED_SIZE."""
+    cut = list(feeds.find({"username": username}, {"match_percentage": 1, "job_id": 1})
+               .sort(FEED_ORDER).skip(FEED_SIZE - 1).limit(1))
+    if cut:
+        feeds.delete_many({"username": username, "$or": [
+            {"match_percentage": {"$lt": cut[0]["match_percentage"]}},
+            {"match_percentage": cut[0]["match_percentage"], "job_id": {"$lt": cut[0]["job_id"]}},
+        ]})
+
+
+def rebuild_user_feed(db, scorer: JobScorer, username: str) -> int:
+    """
+    Score the whole corpus for one CV and replace its feed (top FEED_SIZE matches).
+
+    Returns:
+        Number of rows written, or -1 if the user has no stored features.
+    """
+    cvs = db["cvs"]
+    cv = cvs.find_one({"username": username}, {"features": 1, "artifacts.features.output_hash": 1})
+    feature_hash = _feature_hash(cv or {})
+    if not cv or not cv.get("features") or not feature_hash:
+        return -1
+
+    profile = build_match_profile(cv["features"])
+    matches = scorer.top_matches(profile["job_titles"], profile["skills"], limit=FEED_SIZE)
+    compiled = scorer.compiled()
+    job_ids = {str(job_id): job_id for job_id in compiled.ids}
+    kept = [job_ids[match["id"]] for match in matches]
+    expiries = {job["_id"]: job.get("expiryTime")
+                for job in db["jobs"].find({"_id": {"$in": kept}}, {"expiryTime": 1})}
+
+    # New rows are written before the old ones are dropped, so a concurrent read never
+    # sees an empty feed; rows the maintainer wrote meanwhile are kept
+    feeds = db[FEEDS_COLLECTION]
+    started = datetime.utcnow()
+    written = _upsert_rows(feeds, _rows(username, feature_hash, matches, job_ids, expiries))
+    feeds.delete_many({"username": username, "job_id": {"$nin": kept}, "scored_at": {"$lt": started}})
+    # Only mark the feed current if the CV was not re-uploaded meanwhile
+    cvs.update_one(
+        {"_id": cv["_id"], "artifacts.features.output_hash": feature_hash},
+        {"$set": {"match_feed": {"feature_hash": feature_hash, "built_at": datetime.utcnow()}}},
+    )
+    logger.info(f"Match feed rebuilt for '{username}': {written} jobs")
+    return written
+
+
+def score_new_jobs(args: tuple) -> List[Tuple[str, str, List[Dict[str, Any]]]]:
+    """
+    Score a small set of jobs against a chunk of CV profiles (runs in a worker process).
+
+    Args:
+        args: Tuple of (job documents, SkillTable, [(username, feature hash, profile), ...])
+
+    Returns:
+        List of (username, feature hash, formatted matches) for every profile
+    """
+    jobs, skill_table, profiles = args
+    index = JobIndex()
+    index.add_many(jobs)
+    compiled = CompiledJobs(index, skill_table)
+
+    results = []
+    for username, feature_hash, profile in profiles:
+        percentages, parts = compiled.score(profile["job_titles"], profile["skills"])
+        matches = [format_match(compiled, row, int(percentages[row]), parts)
+                   for row in range(len(compiled)) if percentages[row] >= MIN_MATCH_PERCENTAGE]
+        results.append((username, feature_hash, matches))
+    return results
+
+
+class MatchFeedMaintainer:
+    """
+    Background thread keeping `user_job_matches` up to date as jobs are written.
+    Several API workers may run one; a lease (leases.py) makes sure only one of
+    them processes a given round.
+    """
+
+    def __init__(self, db, scorer: JobScorer, workers: int = 2, poll_interval: float = POLL_INTERVAL):
+        self.db = db
+        self.scorer = scorer
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.owner = f"{id(self):x}-{time.time():.0f}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="match-feed-maintainer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def notify(self):
+        """Wake the maintainer now (e.g. right after jobs were inserted)."""
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                while self.run_once() >= JOB_BATCH_SIZE:
+                    pass
+            except Exception as e:
+                logger.error(f"Match feed maintenance failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def run_once(self) -> int:
+        """
+        Score the next batch of new or updated jobs against every current feed.
+
+        Returns:
+            Number of jobs processed (0 when there is nothing new or another worker holds the lease).
+        """
+        state = claim_lease(self.db, STATE_ID, self.owner, LEASE_DURATION)
+        if state is None:
+            return 0
+
+        jobs_collection = self.db["jobs"]
+        if "last_computed_at" not in state:
+            # First run: feeds are built from the whole corpus, start from the current state
+            self._save_watermarks(self._current_watermarks(), 0, 0)
+            release_lease(self.db, STATE_ID)
+            return 0
+        # Watermarks added after the state was created start from the current state
+        missing = [key for key in WATERMARKS.values() if key not in state]
+        if missing:
+            current = self._current_watermarks()
+            state.update({key: current[key] for key in missing})
+
+        # Rows of jobs that expired since they were written (no write marks an expiry)
+        expired = self.db[FEEDS_COLLECTION].delete_many({"expires_at": {"$lte": datetime.utcnow()}}).deleted_count
+
+        # Jobs re-featured, edited or closed, or flagged as duplicates since the last round...
+        jobs: Dict[Any, dict] = {}
+        watermarks = {key: state[key] for key in WATERMARKS.values()}
+        for field, key in WATERMARKS.items():
+            if len(jobs) >= JOB_BATCH_SIZE:
+                break
+            changed = (jobs_collection.find({field: {"$gt": state[key]}}, SYNC_PROJECTION)
+                       .sort(field, ASCENDING).limit(JOB_BATCH_SIZE - len(jobs)))
+            for job in changed:
+                jobs[job["_id"]] = job
+                watermarks[key] = max(watermarks[key], _field_value(job, field))
+        # ...and jobs inserted without features (e.g. by the web backend)
+        without_features = []
+        if len(jobs) < JOB_BATCH_SIZE:
+            new_query = {"features": {"$exists": False}}
+            if state.get("last_id") is not None:
+                new_query["_id"] = {"$gt": state["last_id"]}
+            inserted = (jobs_collection.find(new_query, SYNC_PROJECTION)
+                        .sort("_id", ASCENDING).limit(JOB_BATCH_SIZE - len(jobs)))
+            for job in inserted:
+                jobs[job["_id"]] = job
+                without_features.append(job["_id"])
+        if not jobs:
+            release_lease(self.db, STATE_ID)
+            if expired:
+                logger.info(f"Match feeds: {expired} rows of expired jobs dropped")
+            return 0
+
+        started = time.perf_counter()
+        profiles = self._current_profiles()
+        written = self._score_and_write(list(jobs.values()), profiles)
+
+        self._save_watermarks({
+            **watermarks,
+            "last_id": max(without_features, default=state.get("last_id")),
+        }, len(jobs), written)
+        release_lease(self.db, STATE_ID)
+        logger.info(f"Match feeds: {len(jobs)} jobs scored against {len(profiles)} CVs, {written} rows, "
+                    f"{expired} expired rows dropped in {time.perf_counter() - started:.2f}s")
+        return len(jobs)
+
+    def _current_watermarks(self) -> Dict[str, Any]:
+        jobs_collection = self.db["jobs"]
+        watermarks = {}
+        for field, key in WATERMARKS.items():
+            latest = jobs_collection.find_one({field: {"$exists": True}}, {field: 1}, sort=[(field, DESCENDING)])
+            watermarks[key] = _field_value(latest, field) if latest else datetime.utcnow()
+        latest = jobs_collection.find_one({}, {"_id": 1}, sort=[("_id", DESCENDING)])
+        return {**watermarks, "last_id": latest["_id"] if latest else None}
+
+    def _save_watermarks(self, watermarks: Dict[str, Any], jobs: int, rows: int):
+        self.db[STATE_COLLECTION].update_one(
+            {"_id": STATE_ID},
+            {"$set": {**watermarks, "updated_at": datetime.utcnow()},
+             "$inc": {"jobs_processed": jobs, "rows_written": rows}},
+        )
+
+    def _current_profiles(self) -> List[Tuple[str, str, dict]]:
+        """(username, feature hash, match profile) of every CV whose feed is current."""
+        profiles = []
+        for cv in self.db["cvs"].find({"match_feed.feature_hash": {"$exists": True}},
+                                      {"username": 1, "features": 1, "match_feed": 1, "artifacts.features.output_hash": 1}):
+            feature_hash = _feature_hash(cv)
+            if cv.get("features") and feature_hash and cv["match_feed"].get("feature_hash") == feature_hash:
+                profiles.append((cv["username"], feature_hash, build_match_profile(cv["features"])))
+        return profiles
+
+    def _score_and_write(self, jobs: List[dict], profiles: List[Tuple[str, str, dict]]) -> int:
+        feeds = self.db[FEEDS_COLLECTION]
+        job_ids = {str(job["_id"]): job["_id"] for job in jobs}
+        # Updated jobs may have dropped below the threshold: replace all their rows
+        feeds.delete_many({"job_id": {"$in": list(job_ids.values())}})
+        # Closed, expired and near-duplicate jobs get no rows
+        jobs = [job for job in jobs if is_open(job)]
+        if not profiles or not jobs:
+            return 0
+        # Stored features older than a backend edit are recomputed from the edited fields
+        for job in jobs:
+            features = job.get("features") or {}
+            updated_at = job.get("updatedAt")
+            if features and isinstance(updated_at, datetime) and features.get("computed_at", updated_at) < updated_at:
+                job["features"] = build_job_features(job)
+        expiries = {job["_id"]: job.get("expiryTime") for job in jobs}
+
+        skill_table = self.scorer.compiled().skill_graph.snapshot()
+        tasks = [(jobs, skill_table, profiles[start:start + PROFILE_CHUNK_SIZE])
+                 for start in range(0, len(profiles), PROFILE_CHUNK_SIZE)]
+        if len(tasks) == 1 or self.workers <= 1:
+            results = map(score_new_jobs, tasks)
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            results = self._executor.map(score_new_jobs, tasks)
+
+        written = 0
+        rows = []
+        grown = set()
+        for chunk in results:
+            for username, feature_hash, matches in chunk:
+                rows.extend(_rows(username, feature_hash, matches, job_ids, expiries))
+                if matches:
+                    grown.add(username)
+            if len(rows) >= WRITE_BATCH_SIZE:
+                written += _upsert_rows(feeds, rows)
+                rows = []
+        if rows:
+            written += _upsert_rows(feeds, rows)
+        for username in grown:
+            _trim_feed(feeds, username)
+        return written
+
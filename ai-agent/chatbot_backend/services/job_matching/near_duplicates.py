@@ -0,0 +1,302 @@
+# near_duplicates.py
+"""
+Near-duplicate detection of job postings with MinHash + LSH.
+
+The same role is often reposted with small edits, or under several external ids.
+At ingest, every job gets a MinHash signature of its normalized text (title,
+company and description, as SHINGLE_SIZE-word shingles) and LSH band keys
+(BANDS bands of ROWS signature rows, hashed). Jobs sharing a band key are
+candidates. Only open representatives are candidates, so a repost of a closed or
+expired posting starts a cluster of its own. A candidate whose estimated Jaccard
+similarity reaches DUPLICATE_THRESHOLD (and whose company and city are the same,
+when both have one) makes the new job a duplicate of the candidate's cluster.
+
+Stored per job, under `dedup`: the signature, the band keys (multikey-indexed,
+so finding candidates is an index lookup instead of a scan) and, for duplicates,
+`duplicate_of` (the cluster representative: its first job). Duplicates are not
+"open" (job_sync.open_jobs_query), so matching, the match feeds and listings only
+see the representative. When a representative is archived, closes or expires, the
+oldest open job of its cluster takes over (job_lifecycle runs
+promote_closed_representatives every round).
+
+With BANDS=16 and ROWS=8, pairs at 0.8 similarity share a band with ~94%
+probability and pairs at 0.5 with ~6%.
+
+Assign clusters to stored jobs (oldest first, so they become representatives) with:
+    python -m services.job_matching.near_duplicates --backfill
+"""
+import os
+import re
+import hashlib
+import logging
+import argparse
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from bson import ObjectId
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+from services.job_matching.job_features import RAW_JOB_PROJECTION, job_features
+from services.job_matching.job_sync import is_open, open_jobs_query
+from utils.text_normalization import normalize_city
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "CVProject"
+JOBS_COLLECTION = "jobs"
+
+# Bump when the signature or banding changes (jobs with another version are recomputed)
+DEDUP_VERSION = 2
+# Words per shingle
+SHINGLE_SIZE = 5
+# LSH bands x rows per band = signature length
+BANDS = 16
+ROWS = 8
+NUM_PERM = BANDS * ROWS
+# Estimated Jaccard similarity from which two postings are duplicates
+DUPLICATE_THRESHOLD = 0.8
+# Candidates verified per job (band collisions on boilerplate text are capped)
+MAX_CANDIDATES = 50
+# Jobs per backfill batch
+BACKFILL_BATCH_SIZE = 500
+
+# Multiply-shift hash family: h_i(x) = (a_i * x + b_i) mod 2^64 >> 32, with odd a_i.
+# Fixed seed, so signatures are comparable across processes and runs.
+_rng = np.random.default_rng(20240611)
+_HASH_A = (_rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+_HASH_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+_WORD = re.compile(r"\w+")
+
+DEDUP_PROJECTION = {"dedup.signature": 1, "dedup.duplicate_of": 1, "dedup.company": 1, "dedup.city": 1}
+# Raw fields assign_clusters reads
+CLUSTER_PROJECTION = {**RAW_JOB_PROJECTION, "description": 1, "city": 1, "job_location": 1,
+                      "status": 1, "expiryTime": 1}
+
+
+def ensure_dedup_indexes(collection):
+    collection.create_index("dedup.bands")
+    collection.create_index("dedup.duplicate_of", sparse=True)
+
+
+def dedup_text(job: Dict[str, Any]) -> str:
+    """Text a job is compared on: title, company and description."""
+    features = job_features(job)
+    return " ".join(filter(None, (features["title_lower"], features["company"], job.get("description") or "")))
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values) of the word shingles of a text."""
+    words = _WORD.findall(text.lower())
+    if len(words) >= SHINGLE_SIZE:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    else:
+        shingles = {" ".join(words)}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "little") for shingle in shingles),
+        dtype=np.uint64, count=len(shingles))
+    # (NUM_PERM, shingles) hash values; uint64 arithmetic wraps, which is the mod 2^64
+    permuted = (_HASH_A[:, None] * hashes[None, :] + _HASH_B[:, None]) >> np.uint64(32)
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_keys(signature: np.ndarray) -> List[int]:
+    """One int64 key per LSH band (the band number is part of the hash)."""
+    rows = signature.reshape(BANDS, ROWS)
+    return [int.from_bytes(hashlib.blake2b(bytes([band]) + rows[band].tobytes(), digest_size=8).digest(),
+                           "little", signed=True) for band in range(BANDS)]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+class _Batch:
+    """LSH buckets of the jobs of one ingest/backfill batch, which are not stored yet."""
+
+    def __init__(self):
+        self.buckets: Dict[int, List[dict]] = {}
+
+    def candidates(self, keys: Iterable[int]) -> List[dict]:
+        found = {}
+        for key in keys:
+            for job in self.buckets.get(key, ()):
+                found[job["_id"]] = job
+        return list(found.values())
+
+    def add(self, job: dict):
+        for key in job["dedup"]["bands"]:
+            self.buckets.setdefault(key, []).append(job)
+
+
+def job_city(job: Dict[str, Any]) -> Optional[str]:
+    """Normalized city of a job, None when unknown."""
+    city = normalize_city(job.get("city") or job.get("job_location"))
+    return None if city == "unknown" else city
+
+
+def _listed(job: Dict[str, Any], now: datetime) -> bool:
+    """Whether a job is open, ignoring its own duplicate flag."""
+    return is_open({**job, "dedup": None}, now)
+
+
+def _best_duplicate(signature: np.ndarray, company: str, city: Optional[str],
+                    candidates: Iterable[dict]) -> Optional[Any]:
+    """Representative of the most similar candidate at DUPLICATE_THRESHOLD or above, if any."""
+    best, best_score = None, DUPLICATE_THRESHOLD
+    for candidate in candidates:
+        dedup = candidate.get("dedup") or {}
+        other = dedup.get("signature")
+        if other is None:
+            continue
+        if company and dedup.get("company") and company != dedup["company"]:
+            continue
+        # The same role posted for another city is another listing
+        if city and dedup.get("city") and city != dedup["city"]:
+            continue
+        score = similarity(signature, np.asarray(other, dtype=np.uint32))
+        if score >= best_score:
+            best, best_score = dedup.get("duplicate_of") or candidate["_id"], score
+    return best
+
+
+def assign_clusters(collection, jobs: List[Dict[str, Any]]) -> int:
+    """
+    Compute the `dedup` field of jobs about to be written (in place, assigning an
+    `_id` if missing), marking duplicates of stored jobs or of earlier jobs of the list.
+
+    Returns:
+        Number of duplicates found.
+    """
+    batch = _Batch()
+    now = datetime.utcnow()
+    duplicates = 0
+    for job in jobs:
+        job.setdefault("_id", ObjectId())
+        signature = minhash_signature(dedup_text(job))
+        keys = band_keys(signature)
+        company = job_features(job)["company"]
+        city = job_city(job)
+        # Only open representatives (closed and expired jobs wait for archival, reposts replace them)
+        stored = collection.find(
+            {"dedup.bands": {"$in": keys}, "dedup.version": DEDUP_VERSION, "_id": {"$ne": job["_id"]},
+             **open_jobs_query(now)},
+            DEDUP_PROJECTION,
+        ).limit(MAX_CANDIDATES)
+        earlier = [other for other in batch.candidates(keys) if is_open(other, now)]
+        duplicate_of = _best_duplicate(signature, company, city, [*earlier, *stored])
+        job["dedup"] = {"version": DEDUP_VERSION, "signature": signature.tolist(), "bands": keys,
+                        "company": company, "computed_at": now}
+        if city:
+            job["dedup"]["city"] = city
+        if duplicate_of is not None:
+            job["dedup"]["duplicate_of"] = duplicate_of
+            duplicates += 1
+        batch.add(job)
+    return duplicates
+
+
+def promote_duplicates(collection, representative_ids: List[Any], open_only: bool = False) -> int:
+    """
+    After representatives are removed (archived) or closed, make the oldest open job
+    of each of their clusters (the oldest job if none is open) its representative.
+
+    Args:
+        open_only: Leave clusters without an open job as they are
+
+    Returns:
+        Number of clusters with a new representative.
+    """
+    clusters: Dict[Any, List[dict]] = {}
+    for job in collection.find({"dedup.duplicate_of": {"$in": list(representative_ids)}},
+                               {"dedup.duplicate_of": 1, "status": 1, "expiryTime": 1}).sort("_id", ASCENDING):
+        clusters.setdefault(job["dedup"]["duplicate_of"], []).append(job)
+    now = datetime.utcnow()
+    promoted = 0
+    for members in clusters.values():
+        listed = [job["_id"] for job in members if _listed(job, now)]
+        if not listed and open_only:
+            continue
+        representative = listed[0] if listed else members[0]["_id"]
+        others = [job["_id"] for job in members if job["_id"] != representative]
+        collection.update_one({"_id": representative},
+                              {"$unset": {"dedup.duplicate_of": ""}, "$set": {"dedup.computed_at": now}})
+        if others:
+            collection.update_many({"_id": {"$in": others}},
+                                   {"$set": {"dedup.duplicate_of": representative, "dedup.computed_at": now}})
+        promoted += 1
+    return promoted
+
+
+def promote_closed_representatives(collection, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Hand the clusters of closed or expired representatives (not archived yet) over
+    to their oldest open job.
+
+    Returns:
+        Number of clusters with a new representative.
+    """
+    now = datetime.utcnow()
+    closed = [job["_id"] for job in collection.find(
+        {"dedup.duplicate_of": {"$exists": False}, "$or": [{"status": "closed"}, {"expiryTime": {"$lte": now}}]},
+        {"_id": 1})]
+    promoted = 0
+    for start in range(0, len(closed), batch_size):
+        chunk = closed[start:start + batch_size]
+        representatives = collection.distinct("dedup.duplicate_of", {"dedup.duplicate_of": {"$in": chunk}})
+        if representatives:
+            promoted += promote_duplicates(collection, representatives, open_only=True)
+    return promoted
+
+
+def backfill_near_duplicates(collection, batch_size: int = BACKFILL_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Assign clusters to every job without a current `dedup` field, oldest first.
+
+    Returns:
+        Numbers of processed jobs and of duplicates found.
+    """
+    query = {"dedup.version": {"$ne": DEDUP_VERSION}}
+    logger.info(f"Assigning near-duplicate clusters to {collection.count_documents(query)} jobs")
+    counts = {"processed": 0, "duplicates": 0}
+    last_id = None
+    while True:
+        page = dict(query, **({"_id": {"$gt": last_id}} if last_id is not None else {}))
+        jobs = list(collection.find(page, CLUSTER_PROJECTION).sort("_id", ASCENDING).limit(batch_size))
+        if not jobs:
+            break
+        counts["duplicates"] += assign_clusters(collection, jobs)
+        collection.bulk_write([
+            UpdateOne({"_id": job["_id"]}, {"$set": {"dedup": job["dedup"]}}) for job in jobs
+        ], ordered=False)
+        counts["processed"] += len(jobs)
+        last_id = jobs[-1]["_id"]
+        logger.info(f"Near-duplicate backfill: {counts}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate clusters of job postings")
+    parser.add_argument("--backfill", action="store_true", help="Assign clusters to jobs without one")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE, help="Jobs per batch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_ATLAS_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_ATLAS_URI not found in environment variables. Please set it in your .env file.")
+
+    collection = MongoClient(mongo_uri)[DB_NAME][JOBS_COLLECTION]
+    ensure_dedup_indexes(collection)
+    if args.backfill:
+        backfill_near_duplicates(collection, batch_size=args.batch_size)
+    total = collection.estimated_document_count()
+    duplicates = collection.count_documents({"dedup.duplicate_of": {"$exists": True}})
+    logger.info(f"{duplicates} of {total} jobs are near-duplicates of another posting")
+
+
+if __name__ == "__main__":
+    main()
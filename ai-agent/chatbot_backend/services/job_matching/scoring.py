@@ -0,0 +1,381 @@
+# scoring.py
+"""
+Vectorized job scoring.
+
+The jobs of a JobIndex are compiled into sparse job x skill matrices plus per-title
+features, so a CV is scored against the whole corpus with a few sparse
+matrix-vector products instead of nested per-job / per-skill Python loops. The
+scores reproduce the rules of the original loop:
+
+- title match: 40 points (exact, Vietnamese mapping, contains, word overlap or a
+  technical-role fallback)
+- required skills: 50 points, the mean of per-skill credits (1.0 for an exact
+  match, up to 0.8 for a fuzzy one (fuzzy.py), up to 0.6 for a related skill
+  (skill_graph.py))
+- preferred skills: 10 points, the fraction matched
+- a 1.2x bonus when the title contains a word of the CV's primary role
+"""
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+from scipy import sparse
+
+from services.job_matching import fuzzy, skill_graph
+from services.job_matching.fuzzy import TrigramIndex
+from services.job_matching.skill_graph import SkillGraph, SkillTable
+from services.job_matching.skill_index import JobIndex
+from services.job_matching.vocabulary import TITLE_MAPPING, title_tokens
+from utils.artifact_graph import content_hash
+from utils.text_normalization import normalize_skill
+
+logger = logging.getLogger(__name__)
+
+TITLE_WEIGHT = 40
+REQUIRED_WEIGHT = 50
+PREFERRED_WEIGHT = 10
+PRIMARY_ROLE_BONUS = 1.2
+# Jobs below this match percentage are not returned
+MIN_MATCH_PERCENTAGE = 30
+# A required skill counts as matched above this credit
+MATCHED_CREDIT = 0.5
+# Maximum credit of a fuzzy skill match (scaled by the trigram similarity)
+PARTIAL_CREDIT = 0.8
+# Maximum credit of a related skill (scaled by the skill graph relatedness)
+RELATED_CREDIT = 0.6
+# Memory for per-CV-title score vectors over the distinct job titles (per compiled index)
+TITLE_CACHE_BYTES = 64 * 2**20
+
+# Hash of every constant that changes scores; cached match results carry it
+SCORING_CONFIG_VERSION = content_hash([
+    TITLE_WEIGHT, REQUIRED_WEIGHT, PREFERRED_WEIGHT, PRIMARY_ROLE_BONUS, MIN_MATCH_PERCENTAGE,
+    MATCHED_CREDIT, PARTIAL_CREDIT, RELATED_CREDIT, fuzzy.SIMILARITY_THRESHOLD,
+    skill_graph.MAX_HOPS, skill_graph.MAX_NEIGHBORS, skill_graph.MIN_RELATEDNESS,
+    skill_graph.MIN_COOCCURRENCE, skill_graph.COOCCURRENCE_FACTOR, skill_graph.SKILL_RELATIONS,
+])[:12]
+
+
+def title_match_score(cv_title: str, cv_words: Set[str], title_lower: str, title_words: Set[str]) -> float:
+    """Score (0..TITLE_WEIGHT) of one lowercased CV job title against one job title, 0 if unrelated."""
+    # 1. Exact match (100% score)
+    if cv_title == title_lower:
+        return TITLE_WEIGHT
+    # 2. Check Vietnamese title mapping
+    for vn_term, en_terms in TITLE_MAPPING.items():
+        if vn_term in cv_title and any(term in title_lower for term in en_terms):
+            return TITLE_WEIGHT * 0.9
+    # 3. Contains match (e.g., 'frontend' in 'senior frontend developer')
+    if cv_title in title_lower or title_lower in cv_title:
+        return TITLE_WEIGHT * 0.8
+    # 4. Word overlap
+    if title_words and cv_words:
+        overlap = len(title_words & cv_words)
+        if overlap > 0:
+            return TITLE_WEIGHT * (0.5 + (overlap / max(len(title_words), len(cv_words)) * 0.5))
+    return 0.0
+
+
+class CompiledJobs:
+    """Matrices and per-title features of one version of the job index."""
+
+    def __init__(self, index: JobIndex, skill_graph: Optional[Union[SkillGraph, SkillTable]] = None):
+        self.version = index.version
+        self.skill_graph = skill_graph
+        positions = sorted(index.records)
+        self.ids = [index.ids[pos] for pos in positions]
+        records = [index.records[pos] for pos in positions]
+
+        self.titles = [features["title"] for features in records]
+        self.companies = [features["company"] for features in records]
+
+        # Skill vocabulary and the sparse job x skill matrices
+        self.vocab: Dict[str, int] = {}
+        req_rows, req_cols, pref_rows, pref_cols = [], [], [], []
+        for row, features in enumerate(records):
+            # Title defaults are already filled in when a job lists no required skills
+            for skill in features["required_skills"]:
+                req_rows.append(row)
+                req_cols.append(self.vocab.setdefault(skill, len(self.vocab)))
+            for skill in features["preferred_skills"]:
+                pref_rows.append(row)
+                pref_cols.append(self.vocab.setdefault(skill, len(self.vocab)))
+
+        shape = (len(records), max(1, len(self.vocab)))
+        self.required = sparse.csr_matrix(
+            (np.ones(len(req_rows), dtype=np.float64), (req_rows, req_cols)), shape=shape)
+        self.preferred = sparse.csr_matrix(
+            (np.ones(len(pref_rows), dtype=np.float64), (pref_rows, pref_cols)), shape=shape)
+        self.vocab_list = sorted(self.vocab, key=self.vocab.get)
+
+        # Title features are scored once per distinct title
+        unique_titles: Dict[str, int] = {}
+        unique_records = []
+        codes = []
+        for features in records:
+            code = unique_titles.get(features["title_lower"])
+            if code is None:
+                code = unique_titles[features["title_lower"]] = len(unique_titles)
+                unique_records.append(features)
+            codes.append(code)
+        self.title_codes = np.array(codes, dtype=np.int64)
+        self.unique_titles = [features["title_lower"] for features in unique_records]
+        self.unique_title_words = [set(features["title_tokens"]) for features in unique_records]
+        self.unique_title_is_tech = np.array([features["is_tech"] for features in unique_records], dtype=bool)
+
+        # Level of every job as a code into level_names ('' = unknown)
+        level_positions = {"": 0}
+        self.level_codes = np.array([
+            level_positions.setdefault(features.get("level") or "", len(level_positions)) for features in records
+        ], dtype=np.int8)
+        self.level_names = sorted(level_positions, key=level_positions.get)
+        self._prepare()
+
+    @classmethod
+    def restore(cls, state: Dict[str, Any]) -> "CompiledJobs":
+        """
+        Compiled jobs from previously computed attributes (e.g. arrays mapped from a
+        snapshot file, see snapshot.py), without a JobIndex.
+        """
+        jobs = cls.__new__(cls)
+        jobs.__dict__.update(state)
+        jobs._prepare()
+        return jobs
+
+    def _prepare(self):
+        """Attributes derived from the compiled arrays."""
+        self.required_totals = np.diff(self.required.indptr)
+        self.preferred_totals = np.diff(self.preferred.indptr)
+        if getattr(self, "required_mean", None) is None:
+            # Rows scaled by 1/len(required) so one product yields the mean credit
+            self.required_mean = sparse.csr_matrix(
+                (np.repeat(1.0 / np.maximum(1, self.required_totals), self.required_totals),
+                 self.required.indices, self.required.indptr), shape=self.required.shape)
+        # Trigram index over the vocabulary for fuzzy skill matches
+        self.fuzzy = TrigramIndex(self.vocab_list)
+
+        # CV title (or primary role) -> vector over the distinct job titles; CV titles
+        # repeat across profiles, so most requests skip the per-title Python loop
+        self._title_cache: Dict[tuple, np.ndarray] = {}
+        self._title_cache_size = max(16, TITLE_CACHE_BYTES // max(1, 8 * len(self.unique_titles)))
+        self._title_cache_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def skill_credits(self, user_skills: Iterable[str]) -> np.ndarray:
+        """
+        Credit of every vocabulary skill for a set of CV skills: 1.0 for an exact match,
+        otherwise the best of its trigram similarity to a CV skill scaled by
+        PARTIAL_CREDIT and its relatedness to a CV skill scaled by RELATED_CREDIT.
+        """
+        credits = np.zeros(max(1, len(self.vocab)), dtype=np.float64)
+        user_skills = {normalize_skill(s) for s in user_skills if s}
+        for user_skill in user_skills:
+            for pos, score in self.fuzzy.lookup(user_skill):
+                credit = score * PARTIAL_CREDIT
+                if credit > credits[pos]:
+                    credits[pos] = credit
+            if self.skill_graph is not None:
+                for related, weight in self.skill_graph.related(user_skill):
+                    pos = self.vocab.get(related)
+                    if pos is not None and weight * RELATED_CREDIT > credits[pos]:
+                        credits[pos] = weight * RELATED_CREDIT
+        for user_skill in user_skills:
+            exact = self.vocab.get(user_skill)
+            if exact is not None:
+                credits[exact] = 1.0
+        return credits
+
+    def _cached_title_vector(self, key: tuple, compute) -> np.ndarray:
+        vector = self._title_cache.get(key)
+        if vector is None:
+            vector = compute()
+            with self._title_cache_lock:
+                if len(self._title_cache) >= self._title_cache_size:
+                    # Oldest first: dicts keep insertion order
+                    del self._title_cache[next(iter(self._title_cache))]
+                self._title_cache[key] = vector
+        return vector
+
+    def _cv_title_scores(self, cv_title: str) -> np.ndarray:
+        """Score of one CV job title against every distinct job title."""
+        cv_lower, cv_words = cv_title.lower(), title_tokens(cv_title)
+        return self._cached_title_vector(("title", cv_lower), lambda: np.array([
+            title_match_score(cv_lower, cv_words, title_lower, self.unique_title_words[code])
+            for code, title_lower in enumerate(self.unique_titles)
+        ], dtype=np.float64))
+
+    def title_scores(self, job_titles: List[str]) -> np.ndarray:
+        """Title score (0..TITLE_WEIGHT) of every job for the CV's job titles."""
+        unique_scores = np.zeros(len(self.unique_titles), dtype=np.float64)
+        for jt in job_titles:
+            unique_scores = np.maximum(unique_scores, self._cv_title_scores(jt))
+
+        # No match: 30% for technical roles, 10% otherwise
+        fallback = np.where(self.unique_title_is_tech, TITLE_WEIGHT * 0.3, TITLE_WEIGHT * 0.1)
+        unique_scores = np.where(unique_scores == 0, fallback, unique_scores)
+        return unique_scores[self.title_codes]
+
+    def primary_role_mask(self, job_titles: List[str]) -> np.ndarray:
+        """Jobs whose title contains a word of the CV's primary (first) job title."""
+        primary_role = job_titles[0].lower() if job_titles else ''
+        words = primary_role.split()
+        if not words:
+            return np.zeros(len(self.ids), dtype=bool)
+        unique_mask = self._cached_title_vector(("primary", primary_role), lambda: np.array(
+            [any(word in title for word in words) for title in self.unique_titles], dtype=bool))
+        return unique_mask[self.title_codes]
+
+    def level_mask(self, levels: Iterable[str]) -> np.ndarray:
+        """Jobs at one of `levels`, or whose level is unknown."""
+        wanted = set(levels) | {""}
+        codes = [code for code, name in enumerate(self.level_names) if name in wanted]
+        return np.isin(self.level_codes, codes)
+
+    def score(self, job_titles: List[str], skills: Iterable[str]) -> Tuple[np.ndarray, dict]:
+        """
+        Score every job against a CV.
+
+        Returns:
+            Tuple of (match percentages, component arrays used for formatting)
+        """
+        credits = self.skill_credits(skills)
+        title = self.title_scores(job_titles)
+        required = REQUIRED_WEIGHT * self.required_mean.dot(credits)
+        required_matched = self.required.dot((credits > MATCHED_CREDIT).astype(np.float64))
+        preferred_matched = self.preferred.dot((credits > 0).astype(np.float64))
+        preferred = PREFERRED_WEIGHT * preferred_matched / np.maximum(1, self.preferred_totals)
+
+        total = title + required + preferred
+        total = np.where(self.primary_role_mask(job_titles), np.minimum(100, total * PRIMARY_ROLE_BONUS), total)
+        # Rounded to 6 decimals first so summation order cannot flip a .5 boundary
+        percentages = np.clip(np.round(np.round(total, 6)), 0, 100).astype(np.int64)
+        return percentages, {
+            "title": title,
+            "required": required,
+            "preferred": preferred,
+            "required_matched": np.rint(required_matched).astype(np.int64),
+            "preferred_matched": np.rint(preferred_matched).astype(np.int64),
+        }
+
+
+class JobScorer:
+    """
+    Scores CVs against every job of a JobIndex, recompiling when the index changes.
+
+    With `snapshots` (a snapshot.SnapshotReader), the jobs of the current published
+    snapshot are scored instead, and the index is only used while none is available.
+    """
+
+    def __init__(self, index: JobIndex, skill_graph: Optional[SkillGraph] = None, snapshots=None):
+        self.index = index
+        self.skill_graph = skill_graph if skill_graph is not None else SkillGraph()
+        self.snapshots = snapshots
+        self._compiled: Optional[CompiledJobs] = None
+        self._lock = threading.Lock()
+
+    def serving_snapshot(self) -> bool:
+        return self.snapshots is not None and self.snapshots.current() is not None
+
+    def compiled(self) -> CompiledJobs:
+        if self.snapshots is not None:
+            snapshot = self.snapshots.current()
+            if snapshot is not None:
+                return snapshot.compiled
+        compiled = self._compiled
+        if compiled is None or compiled.version != self.index.version:
+            with self._lock:
+                if self._compiled is None or self._compiled.version != self.index.version:
+                    with self.index._lock:
+                        self.skill_graph.sync(self.index)
+                        self._compiled = CompiledJobs(self.index, self.skill_graph)
+                    logger.info(f"Compiled job scoring matrices: {len(self._compiled)} jobs, "
+                                f"{len(self._compiled.vocab)} skills")
+                compiled = self._compiled
+        return compiled
+
+    def latest(self) -> CompiledJobs:
+        """Last compiled index, without waiting for a pending recompilation (compiled() if none yet)."""
+        compiled = self._compiled
+        if compiled is None or self.snapshots is not None:
+            return self.compiled()
+        return compiled
+
+    def content_stamp(self) -> str:
+        """Version stamp of the scored jobs (the snapshot's when serving one), comparable across processes."""
+        if self.snapshots is not None:
+            snapshot = self.snapshots.current()
+            if snapshot is not None:
+                return snapshot.stamp
+        return self.index.content_stamp()
+
+    def top_matches(self, job_titles: List[str], skills: Iterable[str], limit: int = 20,
+                    levels: Optional[Iterable[str]] = None, jobs: Optional[CompiledJobs] = None) -> List[Dict[str, Any]]:
+        """
+        Best matching jobs for a CV (at least MIN_MATCH_PERCENTAGE), best first.
+
+        Args:
+            job_titles: CV job titles, the primary role first
+            skills: CV skills
+            limit: Maximum number of matches
+            levels: Only keep jobs at one of these levels (or of unknown level)
+            jobs: Compiled index to score against (default: the current one), so a
+                batch of CVs is scored against the same version
+
+        Returns:
+            Formatted job matches, as returned by the jobs suggestion endpoint.
+        """
+        jobs = jobs if jobs is not None else self.compiled()
+        if not len(jobs):
+            return []
+        percentages, parts = jobs.score(job_titles, skills)
+
+        eligible = percentages >= MIN_MATCH_PERCENTAGE
+        if levels is not None:
+            eligible &= jobs.level_mask(levels)
+        eligible = np.flatnonzero(eligible)
+        if len(eligible) > limit:
+            eligible = eligible[np.argpartition(-percentages[eligible], limit - 1)[:limit]]
+        # Best first, then the most recently indexed
+        top = eligible[np.lexsort((-eligible, -percentages[eligible]))]
+
+        return [format_match(jobs, row, int(percentages[row]), parts) for row in top]
+
+
+def format_match(jobs: CompiledJobs, row: int, match_percentage: int, parts: dict) -> Dict[str, Any]:
+    """Format one scored job the way the jobs suggestion endpoint returns it."""
+    title = jobs.titles[row]
+    required_total = int(jobs.required_totals[row])
+    preferred_total = int(jobs.preferred_totals[row])
+    required_matched = int(parts["required_matched"][row])
+    preferred_matched = int(parts["preferred_matched"][row])
+
+    skill_info = []
+    if required_total > 0:
+        skill_info.append(f"{required_matched}/{required_total} required")
+    if preferred_total > 0:
+        skill_info.append(f"{preferred_matched}/{preferred_total} preferred")
+
+    # Add visual indicator for match level
+    if match_percentage >= 80:
+        match_indicator = "🟢"
+    elif match_percentage >= 50:
+        match_indicator = "🟡"
+    else:
+        match_indicator = "🔴"
+
+    skill_str = " (" + ", ".join(skill_info) + ")" if skill_info else ""
+    return {
+        "id": str(jobs.ids[row]),
+        "title": f"{match_indicator} {title} ({match_percentage}%{skill_str})",
+        "company": jobs.companies[row],
+        "match_percentage": match_percentage,
+        "relevance": "high" if match_percentage >= 70 else "medium" if match_percentage >= 40 else "low",
+        "matched_skills": {
+            "required": required_matched,
+            "preferred": preferred_matched,
+            "total_required": required_total,
+            "total_preferred": preferred_total
+        }
+    }
@@ -0,0 +1,433 @@
+# skill_demand.py
+"""
+Materialized skill demand: how many open jobs require each skill, per city and
+field, and how often two skills are required together.
+
+Three collections are kept current as jobs are written, closed, expire, get
+flagged as near-duplicates or are archived:
+
+- `skill_demand`: one row per (skill, city, field) with its number of jobs. Every
+  job also counts under city "*" and field "*" (all cities, all fields), and under
+  skill "*" (the number of jobs of the bucket). "Top skills in Ho Chi Minh" is then
+  one range read on the (city, field, jobs) index.
+- `skill_pairs`: one row per pair of skills required by the same job.
+- `skill_demand_jobs`: what every job currently contributes (its skills, city and
+  field), so a change only applies the difference.
+
+Cities are folded ('Hồ Chí Minh', 'TP. HCM' and 'Ho Chi Minh City, Vietnam' are all
+'ho chi minh'). The field is the web backend's `field`, else the title's role
+(scraped jobs), else "other". Only listed required skills count: title defaults
+filled in by job_features are not demand.
+
+`SkillDemandMaintainer` re-evaluates jobs written since its watermarks
+(`updatedAt`, `features.computed_at`, `dedup.computed_at`), jobs past their
+`expiryTime` and jobs archived since the last round. Several API workers may run
+one, and a lease (leases.py) elects one of them per round. Every RECOUNT_INTERVAL,
+and on the first round, it recounts everything from the jobs collection and
+repairs and reports any drift (e.g. from a round interrupted between two writes).
+
+Recount by hand with:
+    python -m services.job_matching.skill_demand [--dry-run]
+"""
+import os
+import re
+import time
+import logging
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, MongoClient, DeleteOne, ReplaceOne, UpdateOne
+from dotenv import load_dotenv
+
+from services.job_matching.job_features import job_features
+from services.job_matching.job_lifecycle import ARCHIVE_COLLECTION
+from services.job_matching.job_sync import SINCE_OVERLAP, SYNC_PROJECTION, is_open
+from services.job_matching.leases import STATE_COLLECTION, claim_lease, release_lease
+from utils.text_normalization import fold_diacritics, normalize_city, normalize_skill
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "CVProject"
+JOBS_COLLECTION = "jobs"
+DEMAND_COLLECTION = "skill_demand"
+PAIRS_COLLECTION = "skill_pairs"
+COUNTED_COLLECTION = "skill_demand_jobs"
+STATE_ID = "skill_demand"
+
+# City, field or skill standing for "all of them"
+ALL = "*"
+# Jobs re-evaluated per batch
+BATCH_SIZE = 500
+# Only the first this many skills of a job (alphabetically) form pairs
+MAX_PAIR_SKILLS = 20
+# Seconds between two rounds when not notified
+POLL_INTERVAL = 60
+# Full recount (consistency check) interval
+RECOUNT_INTERVAL = timedelta(hours=24)
+# A maintainer whose lease is older than this is considered dead
+LEASE_DURATION = timedelta(minutes=30)
+# Job write timestamps followed between rounds
+WATERMARK_FIELDS = ("updatedAt", "features.computed_at", "dedup.computed_at")
+
+DEMAND_PROJECTION = {**SYNC_PROJECTION, "city": 1, "job_location": 1, "field": 1}
+
+
+def _fold(value: Any) -> str:
+    return re.sub(r"\s+", " ", fold_diacritics(str(value)).lower()).strip()
+
+
+def normalize_field(value: Any) -> str:
+    return _fold(value) if value else "other"
+
+
+def demand_contribution(job: Optional[Dict[str, Any]], now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """
+    What a job counts for: its listed required skills, city and field, or None when it
+    is not open (or gone, or lists no skills).
+    """
+    if job is None or not is_open(job, now):
+        return None
+    features = job_features(job)
+    if features.get("default_skills"):
+        return None
+    skills = sorted({normalize_skill(skill) for skill in features["required_skills"]} - {"", ALL})
+    if not skills:
+        return None
+    return {
+        "skills": skills,
+        "city": normalize_city(job.get("city") or job.get("job_location")),
+        "field": normalize_field(job.get("field") or features.get("role")),
+    }
+
+
+def _demand_keys(contribution: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """(skill, city, field) rows a contribution counts in, rollups included."""
+    return [(skill, city, field)
+            for skill in (ALL, *contribution["skills"])
+            for city in (contribution["city"], ALL)
+            for field in (contribution["field"], ALL)]
+
+
+def _pair_keys(contribution: Dict[str, Any]) -> List[Tuple[str, str]]:
+    skills = contribution["skills"][:MAX_PAIR_SKILLS]
+    return [(a, b) for i, a in enumerate(skills) for b in skills[i + 1:]]
+
+
+def _demand_id(skill: str, city: str, field: str) -> str:
+    return f"{skill}|{city}|{field}"
+
+
+def _pair_id(a: str, b: str) -> str:
+    return f"{a}|{b}"
+
+
+def _same(counted: Optional[dict], contribution: Optional[dict]) -> bool:
+    if counted is None or contribution is None:
+        return counted is None and contribution is None
+    return all(counted.get(key) == contribution[key] for key in ("skills", "city", "field"))
+
+
+def ensure_demand_indexes(db):
+    db[DEMAND_COLLECTION].create_index([("city", ASCENDING), ("field", ASCENDING), ("jobs", DESCENDING)])
+    pairs = db[PAIRS_COLLECTION]
+    pairs.create_index([("a", ASCENDING), ("jobs", DESCENDING)])
+    pairs.create_index([("b", ASCENDING), ("jobs", DESCENDING)])
+    db[COUNTED_COLLECTION].create_index("expires_at", sparse=True)
+    db[JOBS_COLLECTION].create_index([("updatedAt", ASCENDING), ("_id", ASCENDING)])
+
+
+def top_skills(db, city: Optional[str] = None, field: Optional[str] = None, limit: int = 20) -> Dict[str, Any]:
+    """
+    Skills required by the most open jobs of a city and field (all of them when None).
+
+    Returns:
+        The bucket's number of jobs and its top skills with their job counts and shares.
+    """
+    city = normalize_city(city) if city else ALL
+    field = normalize_field(field) if field else ALL
+    demand = db[DEMAND_COLLECTION]
+    bucket = demand.find_one({"_id": _demand_id(ALL, city, field)}, {"jobs": 1})
+    total = bucket["jobs"] if bucket else 0
+    rows = demand.find({"city": city, "field": field, "skill": {"$ne": ALL}}, {"skill": 1, "jobs": 1}) \
+        .sort("jobs", DESCENDING).limit(limit)
+    return {
+        "city": city,
+        "field": field,
+        "total_jobs": total,
+        "skills": [{"skill": row["skill"], "jobs": row["jobs"], "share": round(row["jobs"] / total, 4) if total else 0.0}
+                   for row in rows],
+    }
+
+
+def skill_gap(db, skills: Iterable[str], city: Optional[str] = None, field: Optional[str] = None,
+              limit: int = 20) -> Dict[str, Any]:
+    """
+    A CV's skills against the market of a city and field.
+
+    Returns:
+        The demand for each of the CV's skills, the most demanded skills it lacks, the
+        share of the top skills' demand it covers, and skills most often required
+        together with its own.
+    """
+    own = sorted({normalize_skill(skill) for skill in skills if skill} - {""})
+    market = top_skills(db, city, field, limit)
+    city, field = market["city"], market["field"]
+
+    demand = {row["skill"]: row["jobs"] for row in db[DEMAND_COLLECTION].find(
+        {"_id": {"$in": [_demand_id(skill, city, field) for skill in own]}}, {"skill": 1, "jobs": 1})}
+    top_total = sum(row["jobs"] for row in market["skills"])
+    covered = sum(row["jobs"] for row in market["skills"] if row["skill"] in demand)
+
+    companions: Counter = Counter()
+    pairs = db[PAIRS_COLLECTION]
+    for own_side, other_side in (("a", "b"), ("b", "a")):
+        for row in pairs.find({own_side: {"$in": own}}).sort("jobs", DESCENDING).limit(limit * 5):
+            if row[other_side] not in own:
+                companions[row[other_side]] += row["jobs"]
+
+    return {
+        "city": city,
+        "field": field,
+        "total_jobs": market["total_jobs"],
+        "coverage": round(covered / top_total, 4) if top_total else 0.0,
+        "matched": sorted(({"skill": skill, "jobs": demand.get(skill, 0)} for skill in own),
+                          key=lambda row: -row["jobs"]),
+        "missing": [row for row in market["skills"] if row["skill"] not in demand],
+        "related": [{"skill": skill, "jobs_with_your_skills": jobs} for skill, jobs in companions.most_common(limit)],
+    }
+
+
+class SkillDemandMaintainer:
+    """
+    Background thread keeping the skill demand collections current.
+
+    Args:
+        db: The CVProject database
+        poll_interval: Seconds between two rounds when not notified
+        recount_interval: Time between two full recounts
+    """
+
+    def __init__(self, db, poll_interval: float = POLL_INTERVAL, recount_interval: timedelta = RECOUNT_INTERVAL):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.recount_interval = recount_interval
+        self.owner = f"{id(self):x}-{time.time():.0f}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="skill-demand", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def notify(self):
+        """Run a round now (e.g. right after jobs were written)."""
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Skill demand maintenance failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def run_once(self) -> Optional[int]:
+        """
+        Re-evaluate the jobs changed since the last round (or recount everything when due).
+
+        Returns:
+            Number of jobs whose contribution changed, or None when another worker holds the lease.
+        """
+        state = claim_lease(self.db, STATE_ID, self.owner, LEASE_DURATION)
+        if state is None:
+            return None
+        now = datetime.utcnow()
+        if state.get("last_recount_at") is None or now - state["last_recount_at"] >= self.recount_interval:
+            # The first recount builds the collections: nothing drifted yet
+            counts = self.recount(started=now, check=state.get("last_recount_at") is not None)
+            release_lease(self.db, STATE_ID, {
+                "last_recount_at": now, "last_recount": counts,
+                "watermarks": {field.replace(".", "_"): now for field in WATERMARK_FIELDS},
+                "archived_since": now,
+            })
+            return counts["jobs_fixed"]
+
+        started = time.perf_counter()
+        jobs = self.db[JOBS_COLLECTION]
+        watermarks = dict(state.get("watermarks") or {})
+        changed = 0
+        for field in WATERMARK_FIELDS:
+            key = field.replace(".", "_")
+            since = watermarks.get(key, now)
+            batch: List[dict] = []
+            for job in jobs.find({field: {"$gt": since - SINCE_OVERLAP}}, DEMAND_PROJECTION).sort(field, ASCENDING):
+                batch.append(job)
+                if len(batch) >= BATCH_SIZE:
+                    changed += self._reevaluate([job["_id"] for job in batch], batch, now)
+                    batch = []
+                value = job
+                for part in field.split("."):
+                    value = value.get(part) if isinstance(value, dict) else None
+                if value is not None and value > watermarks.get(key, since):
+                    watermarks[key] = value
+            if batch:
+                changed += self._reevaluate([job["_id"] for job in batch], batch, now)
+
+        # Jobs that expired (no write marks it) and jobs archived since the last round
+        expired = [row["_id"] for row in self.db[COUNTED_COLLECTION].find({"expires_at": {"$lte": now}}, {"_id": 1})]
+        archived_since = state.get("archived_since", now)
+        archived = [doc["_id"] for doc in self.db[ARCHIVE_COLLECTION].find(
+            {"archived_at": {"$gt": archived_since - SINCE_OVERLAP}}, {"_id": 1})]
+        gone = list(dict.fromkeys([*expired, *archived]))
+        for i in range(0, len(gone), BATCH_SIZE):
+            ids = gone[i:i + BATCH_SIZE]
+            changed += self._reevaluate(ids, jobs.find({"_id": {"$in": ids}}, DEMAND_PROJECTION), now)
+
+        release_lease(self.db, STATE_ID, {"watermarks": watermarks, "archived_since": now, "last_round_at": now,
+                                          "last_round_changed": changed})
+        if changed:
+            logger.info(f"Skill demand: {changed} jobs re-counted in {time.perf_counter() - started:.2f}s")
+        return changed
+
+    def _reevaluate(self, job_ids: List[Any], jobs: Iterable[dict], now: datetime) -> int:
+        """Apply the difference between what jobs count for now and what they were counted for."""
+        current = {job["_id"]: job for job in jobs}
+        counted = {row["_id"]: row for row in self.db[COUNTED_COLLECTION].find({"_id": {"$in": list(job_ids)}})}
+        changes = []
+        for job_id in job_ids:
+            contribution = demand_contribution(current.get(job_id), now)
+            if not _same(counted.get(job_id), contribution):
+                changes.append((job_id, counted.get(job_id), contribution, current.get(job_id)))
+        if changes:
+            self._apply(changes)
+        return len(changes)
+
+    def _apply(self, changes: List[Tuple[Any, Optional[dict], Optional[dict], Optional[dict]]]):
+        demand, pairs = Counter(), Counter()
+        rows = []
+        for job_id, old, new, job in changes:
+            for contribution, sign in ((old, -1), (new, 1)):
+                if contribution is not None:
+                    for key in _demand_keys(contribution):
+                        demand[key] += sign
+                    for key in _pair_keys(contribution):
+                        pairs[key] += sign
+            if new is None:
+                rows.append(DeleteOne({"_id": job_id}))
+            else:
+                rows.append(ReplaceOne({"_id": job_id}, {**new, "expires_at": job.get("expiryTime")}, upsert=True))
+        self.db[COUNTED_COLLECTION].bulk_write(rows, ordered=False)
+        self._increment(demand, pairs)
+
+    def _increment(self, demand: Counter, pairs: Counter):
+        """$inc the demand and pair rows by the given deltas, dropping rows that reach zero."""
+        for collection, deltas, fields, make_id in (
+            (self.db[DEMAND_COLLECTION], demand, ("skill", "city", "field"), _demand_id),
+            (self.db[PAIRS_COLLECTION], pairs, ("a", "b"), _pair_id),
+        ):
+            deltas = {key: delta for key, delta in deltas.items() if delta}
+            if not deltas:
+                continue
+            collection.bulk_write([
+                UpdateOne({"_id": make_id(*key)},
+                          {"$inc": {"jobs": delta}, "$setOnInsert": dict(zip(fields, key))}, upsert=True)
+                for key, delta in deltas.items()
+            ], ordered=False)
+            decreased = [make_id(*key) for key, delta in deltas.items() if delta < 0]
+            if decreased:
+                collection.delete_many({"_id": {"$in": decreased}, "jobs": {"$lte": 0}})
+
+    def recount(self, started: Optional[datetime] = None, dry_run: bool = False, check: bool = True) -> Dict[str, int]:
+        """
+        Recount every open job and repair the materialized collections where they drifted.
+
+        Returns:
+            Numbers of counted jobs and of job, demand and pair rows that were (or, for a
+            dry run, would be) fixed.
+        """
+        now = started or datetime.utcnow()
+        timer = time.perf_counter()
+        expected: Dict[Any, dict] = {}
+        for job in self.db[JOBS_COLLECTION].find({}, DEMAND_PROJECTION):
+            contribution = demand_contribution(job, now)
+            if contribution is not None:
+                expected[job["_id"]] = {**contribution, "expires_at": job.get("expiryTime")}
+
+        demand, pairs = Counter(), Counter()
+        for contribution in expected.values():
+            demand.update(_demand_keys(contribution))
+            pairs.update(_pair_keys(contribution))
+
+        counts = {"jobs": len(expected)}
+        for name, collection, target in (
+            ("jobs_fixed", self.db[COUNTED_COLLECTION], expected),
+            ("demand_rows_fixed", self.db[DEMAND_COLLECTION],
+             {_demand_id(*key): {"skill": key[0], "city": key[1], "field": key[2], "jobs": jobs}
+              for key, jobs in demand.items()}),
+            ("pair_rows_fixed", self.db[PAIRS_COLLECTION],
+             {_pair_id(*key): {"a": key[0], "b": key[1], "jobs": jobs} for key, jobs in pairs.items()}),
+        ):
+            fixes = self._repairs(collection, target)
+            counts[name] = len(fixes)
+            if fixes and not dry_run:
+                for i in range(0, len(fixes), BATCH_SIZE * 2):
+                    collection.bulk_write(fixes[i:i + BATCH_SIZE * 2], ordered=False)
+
+        drifted = check and any(counts[name] for name in counts if name != "jobs")
+        log = logger.warning if drifted else logger.info
+        log(f"Skill demand recount{' (dry run)' if dry_run else ''} in {time.perf_counter() - timer:.1f}s: {counts}")
+        return counts
+
+    @staticmethod
+    def _repairs(collection, target: Dict[Any, dict]) -> list:
+        """Writes turning the stored rows of `collection` into `target` (_id -> row)."""
+        fixes, seen = [], set()
+        for row in collection.find({}):
+            _id = row.pop("_id")
+            seen.add(_id)
+            if _id not in target:
+                fixes.append(DeleteOne({"_id": _id}))
+            elif target[_id] != row:
+                fixes.append(ReplaceOne({"_id": _id}, target[_id]))
+        fixes += [ReplaceOne({"_id": _id}, row, upsert=True) for _id, row in target.items() if _id not in seen]
+        return fixes
+
+    def status(self) -> Dict[str, Any]:
+        state = self.db[STATE_COLLECTION].find_one({"_id": STATE_ID}, {"_id": 0, "owner": 0}) or {}
+        return {**state, "counted_jobs": self.db[COUNTED_COLLECTION].estimated_document_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recount the materialized skill demand")
+    parser.add_argument("--dry-run", action="store_true", help="Only report the drift")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_ATLAS_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_ATLAS_URI not found in environment variables. Please set it in your .env file.")
+
+    db = MongoClient(mongo_uri)[DB_NAME]
+    ensure_demand_indexes(db)
+    maintainer = SkillDemandMaintainer(db)
+    if claim_lease(db, STATE_ID, maintainer.owner, LEASE_DURATION) is None:
+        logger.warning("Another process is maintaining the skill demand")
+        return
+    now = datetime.utcnow()
+    counts = maintainer.recount(started=now, dry_run=args.dry_run)
+    release_lease(db, STATE_ID, {} if args.dry_run else {"last_recount_at": now, "last_recount": counts})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# skill_graph.py
+"""
+Skill-relatedness graph for adjacent-skill credit.
+
+Nodes are normalized skills. Edges come from curated relations (vocabulary.
+SKILL_RELATIONS) and from co-occurrence in the job corpus, weighted by the Ochiai
+coefficient count(a, b) / sqrt(count(a) * count(b)). The weighted k-hop
+neighborhood of every skill (path weight = product of the edge weights) is
+materialized into `table`, so scoring reads the related skills of a CV skill
+instead of traversing the graph.
+
+The graph follows a JobIndex incrementally: `sync` only counts jobs added, changed
+or removed since the last call and only re-materializes the neighborhoods that can
+reach a skill whose counts changed.
+"""
+import math
+import time
+import logging
+import threading
+from itertools import combinations
+from typing import Any, Dict, Iterable, Set, Tuple
+
+import networkx as nx
+
+from services.job_matching.skill_index import JobIndex
+from services.job_matching.vocabulary import SKILL_RELATIONS
+from utils.text_normalization import normalize_skill
+
+logger = logging.getLogger(__name__)
+
+# Neighborhood radius of the materialized table
+MAX_HOPS = 2
+# Related skills kept per skill, strongest first
+MAX_NEIGHBORS = 15
+# Edges and paths weaker than this are ignored
+MIN_RELATEDNESS = 0.2
+# Jobs a pair of skills must share before co-occurrence creates an edge
+MIN_COOCCURRENCE = 3
+# Co-occurrence says "used together", not "interchangeable": scale it below curated edges
+COOCCURRENCE_FACTOR = 0.5
+
+
+class SkillTable:
+    """Read-only copy of a materialized table (picklable, e.g. for worker processes)."""
+
+    def __init__(self, table: Dict[str, Tuple[Tuple[str, float], ...]]):
+        self.table = dict(table)
+
+    def related(self, skill: str) -> Tuple[Tuple[str, float], ...]:
+        return self.table.get(skill, ())
+
+    def snapshot(self) -> "SkillTable":
+        return self
+
+
+class SkillGraph:
+    """Curated + co-occurrence skill graph and its materialized neighborhood table."""
+
+    def __init__(self, relations: Iterable[Tuple[str, str, float]] = SKILL_RELATIONS):
+        self.graph = nx.Graph()
+        # skill -> ((related skill, weight), ...), strongest first
+        self.table: Dict[str, Tuple[Tuple[str, float], ...]] = {}
+        self.index_version = None
+        # job id -> (features counted, skills counted)
+        self._counted: Dict[Any, Tuple[dict, frozenset]] = {}
+        self._lock = threading.Lock()
+
+        for a, b, weight in relations:
+            a, b = normalize_skill(a), normalize_skill(b)
+            self._node(a)
+            self._node(b)
+            self.graph.add_edge(a, b, count=0, curated=weight, weight=weight)
+        self._materialize(set(self.graph))
+
+    def related(self, skill: str) -> Tuple[Tuple[str, float], ...]:
+        """Related skills of a normalized skill with their weight, strongest first."""
+        return self.table.get(skill, ())
+
+    def sync(self, index: JobIndex) -> int:
+        """
+        Bring the co-occurrence counts and the table up to date with a JobIndex.
+        Must be called with the index lock held (or on an index nobody mutates).
+
+        Returns:
+            Number of jobs counted, uncounted or recounted.
+        """
+        with self._lock:
+            if index.version == self.index_version:
+                return 0
+            started = time.perf_counter()
+            dirty: Set[str] = set()
+            changed = 0
+
+            current = {}
+            for pos, features in index.records.items():
+                job_id = index.ids[pos]
+                current[job_id] = features
+                counted = self._counted.get(job_id)
+                if counted is not None and counted[0] is features:
+                    continue
+                if counted is not None:
+                    dirty |= self._count(counted[1], -1)
+                skills = self._job_skills(features)
+                dirty |= self._count(skills, 1)
+                self._counted[job_id] = (features, skills)
+                changed += 1
+
+            for job_id in [job_id for job_id in self._counted if job_id not in current]:
+                dirty |= self._count(self._counted.pop(job_id)[1], -1)
+                changed += 1
+
+            if dirty:
+                self._reweight(dirty)
+                self._materialize(self._within_hops(dirty))
+            self.index_version = index.version
+            if changed:
+                logger.info(f"Skill graph synced: {changed} jobs, {len(dirty)} skills changed, "
+                            f"{self.graph.number_of_edges()} edges in {time.perf_counter() - started:.2f}s")
+            return changed
+
+    @staticmethod
+    def _job_skills(features: dict) -> frozenset:
+        # Title defaults are the same for every job of a role and say nothing about co-occurrence
+        if features.get("default_skills"):
+            return frozenset(features["preferred_skills"])
+        return frozenset(features["required_skills"]) | frozenset(features["preferred_skills"])
+
+    def _node(self, skill: str):
+        if skill not in self.graph:
+            self.graph.add_node(skill, count=0)
+
+    def _count(self, skills: frozenset, sign: int) -> Set[str]:
+        """Add (sign=1) or remove (sign=-1) one job's skills from the counts."""
+        for skill in skills:
+            self._node(skill)
+            self.graph.nodes[skill]["count"] += sign
+        for a, b in combinations(sorted(skills), 2):
+            if self.graph.has_edge(a, b):
+                self.graph[a][b]["count"] += sign
+            elif sign > 0:
+                self.graph.add_edge(a, b, count=1, curated=0.0, weight=0.0)
+        return set(skills)
+
+    def _reweight(self, dirty: Set[str]):
+        """Recompute the weight of every edge touching a skill whose counts changed."""
+        nodes = self.graph.nodes
+        stale_edges = []
+        for a in dirty:
+            for b, data in self.graph[a].items():
+                cooccurrence = 0.0
+                if data["count"] >= MIN_COOCCURRENCE:
+                    cooccurrence = COOCCURRENCE_FACTOR * data["count"] / math.sqrt(
+                        max(1, nodes[a]["count"]) * max(1, nodes[b]["count"]))
+                data["weight"] = max(data["curated"], cooccurrence)
+                if data["count"] <= 0 and not data["curated"]:
+                    stale_edges.append((a, b))
+        self.graph.remove_edges_from(stale_edges)
+
+    def _within_hops(self, skills: Set[str]) -> Set[str]:
+        """Skills whose materialized neighborhood can contain an edge of `skills`."""
+        reached = set(skills)
+        frontier = set(skills)
+        for _ in range(MAX_HOPS):
+            frontier = {
+                neighbor
+                for skill in frontier
+                for neighbor, data in self.graph[skill].items()
+                if data["weight"] >= MIN_RELATEDNESS and neighbor not in reached
+            }
+            reached |= frontier
+        return reached
+
+    def _neighborhood(self, skill: str) -> Tuple[Tuple[str, float], ...]:
+        best: Dict[str, float] = {}
+        frontier = {skill: 1.0}
+        for _ in range(MAX_HOPS):
+            next_frontier: Dict[str, float] = {}
+            for node, path_weight in frontier.items():
+                for neighbor, data in self.graph[node].items():
+                    weight = path_weight * data["weight"]
+                    if neighbor == skill or weight < MIN_RELATEDNESS:
+                        continue
+                    if weight > best.get(neighbor, 0.0):
+                        best[neighbor] = weight
+                        next_frontier[neighbor] = weight
+            frontier = next_frontier
+        ranked = sorted(best.items(), key=lambda item: -item[1])[:MAX_NEIGHBORS]
+        return tuple((neighbor, round(weight, 3)) for neighbor, weight in ranked)
+
+    def _materialize(self, skills: Set[str]):
+        for skill in skills:
+            if skill not in self.graph:
+                self.table.pop(skill, None)
+                continue
+            neighborhood = self._neighborhood(skill)
+            if neighborhood:
+                self.table[skill] = neighborhood
+            else:
+                self.table.pop(skill, None)
+
+    def snapshot(self) -> SkillTable:
+        with self._lock:
+            return SkillTable(self.table)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "skills": self.graph.number_of_nodes(),
+            "edges": self.graph.number_of_edges(),
+            "materialized": len(self.table),
+            "jobs": len(self._counted),
+        }
@@ -0,0 +1,197 @@
+# skill_index.py
+"""
+In-process index of the features of the matchable jobs.
+
+The scoring engine (scoring.py) compiles its matrices from the records kept here,
+JobSync keeps them in step with the `jobs` collection, and `content_stamp()`
+identifies the indexed content for the match cache and job snapshots.
+"""
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from services.job_matching.job_features import RAW_JOB_PROJECTION, feature_digest, job_features
+
+logger = logging.getLogger(__name__)
+
+# Fields needed to index a job (raw fields are only read when features are missing)
+INDEX_PROJECTION = RAW_JOB_PROJECTION
+
+# Content digests are summed modulo 2^64
+_DIGEST_MASK = (1 << 64) - 1
+
+# Minimum seconds between two incremental refreshes from the collection
+REFRESH_INTERVAL = 30
+# Timestamps a refresh follows (besides new ids and expiry times)
+REFRESH_FIELDS = ("updatedAt", "features.computed_at", "dedup.computed_at")
+# Changes taken into account from this long before the last refresh, so none is lost to clock skew
+REFRESH_OVERLAP = timedelta(seconds=30)
+# Changed ids looked up per query
+REFRESH_BATCH_SIZE = 1000
+
+
+class JobIndex:
+    """
+    Job features by job id.
+
+    Jobs are stored at integer positions (reused after removals), which the scoring
+    engine uses as row numbers. Safe to share between request threads; all mutations
+    bump `version`, which callers can use to invalidate anything derived from the
+    index in this process. `content_stamp()` identifies the indexed content itself
+    and is comparable across processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # position -> job id (None for removed jobs, whose positions get reused)
+        self.ids: List[Any] = []
+        self.positions: Dict[Any, int] = {}
+        self._free: List[int] = []
+        # position -> job features, read by the scoring engine
+        self.records: Dict[int, dict] = {}
+        # position -> feature_digest of the job; their sum is the content digest
+        self.digests: Dict[int, int] = {}
+        self._content = 0
+        self.version = 0
+        self._last_id = None
+        self._last_refresh = 0.0
+        # Wall-clock time of the last build/refresh, the lower bound of the next refresh
+        self._refreshed_at: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def add(self, job: dict):
+        """Index (or re-index) one job document."""
+        with self._lock:
+            job_id = job["_id"]
+            if job_id in self.positions:
+                pos = self.positions[job_id]
+            elif self._free:
+                pos = self._free.pop()
+            else:
+                pos = len(self.ids)
+                self.ids.append(None)
+            self.ids[pos] = job_id
+            self.positions[job_id] = pos
+
+            features = job_features(job)
+            self.records[pos] = features
+            digest = feature_digest(job_id, features)
+            self._content = (self._content - self.digests.get(pos, 0) + digest) & _DIGEST_MASK
+            self.digests[pos] = digest
+            if self._last_id is None or job_id > self._last_id:
+                self._last_id = job_id
+            self.version += 1
+
+    def add_many(self, jobs: Iterable[dict]):
+        with self._lock:
+            for job in jobs:
+                self.add(job)
+
+    def apply_changes(self, upserts: Iterable[dict], removals: Iterable[Any]):
+        """Index (or re-index) some jobs and drop others, under one lock acquisition."""
+        with self._lock:
+            for job_id in removals:
+                self.remove(job_id)
+            for job in upserts:
+                self.add(job)
+
+    def remove(self, job_id: Any):
+        """Drop a job from the index (no-op if unknown)."""
+        with self._lock:
+            pos = self.positions.pop(job_id, None)
+            if pos is None:
+                return
+            del self.records[pos]
+            self._content = (self._content - self.digests.pop(pos)) & _DIGEST_MASK
+            self.ids[pos] = None
+            self._free.append(pos)
+            self.version += 1
+
+    def build(self, collection, query: Optional[dict] = None):
+        """(Re)build the whole index from the jobs collection (or the jobs matching `query`)."""
+        started = time.perf_counter()
+        refreshed_at = datetime.utcnow()
+        fresh = JobIndex()
+        for job in collection.find(query or {}, INDEX_PROJECTION).sort("_id", 1):
+            fresh.add(job)
+        with self._lock:
+            self.ids = fresh.ids
+            self.positions = fresh.positions
+            self._free = fresh._free
+            self.records = fresh.records
+            self.digests = fresh.digests
+            self._content = fresh._content
+            self._last_id = fresh._last_id
+            self._last_refresh = time.monotonic()
+            self._refreshed_at = refreshed_at
+            self.version += 1
+        logger.info(f"Job index built: {len(self.positions)} jobs in {time.perf_counter() - started:.2f}s")
+
+    def refresh(self, collection, open_query: dict, force: bool = False) -> int:
+        """
+        Apply the jobs inserted, updated (REFRESH_FIELDS) or expired since the last
+        build/refresh: those matching `open_query` (job_sync.open_jobs_query) are
+        (re)indexed, the others (closed, expired, near-duplicates) dropped. Deleted
+        jobs are not noticed here (see JobSync). Throttled to once every
+        REFRESH_INTERVAL seconds unless `force` is set.
+
+        Returns:
+            Number of jobs indexed or dropped.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_refresh < REFRESH_INTERVAL:
+            return 0
+        self._last_refresh = now
+
+        refreshed_at = datetime.utcnow()
+        if self._refreshed_at is None:
+            changed_query = {}
+        else:
+            since = self._refreshed_at - REFRESH_OVERLAP
+            changed_query = {"$or": [
+                *({field: {"$gt": since}} for field in REFRESH_FIELDS),
+                {"expiryTime": {"$gt": since, "$lte": refreshed_at}},
+                *([{"_id": {"$gt": self._last_id}}] if self._last_id is not None else []),
+            ]}
+        changed = [job["_id"] for job in collection.find(changed_query, {"_id": 1})]
+        upserts = []
+        for start in range(0, len(changed), REFRESH_BATCH_SIZE):
+            chunk = changed[start:start + REFRESH_BATCH_SIZE]
+            upserts.extend(collection.find({"$and": [{"_id": {"$in": chunk}}, open_query]}, INDEX_PROJECTION))
+        kept = {job["_id"] for job in upserts}
+        with self._lock:
+            # Jobs seen again within REFRESH_OVERLAP are usually indexed as they are
+            upserts = [job for job in upserts if not self.indexed_as(job)]
+            removals = [job_id for job_id in changed if job_id not in kept and job_id in self.positions]
+            self.apply_changes(upserts, removals)
+            if changed:
+                newest = max(changed)
+                if self._last_id is None or newest > self._last_id:
+                    self._last_id = newest
+            self._refreshed_at = refreshed_at
+        if upserts or removals:
+            logger.info(f"Job index refreshed: {len(upserts)} jobs indexed, {len(removals)} dropped")
+        return len(upserts) + len(removals)
+
+    def indexed_as(self, job: dict) -> bool:
+        """Whether a job is indexed with the same features (computed_at aside)."""
+        pos = self.positions.get(job["_id"])
+        return pos is not None and self.digests.get(pos) == feature_digest(job["_id"], job_features(job))
+
+    def content_stamp(self) -> str:
+        """
+        Stamp of the indexed jobs: their count and the sum of their feature digests.
+        Any added, removed or re-featured job changes it (in place updates included),
+        and two processes indexing the same jobs get the same stamp.
+        """
+        return f"{len(self.positions)}:{self._content:016x}"
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "jobs": len(self.positions),
+            "version": self.version,
+        }
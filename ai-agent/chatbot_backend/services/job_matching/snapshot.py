@@ -0,0 +1,382 @@
+# snapshot.py
+"""
+Memory-mapped snapshots of the compiled job corpus.
+
+A snapshot is one read-only binary file holding everything CompiledJobs scores
+with: the job x skill CSR arrays, title codes, level codes, per-job titles,
+companies and ids, plus (in a JSON header) the skill vocabulary, the distinct
+titles and the related-skill table. Workers `mmap` it and wrap the arrays without
+copying, so all workers of a host share one physical copy through the page cache
+and start serving as soon as the file is mapped, instead of each rebuilding a
+JobIndex from Mongo.
+
+Layout: MAGIC, the header length (uint64 little-endian), the JSON header, then the
+arrays, each at an ALIGNMENT-byte boundary; their offsets in the header count
+from the first boundary after the header.
+
+One process per host publishes (`SnapshotPublisher`, elected with an flock): it
+keeps its own JobIndex current (job_sync.JobSync) and writes a new snapshot next
+to the old one, then `os.replace`s it into place. Readers (`SnapshotReader`)
+notice the new inode and remap; requests still holding the previous mapping finish
+on it.
+
+Build one by hand (or keep one current) with:
+    python -m services.job_matching.snapshot --out snapshots/jobs.snap [--watch]
+"""
+import os
+import json
+import mmap
+import time
+import fcntl
+import struct
+import logging
+import argparse
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+from pymongo import MongoClient
+from scipy import sparse
+from dotenv import load_dotenv
+
+from services.job_matching.job_features import JOB_FEATURES_VERSION
+from services.job_matching.scoring import CompiledJobs, JobScorer, SCORING_CONFIG_VERSION
+from services.job_matching.skill_graph import SkillTable
+from services.job_matching.skill_index import JobIndex
+from services.job_matching.job_sync import JobSync, open_jobs_query
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the file layout changes
+SNAPSHOT_FORMAT_VERSION = 1
+MAGIC = b"JOBSNAP\0"
+# Arrays start at multiples of this (cache line) offset
+ALIGNMENT = 64
+# Seconds between two checks of the snapshot file for a newer version
+CHECK_INTERVAL = 5
+# Seconds between two publications (when jobs changed)
+PUBLISH_INTERVAL = 30
+
+DB_NAME = "CVProject"
+JOBS_COLLECTION = "jobs"
+
+
+class SnapshotError(Exception):
+    """A snapshot file that cannot be served (corrupt, or built by another version)."""
+
+
+class StringTable:
+    """Read-only sequence of strings stored as one UTF-8 blob and offsets, decoded on access."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, decode: Optional[Callable[[str], Any]] = None):
+        self.blob = blob
+        self.offsets = offsets
+        self.decode = decode
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> Any:
+        value = self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+        return self.decode(value) if self.decode else value
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def _aligned(size: int) -> int:
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def _string_arrays(values: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [str(value).encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _csr_arrays(matrix: sparse.csr_matrix) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Same dtype for indptr and indices, so scipy wraps them without converting (copying)
+    index_dtype = np.int32 if matrix.nnz < 2**31 else np.int64
+    return matrix.indptr.astype(index_dtype), matrix.indices.astype(index_dtype), matrix.data
+
+
+def write_snapshot(jobs: CompiledJobs, path: str, stamp: str) -> int:
+    """
+    Serialize compiled jobs into a snapshot file, atomically replacing `path`.
+
+    Args:
+        jobs: Compiled jobs to publish
+        path: Snapshot file path
+        stamp: Content stamp of the jobs (JobIndex.content_stamp)
+
+    Returns:
+        Size of the file in bytes.
+    """
+    arrays: Dict[str, np.ndarray] = {}
+    for name, matrix in (("required", jobs.required), ("preferred", jobs.preferred)):
+        arrays[f"{name}_indptr"], arrays[f"{name}_indices"], arrays[f"{name}_data"] = _csr_arrays(matrix)
+    arrays["required_mean_data"] = jobs.required_mean.data
+    arrays["title_codes"] = jobs.title_codes
+    arrays["unique_title_is_tech"] = jobs.unique_title_is_tech
+    arrays["level_codes"] = jobs.level_codes
+    object_ids = all(isinstance(job_id, ObjectId) for job_id in jobs.ids)
+    for name, values in (("titles", jobs.titles), ("companies", jobs.companies), ("ids", jobs.ids)):
+        arrays[f"{name}_blob"], arrays[f"{name}_offsets"] = _string_arrays(list(values))
+
+    skill_graph = jobs.skill_graph
+    related = {}
+    if skill_graph is not None:
+        related = {skill: [list(pair) for pair in pairs] for skill, pairs in skill_graph.snapshot().table.items()}
+
+    header = {
+        "format": SNAPSHOT_FORMAT_VERSION,
+        "scoring_config": SCORING_CONFIG_VERSION,
+        "features_version": JOB_FEATURES_VERSION,
+        "stamp": stamp,
+        "created_at": datetime.utcnow().isoformat(),
+        "shape": list(jobs.required.shape),
+        "id_type": "objectid" if object_ids else "str",
+        "vocab": jobs.vocab_list,
+        "unique_titles": jobs.unique_titles,
+        "unique_title_words": [sorted(words) for words in jobs.unique_title_words],
+        "level_names": jobs.level_names,
+        "related": related,
+        "arrays": {},
+    }
+    # Offsets are relative to the first ALIGNMENT boundary after the header
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += _aligned(array.nbytes)
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + 8 + len(header_bytes))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header["arrays"][name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        # Trailing padding, so even an empty last array lies within the file
+        size = data_start + offset
+        f.truncate(size)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return size
+
+
+class JobSnapshot:
+    """A snapshot file mapped read-only, with CompiledJobs over the mapped arrays."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            # The mapping outlives the file object, and the file itself once replaced
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise SnapshotError(f"{path} is not a job snapshot")
+        (header_length,) = struct.unpack_from("<Q", self._map, len(MAGIC))
+        header = json.loads(self._map[len(MAGIC) + 8:len(MAGIC) + 8 + header_length])
+        data_start = _aligned(len(MAGIC) + 8 + header_length)
+        for field, expected in (("format", SNAPSHOT_FORMAT_VERSION), ("scoring_config", SCORING_CONFIG_VERSION),
+                                ("features_version", JOB_FEATURES_VERSION)):
+            if header.get(field) != expected:
+                raise SnapshotError(f"{path} was built with {field} {header.get(field)}, expected {expected}")
+
+        self.path = path
+        self.stamp: str = header["stamp"]
+        self.created_at: str = header["created_at"]
+        arrays = {
+            name: np.frombuffer(self._map, dtype=np.dtype(spec["dtype"]), count=int(np.prod(spec["shape"])),
+                                offset=data_start + spec["offset"]).reshape(spec["shape"])
+            for name, spec in header["arrays"].items()
+        }
+        self.compiled = self._compile(header, arrays)
+
+    @staticmethod
+    def _csr(arrays: Dict[str, np.ndarray], name: str, shape: tuple, data: str = None) -> sparse.csr_matrix:
+        matrix = sparse.csr_matrix(
+            (arrays[data or f"{name}_data"], arrays[f"{name}_indices"], arrays[f"{name}_indptr"]),
+            shape=shape, copy=False)
+        # Written from canonical matrices; stops scipy from sorting the read-only arrays in place
+        matrix.has_sorted_indices = True
+        return matrix
+
+    def _compile(self, header: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> CompiledJobs:
+        shape = tuple(header["shape"])
+        vocab_list = header["vocab"]
+        decode_id = ObjectId if header["id_type"] == "objectid" else None
+        return CompiledJobs.restore({
+            # Distinct from any in-process index version
+            "version": ("snapshot", header["stamp"], header["created_at"]),
+            "skill_graph": SkillTable({skill: tuple(tuple(pair) for pair in pairs)
+                                       for skill, pairs in header["related"].items()}),
+            "ids": StringTable(arrays["ids_blob"], arrays["ids_offsets"], decode_id),
+            "titles": StringTable(arrays["titles_blob"], arrays["titles_offsets"]),
+            "companies": StringTable(arrays["companies_blob"], arrays["companies_offsets"]),
+            "vocab": {skill: pos for pos, skill in enumerate(vocab_list)},
+            "vocab_list": vocab_list,
+            "required": self._csr(arrays, "required", shape),
+            "preferred": self._csr(arrays, "preferred", shape),
+            "required_mean": self._csr(arrays, "required", shape, data="required_mean_data"),
+            "title_codes": arrays["title_codes"],
+            "unique_titles": header["unique_titles"],
+            "unique_title_words": [set(words) for words in header["unique_title_words"]],
+            "unique_title_is_tech": arrays["unique_title_is_tech"],
+            "level_codes": arrays["level_codes"],
+            "level_names": header["level_names"],
+        })
+
+
+class SnapshotReader:
+    """The current snapshot at a path, remapped when a newer one is published."""
+
+    def __init__(self, path: str, check_interval: float = CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot: Optional[JobSnapshot] = None
+        self._rejected = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[JobSnapshot]:
+        """The mapped snapshot (None if no servable one was published yet)."""
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self._reload_if_changed()
+        return self._snapshot
+
+    def _reload_if_changed(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        current = self._snapshot
+        if (current is not None and current.key == key) or key == self._rejected:
+            return
+        with self._lock:
+            if self._snapshot is not current:
+                return
+            started = time.perf_counter()
+            try:
+                snapshot = JobSnapshot(self.path)
+            except (SnapshotError, OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring job snapshot {self.path}: {e}")
+                self._rejected = key
+                return
+            self._snapshot = snapshot
+        logger.info(f"Job snapshot mapped: {len(snapshot.compiled)} jobs (stamp {snapshot.stamp}) "
+                    f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+class SnapshotPublisher:
+    """
+    Keeps a snapshot file current with the jobs collection.
+
+    Only the process holding an exclusive flock on `<path>.lock` builds and
+    publishes; the others return immediately, so every worker can run one.
+    """
+
+    def __init__(self, collection, path: str, interval: float = PUBLISH_INTERVAL, sync_mode: str = "auto"):
+        self.collection = collection
+        self.path = path
+        self.interval = interval
+        self.sync_mode = sync_mode
+        self.index = JobIndex()
+        self.scorer = JobScorer(self.index)
+        self.sync: Optional[JobSync] = None
+        self._published_version = None
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="job-snapshot-publisher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.sync is not None:
+            self.sync.stop()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.publish_once()
+            except Exception as e:
+                logger.error(f"Job snapshot publication failed: {e}")
+            self._stop.wait(self.interval)
+
+    def _lead(self) -> bool:
+        if self._lock_file is None:
+            lock_file = open(f"{self.path}.lock", "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._lock_file = lock_file
+            logger.info(f"Publishing job snapshots to {self.path} from process {os.getpid()}")
+        return True
+
+    def publish_once(self) -> bool:
+        """
+        Publish a snapshot if this process leads and the jobs changed since the last one.
+
+        Returns:
+            Whether a snapshot was written.
+        """
+        if not self._lead():
+            return False
+        if self.sync is None:
+            since = datetime.utcnow()
+            self.index.build(self.collection, query=open_jobs_query(since))
+            self.sync = JobSync(self.collection, self.index, since=since, mode=self.sync_mode)
+            self.sync.start()
+        if self.index.version == self._published_version and os.path.exists(self.path):
+            return False
+
+        started = time.perf_counter()
+        size = write_snapshot(self.scorer.compiled(), self.path, self.index.content_stamp())
+        self._published_version = self.index.version
+        logger.info(f"Job snapshot published: {len(self.index)} jobs, {size / 2**20:.1f} MiB "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build (and keep current) the memory-mapped job snapshot")
+    parser.add_argument("--out", required=True, help="Snapshot file path (JOB_SNAPSHOT_PATH of the API)")
+    parser.add_argument("--watch", action="store_true", help="Keep publishing as jobs change")
+    parser.add_argument("--interval", type=float, default=PUBLISH_INTERVAL, help="Seconds between publications")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+    mongo_uri = os.getenv("MONGO_ATLAS_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_ATLAS_URI not found in environment variables. Please set it in your .env file.")
+
+    client = MongoClient(mongo_uri)
+    publisher = SnapshotPublisher(client[DB_NAME][JOBS_COLLECTION], args.out, interval=args.interval)
+    if not publisher.publish_once():
+        logger.warning(f"Another process is publishing {args.out}")
+    while args.watch:
+        time.sleep(args.interval)
+        publisher.publish_once()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# vocabulary.py
+"""Static vocabularies shared by the job matching components."""
+import re
+from typing import List, Set
+
+# Default skills per job title keyword, used when a posting lists no required skills
+DEFAULT_SKILLS_BY_TITLE = {
+    'backend': [
+        'python', 'java', 'node.js', 'sql', 'rest api', 'git', 'docker', 'aws',
+        'mongodb', 'postgresql', 'mysql', 'graphql', 'microservices', 'api development'
+    ],
+    'fullstack': [
+        'javascript', 'react', 'node.js', 'python', 'sql', 'html', 'css', 'rest api',
+        'typescript', 'redux', 'next.js', 'express', 'mongodb', 'postgresql', 'git', 'docker'
+    ],
+    'frontend': [
+        'javascript', 'react', 'vue', 'angular', 'html', 'css', 'typescript', 'responsive design',
+        'redux', 'sass', 'next.js', 'webpack', 'babel', 'jest', 'testing'
+    ],
+    'devops': [
+        'docker', 'kubernetes', 'aws', 'ci/cd', 'terraform', 'linux', 'bash', 'python',
+        'jenkins', 'github actions', 'ansible', 'prometheus', 'grafana', 'nginx', 'cloud'
+    ],
+    'data scientist': [
+        'python', 'machine learning', 'pandas', 'numpy', 'sql', 'statistics', 'tensorflow', 'pytorch',
+        'data analysis', 'data visualization', 'scikit-learn', 'deep learning', 'jupyter', 'matplotlib', 'seaborn'
+    ],
+    'mobile': [
+        'swift', 'kotlin', 'react native', 'flutter', 'mobile ui/ux', 'rest api', 'firebase',
+        'ios development', 'android development', 'mobile app development', 'redux', 'typescript', 'graphql'
+    ],
+    'ai': [
+        'python', 'machine learning', 'deep learning', 'tensorflow', 'pytorch', 'nlp', 'computer vision',
+        'neural networks', 'data science', 'natural language processing', 'opencv', 'scikit-learn', 'keras'
+    ],
+    'cloud': [
+        'aws', 'azure', 'google cloud', 'docker', 'kubernetes', 'terraform', 'ci/cd',
+        'serverless', 'lambda', 'cloudformation', 'ansible', 'jenkins', 'github actions', 'devops'
+    ],
+    'lập trình viên': [
+        'javascript', 'python', 'java', 'sql', 'git', 'oop', 'algorithms', 'data structures',
+        'html', 'css', 'react', 'node.js', 'mongodb', 'rest api', 'typescript', 'docker'
+    ],
+    'tester': [
+        'testing', 'automation', 'selenium', 'junit', 'testng', 'api testing', 'manual testing',
+        'jest', 'cypress', 'postman', 'jira', 'test automation', 'qa', 'quality assurance'
+    ],
+    'digital marketing': [
+        'seo', 'sem', 'social media marketing', 'content marketing', 'google analytics',
+        'email marketing', 'ppc', 'digital advertising', 'marketing strategy', 'seo'
+    ],
+    'hr': [
+        'recruitment', 'talent acquisition', 'employee relations', 'hr policies', 'performance management',
+        'training and development', 'compensation and benefits', 'hr management', 'onboarding', 'labor law'
+    ],
+    'sales': [
+        'customer relationship management', 'sales strategy', 'business development', 'account management',
+        'negotiation', 'market research', 'sales presentations', 'b2b sales', 'sales forecasting', 'crm'
+    ]
+}
+
+# Fallback skills for titles that match none of the keywords above
+GENERAL_SKILLS = ['problem solving', 'teamwork', 'communication', 'git', 'agile', 'debugging']
+
+# Title words that carry no role information
+TITLE_STOPWORDS = {'senior', 'junior', 'lead', 'staff', 'i', 'ii', 'iii', 'iv', 'v'}
+
+# Vietnamese to English title mapping for better matching
+TITLE_MAPPING = {
+    'lập trình viên': ['developer', 'programmer', 'engineer'],
+    'kỹ sư': ['engineer', 'developer'],
+    'chuyên viên': ['specialist', 'expert', 'officer'],
+    'nhân viên': ['staff', 'officer', 'associate']
+}
+
+TECH_INDICATORS = ['developer', 'engineer', 'programmer', 'lập trình', 'kỹ thuật', 'technical', 'code', 'software']
+
+# Seniority keywords in job titles, checked in order (most specific first). Whole words
+# only: 'International Sales Manager' is a manager, 'Internal Auditor' has no level.
+TITLE_LEVELS = [
+    ('intern/fresher', r'\b(?:intern(?:ship)?|fresher|thực tập)\b'),
+    ('manager', r'\b(?:manager|head of|director|quản lý|trưởng phòng)\b'),
+    ('lead', r'\b(?:lead|principal|trưởng nhóm)\b'),
+    ('senior', r'\b(?:senior|sr)\b'),
+    ('junior', r'\b(?:junior|jr)\b'),
+    ('mid-level', r'\b(?:mid|middle)\b'),
+]
+
+# Other names of the levels above (resume extraction, API clients) -> the job levels they cover
+LEVEL_ALIASES = {
+    'intern': ['intern/fresher'], 'internship': ['intern/fresher'], 'fresher': ['intern/fresher'],
+    'entry-level': ['intern/fresher', 'junior'], 'entry level': ['intern/fresher', 'junior'],
+    'entry': ['intern/fresher', 'junior'], 'jr': ['junior'], 'mid': ['mid-level'], 'middle': ['mid-level'],
+    'mid level': ['mid-level'], 'sr': ['senior'], 'principal': ['lead'], 'director': ['manager'],
+}
+
+
+# Skills recognised in job descriptions: every default skill plus common technologies.
+# Single-letter or ambiguous names (c, r, go, ai, less, vault) are left out on purpose.
+TECH_SKILLS = sorted({skill for skills in DEFAULT_SKILLS_BY_TITLE.values() for skill in skills} | {
+    'c++', 'c#', '.net', 'asp.net', 'php', 'laravel', 'ruby', 'ruby on rails', 'rust', 'scala', 'golang',
+    'spring', 'spring boot', 'django', 'flask', 'fastapi', 'nestjs', 'vue', 'svelte', 'tailwind',
+    'redis', 'elasticsearch', 'kafka', 'rabbitmq', 'oracle', 'sql server', 'dynamodb', 'cassandra',
+    'spark', 'hadoop', 'airflow', 'tableau', 'power bi', 'excel', 'etl', 'data warehouse',
+    'figma', 'jira', 'confluence', 'scrum', 'kanban', 'unit testing', 'tdd', 'oauth', 'websocket',
+    'llm', 'langchain', 'hugging face', 'transformers', 'mlops', 'gcp', 'azure devops', 'helm',
+    'english', 'japanese', '.net core', 'dart', 'matlab', 'nuxt.js', 'd3.js', 'three.js', 'jquery',
+    'bootstrap', 'tailwind css', 'sqlite', 'mariadb', 'neo4j', 'couchbase', 'couchdb', 'amazon web services',
+    'gitlab ci/cd', 'circleci', 'travis ci', 'istio', 'linkerd', 'argo cd', 'grpc', 'bdd', 'big data',
+    'blockchain', 'artificial intelligence', 'iot', 'cybersecurity',
+})
+
+# Curated related skills (canonical names) with their relatedness: a CV listing one
+# gets partial credit for the other
+SKILL_RELATIONS = [
+    # Web frameworks
+    ('django', 'flask', 0.7), ('flask', 'fastapi', 0.8), ('django', 'fastapi', 0.6),
+    ('express', 'nestjs', 0.7), ('spring', 'spring boot', 0.9), ('laravel', 'php', 0.8),
+    ('ruby on rails', 'ruby', 0.8), ('asp.net', '.net', 0.9), ('.net', 'c#', 0.8),
+    # Frontend
+    ('react', 'vue', 0.6), ('vue', 'angular', 0.6), ('react', 'angular', 0.5), ('react', 'svelte', 0.5),
+    ('react', 'react native', 0.7), ('react', 'next.js', 0.8), ('redux', 'react', 0.7),
+    ('javascript', 'typescript', 0.8), ('css', 'sass', 0.7), ('css', 'tailwind', 0.7),
+    # Languages
+    ('java', 'kotlin', 0.7), ('java', 'scala', 0.5), ('c++', 'c#', 0.5), ('swift', 'kotlin', 0.4),
+    ('python', 'django', 0.5), ('python', 'flask', 0.5), ('javascript', 'node.js', 0.6),
+    # Data stores
+    ('mysql', 'postgresql', 0.8), ('postgresql', 'sql server', 0.7), ('mysql', 'sql server', 0.7),
+    ('oracle', 'sql', 0.6), ('sql', 'mysql', 0.7), ('sql', 'postgresql', 0.7), ('mongodb', 'dynamodb', 0.6),
+    ('mongodb', 'cassandra', 0.5), ('redis', 'elasticsearch', 0.3), ('kafka', 'rabbitmq', 0.7),
+    # Cloud and DevOps
+    ('aws', 'azure', 0.6), ('aws', 'google cloud', 0.6), ('azure', 'google cloud', 0.6), ('google cloud', 'gcp', 1.0),
+    ('docker', 'kubernetes', 0.7), ('kubernetes', 'helm', 0.7), ('jenkins', 'github actions', 0.7),
+    ('ci/cd', 'jenkins', 0.6), ('ci/cd', 'github actions', 0.6), ('terraform', 'cloudformation', 0.7),
+    ('terraform', 'ansible', 0.5), ('azure', 'azure devops', 0.7), ('linux', 'bash', 0.7),
+    # Data and ML
+    ('tensorflow', 'pytorch', 0.8), ('tensorflow', 'keras', 0.8), ('machine learning', 'deep learning', 0.7),
+    ('machine learning', 'scikit-learn', 0.7), ('pandas', 'numpy', 0.8), ('spark', 'hadoop', 0.7),
+    ('tableau', 'power bi', 0.8), ('nlp', 'natural language processing', 1.0), ('nlp', 'llm', 0.6),
+    ('llm', 'langchain', 0.7), ('hugging face', 'transformers', 0.8), ('airflow', 'etl', 0.6),
+    # Testing
+    ('selenium', 'cypress', 0.7), ('junit', 'testng', 0.8), ('jest', 'cypress', 0.5),
+    ('test automation', 'selenium', 0.7), ('manual testing', 'qa', 0.6), ('qa', 'quality assurance', 1.0),
+    # Process
+    ('agile', 'scrum', 0.8), ('scrum', 'kanban', 0.6), ('jira', 'confluence', 0.6),
+]
+
+
+def title_words(title: str) -> str:
+    """Lowercased words of a title joined by single spaces, padded with a space on each side."""
+    return " " + " ".join(re.findall(r'\w+', title.lower())) + " "
+
+
+def has_title_keyword(words: str, keyword: str) -> bool:
+    """Whether title_words contain a keyword or phrase as whole words ('ai' is not in 'email')."""
+    return f" {keyword} " in words
+
+
+def default_skills_for_title(title: str) -> List[str]:
+    """Get default skills based on job title"""
+    words = title_words(title)
+
+    default_skills = []
+    for keyword, skill_list in DEFAULT_SKILLS_BY_TITLE.items():
+        if has_title_keyword(words, keyword):
+            default_skills.extend(skill_list)
+
+    # If no specific match, return some general skills
+    if not default_skills:
+        default_skills = GENERAL_SKILLS
+
+    return list(set(default_skills))  # Remove duplicates
+
+
+def title_tokens(title: str) -> Set[str]:
+    """Lowercased word tokens of a job title, without seniority words."""
+    return set(re.findall(r'\w+', title.lower())) - TITLE_STOPWORDS
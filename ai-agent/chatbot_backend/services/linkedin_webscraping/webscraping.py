@@ -95,7 +95,12 @@ def extract_job_data(job_url, job_id, job_location, username, unique_id, page):
 
     return job_data
 
-def scrape_jobs(page, params, username: str):
+def scrape_jobs(page, params, username: str, is_known=None):
+    """
+    Collect up to 20 jobs of a search and extract their metadata.
+    Jobs for which `is_known(job_id)` is true are already stored: their detail page is
+    not visited and only their id is returned (in `known_job_ids`).
+    """
     global PAGE_NUMBER
     main_url = "https://www.linkedin.com/jobs/"
     base_url = "https://www.linkedin.com/jobs/search/"
@@ -103,6 +108,7 @@ def scrape_jobs(page, params, username: str):
 
     job_url_list = []  # store job_url, job_id, location
     job_list = []      # final extracted jobs
+    known_job_ids = [] # jobs stored already, not extracted again
     seen_ids = set()   # track unique jobs across searches
 
     try:
@@ -111,7 +117,7 @@ def scrape_jobs(page, params, username: str):
         page.wait_for_load_state("load", timeout=20_000)
     except Exception as e:
         logger.error(f"Failed to load LinkedIn jobs search page: {e}")
-        return {}
+        return {"jobs": [], "count": 0, "known_job_ids": []}
 
     while True:
         try:
@@ -189,15 +195,18 @@ def scrape_jobs(page, params, username: str):
 
     # Traverse collected job URLs
     for job_item in tqdm(job_url_list, desc="Extracting Metadata from Job", total=len(job_url_list)):
+        if is_known is not None and is_known(job_item["job_id"]):
+            known_job_ids.append(job_item["job_id"])
+            continue
         data = extract_job_data(job_item["job_url"], job_item["job_id"], job_item["job_location"], job_item['user'], job_item['unique_id'], page)
         if data:
             job_list.append(data)
         time.sleep(random.uniform(0.5, 3.5))
 
-    return {"jobs": job_list, "count": len(job_list)}
+    return {"jobs": job_list, "count": len(job_list), "known_job_ids": known_job_ids}
 
 
-def retrieve_linkedin_jobs(headless, params_list):
+def retrieve_linkedin_jobs(headless, params_list, is_known=None):
     LINKEDIN_EMAIL = os.getenv("LINKEDIN_EMAIL")
     if not LINKEDIN_EMAIL:
         raise ValueError("LINKEDIN_EMAIL not found in environment variables. Please set it in your .env file.")
@@ -206,7 +215,7 @@ def retrieve_linkedin_jobs(headless, params_list):
     if not LINKEDIN_PASSWORD:
         raise ValueError("LINKEDIN_PASSWORD not found in environment variables. Please set it in your .env file.")
 
-    all_jobs = {"jobs": [], "count": 0}
+    all_jobs = {"jobs": [], "count": 0, "known_job_ids": []}
 
     # Start browser only once
     with sync_playwright() as p:
@@ -245,11 +254,12 @@ def retrieve_linkedin_jobs(headless, params_list):
             login_to_linkedin(page, email=LINKEDIN_EMAIL, password=LINKEDIN_PASSWORD, headless=headless)
 
             logger.info(f"Crawl starting... Params: {params}")
-            result = scrape_jobs(page, params, username=username)
+            result = scrape_jobs(page, params, username=username, is_known=is_known)
 
             # Aggregate results
             all_jobs["jobs"].extend(result["jobs"])
             all_jobs["count"] += result["count"]
+            all_jobs["known_job_ids"].extend(result["known_job_ids"])
 
             # Clean up context
             context.close()
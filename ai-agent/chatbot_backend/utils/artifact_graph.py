@@ -0,0 +1,207 @@
+# artifact_graph.py
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class ArtifactUnavailableError(ValueError):
+    """Raised when an artifact can neither be computed nor read from storage."""
+
+
+def content_hash(value: Any, volatile: Tuple[str, ...] = ()) -> str:
+    """Stable hash of a JSON-like value (strings are hashed as-is), without the `volatile` keys of a dict."""
+    if volatile and isinstance(value, dict):
+        value = {key: item for key, item in value.items() if key not in volatile}
+    if isinstance(value, str):
+        payload = value
+    else:
+        payload = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class ArtifactSpec:
+    """
+    One node of the derived-artifact graph.
+
+    Args:
+        name: Artifact name, also the key of its metadata under `artifacts.<name>`
+        deps: Names of the artifacts it is computed from (in `build` argument order)
+        version: Code version of the builder; bump it to invalidate stored outputs
+        build: Callable taking the dependency values, or None for source artifacts
+               and for builders supplied at run time
+        field: Document field holding the stored value, or None if not stored
+        volatile: Keys of a dict value left out of its output hash (e.g. timestamps),
+                  so a rebuild with the same content keeps the same hash
+    """
+
+    def __init__(self, name: str, deps: List[str], version: int,
+                 build: Optional[Callable] = None, field: Optional[str] = None,
+                 volatile: Tuple[str, ...] = ()):
+        self.name = name
+        self.deps = deps
+        self.version = version
+        self.build = build
+        self.field = field
+        self.volatile = volatile
+
+
+class ArtifactRun:
+    """Result of resolving artifacts: values, new metadata and what was reused vs rebuilt."""
+
+    def __init__(self, graph: "ArtifactGraph", stored: Dict[str, dict], provided: Dict[str, Any],
+                 load: Optional[Callable[[str], Any]], builders: Dict[str, Callable]):
+        self.graph = graph
+        self.stored = stored
+        self.provided = provided
+        self.load = load
+        self.builders = builders
+        self.values: Dict[str, Any] = {}
+        self.meta: Dict[str, dict] = {}
+        self.reused: List[str] = []
+        self.rebuilt: List[str] = []
+        # Artifacts whose stored value was taken as-is because an input is unavailable
+        self.adopted: List[str] = []
+
+    def value(self, name: str) -> Any:
+        """Return the value of a resolved artifact, loading or rebuilding it on first access."""
+        value = self.values.get(name, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        spec = self.graph.specs[name]
+        if spec.field and self.load:
+            value = self.load(spec.field)
+        if value is _MISSING or value is None:
+            if not spec.deps:
+                raise ArtifactUnavailableError(f"Source artifact '{name}' was provided without a stored value")
+            # Deterministic rebuild of a reused artifact whose value is not stored
+            value = self._build(spec)
+        self.values[name] = value
+        return value
+
+    def _build(self, spec: ArtifactSpec) -> Any:
+        builder = self.builders.get(spec.name) or spec.build
+        if builder is None:
+            raise ValueError(f"No builder registered for artifact '{spec.name}'")
+        return builder(*[self.value(dep) for dep in spec.deps])
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        Resolve one artifact (and its dependencies); returns its output hash, or None
+        if it can neither be computed nor found in storage.
+        """
+        if name in self.meta:
+            return self.meta[name]["output_hash"]
+
+        spec = self.graph.specs[name]
+        stored = self.stored.get(name) or {}
+
+        if name in self.provided:
+            value = self.provided[name]
+            self.values[name] = value
+            self.meta[name] = {"output_hash": content_hash(value, spec.volatile), "version": spec.version}
+            return self.meta[name]["output_hash"]
+
+        if not spec.deps:
+            # Source artifact that was not provided: trust the stored hash
+            if stored.get("output_hash"):
+                self.meta[name] = stored
+                return stored["output_hash"]
+            return None
+
+        dep_hashes = [self.resolve(dep) for dep in spec.deps]
+        if None in dep_hashes:
+            # An input is unavailable (e.g. raw text of a CV stored before hashing existed):
+            # keep whatever is stored for this artifact
+            if stored.get("output_hash"):
+                self.meta[name] = stored
+                return stored["output_hash"]
+            value = self.load(spec.field) if spec.field and self.load else None
+            if value is None:
+                return None
+            self.values[name] = value
+            self.meta[name] = {"output_hash": content_hash(value, spec.volatile), "version": spec.version}
+            self.adopted.append(name)
+            return self.meta[name]["output_hash"]
+
+        input_hash = content_hash([name, spec.version, dep_hashes])
+
+        if stored.get("input_hash") == input_hash and stored.get("output_hash"):
+            self.meta[name] = stored
+            self.reused.append(name)
+            return stored["output_hash"]
+
+        value = self._build(spec)
+        self.values[name] = value
+        self.meta[name] = {
+            "input_hash": input_hash,
+            "output_hash": content_hash(value, spec.volatile),
+            "version": spec.version,
+            "built_at": datetime.utcnow(),
+        }
+        self.rebuilt.append(name)
+        logger.info(f"Rebuilt artifact '{name}' (version {spec.version})")
+        return self.meta[name]["output_hash"]
+
+    def updates(self) -> Dict[str, Any]:
+        """`$set` document persisting the metadata and values of rebuilt artifacts."""
+        updates = {}
+        for name in self.rebuilt:
+            spec = self.graph.specs[name]
+            updates[f"artifacts.{name}"] = self.meta[name]
+            if spec.field:
+                updates[spec.field] = self.values[name]
+        for name in self.adopted:
+            updates[f"artifacts.{name}"] = self.meta[name]
+        for name in self.provided:
+            spec = self.graph.specs[name]
+            if (self.stored.get(name) or {}).get("output_hash") != self.meta[name]["output_hash"]:
+                updates[f"artifacts.{name}"] = self.meta[name]
+                if spec.field:
+                    updates[spec.field] = self.values[name]
+        return updates
+
+    def report(self) -> Dict[str, List[str]]:
+        """Which derived artifacts were reused versus rebuilt."""
+        return {"reused": list(self.reused), "rebuilt": list(self.rebuilt)}
+
+
+class ArtifactGraph:
+    """
+    Small dependency graph of derived artifacts.
+
+    Each derived artifact stores the hash of its inputs (dependency output hashes plus
+    its code version). When that hash is unchanged the stored output is reused and its
+    builder - e.g. an LLM call - is skipped.
+    """
+
+    def __init__(self, specs: List[ArtifactSpec]):
+        self.specs = {spec.name: spec for spec in specs}
+
+    def run(self, targets: List[str], stored: Optional[Dict[str, dict]] = None,
+            provided: Optional[Dict[str, Any]] = None, load: Optional[Callable[[str], Any]] = None,
+            builders: Optional[Dict[str, Callable]] = None) -> ArtifactRun:
+        """
+        Resolve the target artifacts.
+
+        Args:
+            targets: Artifacts to bring up to date
+            stored: Stored metadata per artifact (the `artifacts` sub-document)
+            provided: Fresh values for source artifacts (e.g. raw text of a new upload)
+            load: Callable returning the stored value of a document field, if any
+            builders: Run-time builders for artifacts registered without one
+
+        Returns:
+            ArtifactRun with values, persisted updates and the reuse report.
+        """
+        run = ArtifactRun(self, stored or {}, provided or {}, load, builders or {})
+        for name in targets:
+            if run.resolve(name) is None:
+                raise ArtifactUnavailableError(f"Artifact '{name}' cannot be resolved from the provided or stored inputs")
+        return run
@@ -0,0 +1,160 @@
+# event_logging.py
+"""
+Low-overhead structured event logging for the request hot paths.
+
+- Lazy: `log_event` checks whether the event would be emitted before touching its
+  fields, and callable field values are only evaluated when the record is formatted.
+- Sampled: DEBUG/INFO events are kept for a fraction of requests (LOG_SAMPLE_RATE);
+  warnings and errors are always kept.
+- Asynchronous: `setup_async_logging` moves the existing handlers behind a
+  QueueHandler, so formatting and writing happen on a listener thread.
+- Per-request debug: a request sent with `X-Debug-Log: 1`, or whose id was passed to
+  `enable_request_debug`, emits its DEBUG events regardless of the logger level.
+"""
+import os
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Set
+
+# Fraction of requests whose DEBUG/INFO events are kept
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+REQUEST_ID_HEADER = "X-Request-ID"
+DEBUG_HEADER = "X-Debug-Log"
+
+_debug_request_ids: Set[str] = set(filter(None, os.getenv("DEBUG_REQUEST_IDS", "").split(",")))
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class RequestLogContext:
+    """Logging state of the request being served."""
+
+    def __init__(self, request_id: str, sampled: bool, debug: bool = False):
+        self.request_id = request_id
+        self.sampled = sampled
+        self.debug = debug
+
+
+_request_context: ContextVar[Optional[RequestLogContext]] = ContextVar("request_log_context", default=None)
+
+
+class EventMessage:
+    """Log message rendered as `event key=value ...` only when a handler formats it."""
+
+    __slots__ = ("event", "fields")
+
+    def __init__(self, event: str, fields: Dict[str, Any]):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self) -> str:
+        parts = [self.event]
+        for key, value in self.fields.items():
+            if callable(value):
+                value = value()
+            parts.append(f"{key}={value}")
+        return " ".join(parts)
+
+
+def log_event(log: logging.Logger, event: str, level: int = logging.DEBUG, **fields):
+    """
+    Emit a structured event.
+
+    Args:
+        log: Logger of the calling module
+        event: Short event name, e.g. "job_scored"
+        level: Logging level of the event
+        **fields: Event fields; pass a callable (e.g. a lambda) for values that are
+                  expensive to compute, it is only called if the event is written
+    """
+    ctx = _request_context.get()
+    if ctx is None or not ctx.debug:
+        if not log.isEnabledFor(level):
+            return
+        # Outside a request (CLI, migrations) every enabled event is kept
+        if ctx is not None and level < logging.WARNING and not ctx.sampled:
+            return
+
+    if ctx is not None:
+        fields["request_id"] = ctx.request_id
+    record = log.makeRecord(log.name, level, "(event)", 0, EventMessage(event, fields), None, None)
+    # handle() skips the logger level check, which per-request debug relies on
+    log.handle(record)
+
+
+def enable_request_debug(request_id: str):
+    """Emit DEBUG events for every request carrying this request id."""
+    _debug_request_ids.add(request_id)
+
+
+def disable_request_debug(request_id: str):
+    """Stop emitting DEBUG events for this request id."""
+    _debug_request_ids.discard(request_id)
+
+
+def start_request(request_id: Optional[str] = None, debug: bool = False) -> RequestLogContext:
+    """Bind a logging context (request id, sampling decision) to the current request."""
+    request_id = request_id or uuid.uuid4().hex
+    ctx = RequestLogContext(
+        request_id,
+        sampled=random.random() < LOG_SAMPLE_RATE,
+        debug=debug or request_id in _debug_request_ids,
+    )
+    _request_context.set(ctx)
+    return ctx
+
+
+async def request_logging_middleware(request, call_next):
+    """FastAPI middleware binding a RequestLogContext to every request."""
+    ctx = start_request(
+        request.headers.get(REQUEST_ID_HEADER),
+        debug=request.headers.get(DEBUG_HEADER, "").lower() in ("1", "true", "yes"),
+    )
+    response = await call_next(request)
+    response.headers[REQUEST_ID_HEADER] = ctx.request_id
+    return response
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue is in-process, so the record does not need to be made picklable
+        return record
+
+
+def setup_async_logging(log: Optional[logging.Logger] = None):
+    """
+    Move the handlers of `log` (the root logger by default) behind a queue so the
+    request path only enqueues records. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log = log or logging.getLogger()
+    handlers = list(log.handlers)
+    if not handlers:
+        return
+
+    log_queue = queue.SimpleQueue()
+    for handler in handlers:
+        log.removeHandler(handler)
+    log.addHandler(_DeferredQueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_async_logging)
+
+
+def stop_async_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,81 @@
+# text_normalization.py
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Any, Iterable, List
+
+# ——————————————————————————————————————————————————————
+# Skill aliases (variant spelling -> canonical name)
+# ——————————————————————————————————————————————————————
+SKILL_ALIASES = {
+    'nodejs': 'node.js',
+    'node js': 'node.js',
+    'reactjs': 'react',
+    'react.js': 'react',
+    'vuejs': 'vue',
+    'vue.js': 'vue',
+    'angularjs': 'angular',
+    'expressjs': 'express',
+    'express.js': 'express',
+    'nextjs': 'next.js',
+    'golang': 'go',
+    'postgres': 'postgresql',
+    'k8s': 'kubernetes',
+    'amazon web services': 'aws',
+    'google cloud platform': 'google cloud',
+    'ml': 'machine learning',
+    'restful api': 'rest api',
+    'restful apis': 'rest api',
+    'rest apis': 'rest api',
+}
+
+
+@lru_cache(maxsize=4096)
+def normalize_skill(skill: str) -> str:
+    """
+    Lowercase a skill, collapse whitespace/hyphens between words and
+    map known spelling variants to one canonical name.
+    """
+    if not skill:
+        return ""
+    value = skill.strip().lower()
+    value = re.sub(r'(?<=[a-z])[ \-]+(?=[a-z])', ' ', value)
+    value = re.sub(r'\s+', ' ', value)
+    return SKILL_ALIASES.get(value, value)
+
+
+def normalize_skills(skills: Iterable[str]) -> List[str]:
+    """Normalize a collection of skills, dropping empties and duplicates (sorted)."""
+    normalized = {normalize_skill(s) for s in skills if s}
+    normalized.discard("")
+    return sorted(normalized)
+
+
+def fold_diacritics(text: str) -> str:
+    """
+    Strip diacritics, Vietnamese ones included ('Lập trình viên' -> 'Lap trinh vien',
+    'đ' -> 'd'), so accented and unaccented spellings compare equal.
+    """
+    if text.isascii():
+        return text
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    return ''.join(c for c in unicodedata.normalize('NFD', text) if not unicodedata.combining(c))
+
+
+# Spellings of the main cities (after folding and dropping "TP."/"City")
+CITY_ALIASES = {
+    "hcm": "ho chi minh", "tphcm": "ho chi minh", "hcmc": "ho chi minh", "sai gon": "ho chi minh",
+    "saigon": "ho chi minh", "ho chi minh city": "ho chi minh",
+    "hn": "ha noi", "hanoi": "ha noi",
+    "danang": "da nang",
+}
+
+
+def normalize_city(value: Any) -> str:
+    """City key of a job's `city` or scraped `job_location` ('Ho Chi Minh City, Vietnam (On-site)' -> 'ho chi minh')."""
+    if not value:
+        return "unknown"
+    city = re.sub(r"\s+", " ", fold_diacritics(str(value).split(",")[0].split("(")[0]).lower()).strip()
+    city = re.sub(r"^(?:tp\.?|thanh pho)\s*", "", city)
+    city = re.sub(r"\s+city$", "", city)
+    return CITY_ALIASES.get(city, city) or "unknown"
@@ -22,6 +22,9 @@ SCOPES = ['https://www.googleapis.com/auth/calendar']
 CREDENTIALS_FILE = 'credentials.json'
 TOKEN_FILE = 'token.pickle'
 
+# Bump when extract_cv_sections changes so stored analyses are recomputed
+CV_ANALYSIS_VERSION = 1
+
 # Pydantic models
 class GoogleMeetRequest(BaseModel):
     summary: str
@@ -198,8 +201,19 @@ async def suggest_improvements(username: str):
         file_type = doc.get("file_type", "")
         uploaded_at = doc.get("uploaded_at", "")
 
+        # Reuse the section analysis stored at upload time unless it is outdated
+        cv_analysis = doc.get("cv_analysis") or {}
+        if cv_analysis.get("version") == CV_ANALYSIS_VERSION:
+            sections = cv_analysis.get("sections")
+        else:
+            sections = extract_cv_sections(cv_content)
+            cvs_collection.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {"cv_analysis": {"version": CV_ANALYSIS_VERSION, "sections": sections}}}
+            )
+
         # Analyze CV content
-        analysis_result = analyze_cv_content(cv_content, filename, file_size, file_type)
+        analysis_result = analyze_cv_content(cv_content, filename, file_size, file_type, analysis=sections)
 
         return {
             "username": username,
@@ -215,16 +229,18 @@ async def suggest_improvements(username: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing resume: {str(e)}")
 
-def analyze_cv_content(cv_content: str, filename: str, file_size: int, file_type: str) -> dict:
+def analyze_cv_content(cv_content: str, filename: str, file_size: int, file_type: str, analysis: Optional[dict] = None) -> dict:
     """
     Phân tích chi tiết nội dung CV và đưa ra nhận xét thật về điểm mạnh, điểm yếu
+    (analysis: kết quả extract_cv_sections đã lưu sẵn, nếu có)
     """
     content_lower = cv_content.lower()
     word_count = len(cv_content.split()) if cv_content else 0
     content_length = len(cv_content)
 
     # Phân tích sâu các section của CV
-    analysis = extract_cv_sections(cv_content)
+    if analysis is None:
+        analysis = extract_cv_sections(cv_content)
 
     # Tính điểm mạnh và điểm yếu cụ thể
     strengths, weaknesses = analyze_strengths_weaknesses(analysis, cv_content)
@@ -752,7 +768,11 @@ async def upload_resume(username: str = Form(...), file: UploadFile = File(...))
             "filename": file.filename,
             "processed_text": processed_text,
             "file_size": file_size,
-            "file_type": file_ext
+            "file_type": file_ext,
+            "cv_analysis": {
+                "version": CV_ANALYSIS_VERSION,
+                "sections": extract_cv_sections(processed_text)
+            }
         }
 
         cvs_collection.update_one({"username": username}, {"$set": doc}, upsert=True)